@@ -2,7 +2,7 @@
 ASGI config for config project.
 """
 import os
-from django.asgi import get_asgi_application
+from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -17,6 +17,8 @@ DEBUG = os.getenv('DEBUG', 'True') == 'True'
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0', '*']
 
 INSTALLED_APPS = [
+    # Primero: reemplaza runserver por el servidor ASGI de daphne (eventos SSE)
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -60,6 +62,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 DATABASES = {
     'default': {
@@ -94,6 +97,14 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# El primer handler calcula el SHA-256 de los archivos mientras se reciben
+# (almacenamiento de adjuntos por contenido, ver memos/almacenamiento.py)
+FILE_UPLOAD_HANDLERS = [
+    'memos.almacenamiento.SHA256UploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
@@ -110,6 +121,10 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Tamaño de página del listado de memos (memos.pagination.KeysetPagination,
+# solo en MemoViewSet); el cliente puede pedir otro con ?page_size= (máx. 100)
+MEMOS_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '20'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -128,6 +143,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Enlaces de paginación de los listados de memos (KeysetPagination)
+CORS_EXPOSE_HEADERS = ['Link']
 
 # Permitir todos los orígenes en desarrollo (solo para desarrollo)
 if DEBUG:
@@ -137,3 +154,56 @@ if DEBUG:
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend'
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@memos.local')
 
+# Notificaciones (comando process_outbox): mensajes por conexión SMTP, intentos
+# con espera exponencial antes de pasar a FALLIDA, tiempo tras el cual se
+# recupera una notificación de un worker caído y workers simultáneos por canal
+NOTIFICACIONES_POR_CONEXION = int(os.getenv('NOTIFICACIONES_POR_CONEXION', '100'))
+NOTIFICACIONES_MAX_INTENTOS = int(os.getenv('NOTIFICACIONES_MAX_INTENTOS', '6'))
+NOTIFICACIONES_ESPERA_BASE = int(os.getenv('NOTIFICACIONES_ESPERA_BASE', '60'))  # segundos
+NOTIFICACIONES_ESPERA_MAXIMA = int(os.getenv('NOTIFICACIONES_ESPERA_MAXIMA', '3600'))
+NOTIFICACIONES_TIMEOUT = int(os.getenv('NOTIFICACIONES_TIMEOUT', '300'))
+NOTIFICACIONES_CONCURRENCIA = {
+    'EMAIL': int(os.getenv('NOTIFICACIONES_CONCURRENCIA_EMAIL', '2')),
+}
+
+# Asignación de correlativos: 'secuencial' (sin huecos) o 'bloques' (rangos por proceso)
+CORRELATIVO_MODO = os.getenv('CORRELATIVO_MODO', 'secuencial')
+CORRELATIVO_TAMANO_BLOQUE = int(os.getenv('CORRELATIVO_TAMANO_BLOQUE', '20'))
+
+# Trabajos de firma de PDF (comando run_workers): intentos, espera exponencial
+# entre intentos y tiempo tras el cual se recupera un trabajo de un worker caído
+# (también un adjunto en análisis)
+PDF_TRABAJOS_MAX_INTENTOS = int(os.getenv('PDF_TRABAJOS_MAX_INTENTOS', '5'))
+PDF_TRABAJOS_ESPERA_BASE = int(os.getenv('PDF_TRABAJOS_ESPERA_BASE', '30'))  # segundos
+PDF_TRABAJOS_ESPERA_MAXIMA = int(os.getenv('PDF_TRABAJOS_ESPERA_MAXIMA', '3600'))
+PDF_TRABAJOS_TIMEOUT = int(os.getenv('PDF_TRABAJOS_TIMEOUT', '600'))
+# Tamaño a partir del cual el PDF firmado en construcción pasa de memoria a disco
+PDF_SPOOL_MEMORIA_MAX = int(os.getenv('PDF_SPOOL_MEMORIA_MAX', str(2 * 1024 * 1024)))
+
+# Subidas de adjuntos por bloques: directorio de los archivos parciales (fuera
+# de MEDIA_ROOT), tamaño máximo de cada bloque y horas sin actividad tras las
+# que una subida se descarta (comando purgar_subidas)
+SUBIDAS_DIR = Path(os.getenv('SUBIDAS_DIR', str(BASE_DIR / 'subidas_parciales')))
+SUBIDAS_BLOQUE_MAX = int(os.getenv('SUBIDAS_BLOQUE_MAX', str(5 * 1024 * 1024)))
+SUBIDAS_EXPIRACION_HORAS = int(os.getenv('SUBIDAS_EXPIRACION_HORAS', '24'))
+
+# Entrega de PDF firmados y adjuntos (memos/descargas.py): '' los sirve Django
+# con FileResponse; 'x-accel-redirect' (nginx) o 'x-sendfile' (Apache/lighttpd)
+# delegan la transferencia al servidor frontal tras autorizar el acceso.
+# DESCARGAS_ACCEL_PREFIJO es la location `internal` de nginx que apunta a MEDIA_ROOT
+DESCARGAS_DELEGAR = os.getenv('DESCARGAS_DELEGAR', '')
+DESCARGAS_ACCEL_PREFIJO = os.getenv('DESCARGAS_ACCEL_PREFIJO', '/media-protegida/')
+
+# Eventos en tiempo real (GET /api/eventos/, memos/eventos.py): 'memoria' reparte
+# dentro del proceso ASGI; 'redis' usa pub/sub (Redis o compatible) para recibir
+# los eventos de todos los procesos. Cola máxima por conexión, segundos entre
+# heartbeats y espera sugerida al cliente antes de reconectar
+EVENTOS_BACKEND = os.getenv('EVENTOS_BACKEND', 'memoria')
+EVENTOS_REDIS_URL = os.getenv('EVENTOS_REDIS_URL', 'redis://localhost:6379/0')
+EVENTOS_REDIS_CANAL = os.getenv('EVENTOS_REDIS_CANAL', 'memos:eventos')
+EVENTOS_COLA_MAX = int(os.getenv('EVENTOS_COLA_MAX', '100'))
+EVENTOS_HEARTBEAT = int(os.getenv('EVENTOS_HEARTBEAT', '25'))
+EVENTOS_REINTENTO_MS = int(os.getenv('EVENTOS_REINTENTO_MS', '5000'))
+# Vigencia (segundos) del token de POST /api/eventos/token/ que EventSource
+# envía en la URL; un token de acceso no se acepta ahí
+EVENTOS_TOKEN_DURACION = int(os.getenv('EVENTOS_TOKEN_DURACION', '60'))
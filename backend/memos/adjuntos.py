@@ -0,0 +1,183 @@
+"""
+Análisis de los adjuntos al subirlos.
+
+`upload_attachment` solo revisa la extensión y el tamaño declarado; el adjunto
+queda con `estado_analisis = PENDIENTE` y `run_workers` lo analiza una sola vez
+en segundo plano:
+- detecta el tipo real por los primeros bytes (y, en DOCX/XLSX, por las
+  partes del ZIP) y lo compara con la extensión;
+- si es PDF lo reescribe completo con `FusionPDF`: valida que todos sus
+  objetos se puedan leer, lo descifra si tiene contraseña vacía, cuenta las
+  páginas y guarda el resultado en `archivo_normalizado`;
+- completa `file_size` con el tamaño real en el storage.
+
+Los adjuntos con el mismo contenido (ver `almacenamiento.py`) y la misma
+extensión reutilizan el análisis y la copia normalizada del primero.
+
+Un adjunto cuyo contenido no coincide con la extensión o que no se puede leer
+queda INVALIDO con el motivo en `error_analisis`. La firma ya no interpreta los
+originales: concatena las copias normalizadas de los PDF válidos.
+"""
+import logging
+import os
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .almacenamiento import ruta_normalizada
+from .models import Memo, MemoAttachment
+from .pdf import FusionPDF, abrir_archivo
+
+logger = logging.getLogger(__name__)
+
+FIRMA_OLE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+FIRMA_ZIP = b'PK\x03\x04'
+
+# Tipos detectados aceptables para cada extensión permitida. DOC y XLS
+# comparten el contenedor OLE y no se distinguen por la cabecera.
+TIPOS_POR_EXTENSION = {
+    '.pdf': {'pdf'},
+    '.doc': {'ole'},
+    '.xls': {'ole'},
+    '.docx': {'docx'},
+    '.xlsx': {'xlsx'},
+}
+
+
+class AdjuntoInvalido(Exception):
+    """El contenido del adjunto no es válido para su extensión."""
+
+
+# Contenedor que debe anunciar el primer bloque de una subida según la
+# extensión (ver `subidas.py`)
+CABECERA_POR_EXTENSION = {
+    '.pdf': 'pdf',
+    '.doc': 'ole',
+    '.xls': 'ole',
+    '.docx': 'zip',
+    '.xlsx': 'zip',
+}
+
+# Bytes necesarios para reconocer la cabecera
+TAMAÑO_CABECERA = 1024
+
+
+def tipo_por_cabecera(cabecera):
+    """Contenedor según los primeros bytes: pdf, ole, zip o ''."""
+    # La especificación admite basura antes de %PDF- en los primeros 1024 bytes
+    if b'%PDF-' in cabecera[:TAMAÑO_CABECERA]:
+        return 'pdf'
+    if cabecera.startswith(FIRMA_OLE):
+        return 'ole'
+    if cabecera.startswith(FIRMA_ZIP):
+        return 'zip'
+    return ''
+
+
+def detectar_tipo(archivo):
+    """Tipo real de un archivo binario con seek: pdf, ole, docx, xlsx o ''."""
+    archivo.seek(0)
+    tipo = tipo_por_cabecera(archivo.read(TAMAÑO_CABECERA))
+    if tipo == 'zip':
+        tipo = ''
+        try:
+            archivo.seek(0)
+            with zipfile.ZipFile(archivo) as contenedor:
+                partes = set(contenedor.namelist())
+            if 'word/document.xml' in partes:
+                tipo = 'docx'
+            elif 'xl/workbook.xml' in partes:
+                tipo = 'xlsx'
+        except zipfile.BadZipFile:
+            pass
+    archivo.seek(0)
+    return tipo
+
+
+def analizar_adjunto(attachment):
+    """
+    Analiza el adjunto y guarda el resultado si sigue reclamado con
+    `attachment.analizado_por`. Devuelve True si quedó VALIDO.
+    """
+    previo = analisis_previo(attachment)
+    if previo is not None:
+        campos = {
+            'file_size': previo.file_size,
+            'estado_analisis': previo.estado_analisis,
+            'tipo_detectado': previo.tipo_detectado,
+            'paginas': previo.paginas,
+            'archivo_normalizado': previo.archivo_normalizado.name,
+            'error_analisis': previo.error_analisis,
+        }
+        return guardar_resultado(attachment, campos)
+
+    campos = {'tipo_detectado': '', 'paginas': None, 'error_analisis': ''}
+    try:
+        campos['file_size'] = attachment.file.size
+        with abrir_archivo(attachment.file) as archivo:
+            tipo = detectar_tipo(archivo)
+            campos['tipo_detectado'] = tipo
+            esperados = TIPOS_POR_EXTENSION.get(attachment.extension, set())
+            if tipo not in esperados:
+                raise AdjuntoInvalido(
+                    f'El contenido ({tipo or "desconocido"}) no corresponde a la extensión del archivo'
+                )
+            if tipo == 'pdf':
+                campos['paginas'] = normalizar_pdf(attachment, archivo)
+                campos['archivo_normalizado'] = attachment.archivo_normalizado.name
+        campos['estado_analisis'] = MemoAttachment.EstadoAnalisis.VALIDO
+    except Exception as e:
+        logger.warning(f'Adjunto {attachment.id} inválido: {str(e)}')
+        campos['estado_analisis'] = MemoAttachment.EstadoAnalisis.INVALIDO
+        campos['error_analisis'] = str(e) if isinstance(e, AdjuntoInvalido) else f'No se pudo leer el archivo: {str(e)}'
+
+    return guardar_resultado(attachment, campos)
+
+
+def analisis_previo(attachment):
+    """
+    Adjunto ya analizado con el mismo contenido y la misma extensión: su
+    resultado vale también para este.
+    """
+    if attachment.contenido_id is None:
+        return None
+    analizados = MemoAttachment.objects.filter(
+        contenido_id=attachment.contenido_id,
+        estado_analisis__in=[MemoAttachment.EstadoAnalisis.VALIDO, MemoAttachment.EstadoAnalisis.INVALIDO],
+    ).exclude(pk=attachment.pk)
+    return next((otro for otro in analizados if otro.extension == attachment.extension), None)
+
+
+def guardar_resultado(attachment, campos):
+    """Guarda el análisis si el adjunto sigue reclamado por este worker."""
+    campos['analizado_en'] = timezone.now()
+    actualizado = MemoAttachment.objects.filter(
+        pk=attachment.pk, analizado_por=attachment.analizado_por
+    ).update(**campos)
+    for campo, valor in campos.items():
+        setattr(attachment, campo, valor)
+    if actualizado:
+        from .services import registrar_cambio_memo
+        registrar_cambio_memo(Memo(pk=attachment.memo_id))
+    return campos['estado_analisis'] == MemoAttachment.EstadoAnalisis.VALIDO
+
+
+def normalizar_pdf(attachment, archivo):
+    """Reescribe el PDF en `archivo_normalizado` y devuelve sus páginas."""
+    with tempfile.SpooledTemporaryFile(max_size=settings.PDF_SPOOL_MEMORIA_MAX) as temporal:
+        fusion = FusionPDF(temporal)
+        paginas = fusion.agregar(archivo)
+        if not paginas:
+            raise AdjuntoInvalido('El PDF no tiene páginas')
+        fusion.cerrar()
+        temporal.seek(0)
+        if attachment.contenido_id:
+            # Compartida por los adjuntos con el mismo contenido
+            nombre = os.path.basename(ruta_normalizada(attachment.contenido.sha256))
+        else:
+            nombre = f'adjunto_{attachment.id}.pdf'
+        attachment.archivo_normalizado.save(nombre, File(temporal, name=nombre), save=False)
+    return paginas
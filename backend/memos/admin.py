@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Memo, MemoAttachment, SecuenciaMemorando
+from .models import (
+    ContenidoAdjunto, Memo, MemoAttachment, NotificationOutbox, SecuenciaMemorando, SubidaAdjunto, TrabajoFirmaPDF
+)
 
 
 @admin.register(Memo)
@@ -19,7 +21,7 @@ class MemoAdmin(admin.ModelAdmin):
             'fields': ('status', 'created_at', 'approved_at', 'fecha_distribucion')
         }),
         ('Firma digital', {
-            'fields': ('sello_digital', 'signed_file')
+            'fields': ('sello_digital', 'signed_file', 'signed_file_status')
         }),
         ('Comentarios', {
             'fields': ('rejection_reason', 'modificacion_solicitada')
@@ -30,9 +32,26 @@ class MemoAdmin(admin.ModelAdmin):
 
 @admin.register(MemoAttachment)
 class MemoAttachmentAdmin(admin.ModelAdmin):
-    list_display = ['memo', 'uploaded_by', 'file', 'file_size', 'uploaded_at']
-    list_filter = ['uploaded_at']
-    readonly_fields = ['file_size', 'uploaded_at']
+    list_display = ['memo', 'uploaded_by', 'nombre_original', 'file_size', 'estado_analisis', 'tipo_detectado', 'paginas', 'uploaded_at']
+    list_filter = ['estado_analisis', 'uploaded_at']
+    readonly_fields = [
+        'contenido', 'nombre_original', 'file_size', 'uploaded_at', 'estado_analisis', 'tipo_detectado', 'paginas',
+        'archivo_normalizado', 'error_analisis', 'analizado_por', 'analizado_en',
+    ]
+
+
+@admin.register(ContenidoAdjunto)
+class ContenidoAdjuntoAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'archivo', 'tamaño', 'referencias', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'archivo', 'tamaño', 'referencias', 'created_at']
+
+
+@admin.register(SubidaAdjunto)
+class SubidaAdjuntoAdmin(admin.ModelAdmin):
+    list_display = ['nombre_original', 'memo', 'usuario', 'recibido', 'tamaño', 'estado', 'updated_at']
+    list_filter = ['estado']
+    readonly_fields = ['id', 'memo', 'usuario', 'nombre_original', 'tamaño', 'recibido', 'adjunto', 'created_at', 'updated_at']
 
 
 @admin.register(SecuenciaMemorando)
@@ -41,3 +60,24 @@ class SecuenciaMemorandoAdmin(admin.ModelAdmin):
     list_filter = ['año', 'departamento']
     readonly_fields = ['ultima_secuencia']
 
+
+@admin.register(TrabajoFirmaPDF)
+class TrabajoFirmaPDFAdmin(admin.ModelAdmin):
+    list_display = ['memo', 'estado', 'intentos', 'disponible_en', 'reclamado_por', 'completado_en']
+    list_filter = ['estado']
+    readonly_fields = ['reclamado_por', 'reclamado_en', 'ultimo_error', 'created_at', 'completado_en']
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['memo', 'evento', 'canal', 'email', 'estado', 'intentos', 'disponible_en', 'enviado_en']
+    list_filter = ['estado', 'canal', 'evento']
+    search_fields = ['email', 'asunto']
+    readonly_fields = ['reclamado_por', 'reclamado_en', 'ultimo_error', 'created_at', 'enviado_en']
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar las notificaciones fallidas seleccionadas')
+    def reintentar(self, request, queryset):
+        from .notificaciones import reintentar_fallidas
+        cantidad = reintentar_fallidas(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f'{cantidad} notificaciones devueltas a la cola')
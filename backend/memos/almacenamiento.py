@@ -0,0 +1,207 @@
+"""
+Almacenamiento de adjuntos por contenido.
+
+Cada archivo se guarda una sola vez, identificado por su SHA-256, en
+`memo_attachments/sha256/ab/cd/<sha256><ext>`. Los dos niveles de 256
+directorios evitan que uno solo acumule todos los archivos. Todos los adjuntos
+con el mismo contenido comparten el `ContenidoAdjunto`, que cuenta sus
+referencias:
+- `guardar_contenido` la incrementa (y escribe el archivo si es nuevo);
+- eliminar un MemoAttachment la decrementa (señal `post_delete`);
+- `purgar_contenidos` elimina los contenidos que quedaron sin referencias.
+
+El hash se calcula mientras se recibe la subida (`SHA256UploadHandler`), sin
+volver a leer el archivo.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import ContenidoAdjunto, MemoAttachment
+
+MAX_REINTENTOS = 5
+
+
+class SHA256UploadHandler(FileUploadHandler):
+    """
+    Calcula el SHA-256 de cada archivo a medida que llegan los bloques y los
+    pasa sin cambios a los handlers siguientes, que son los que lo guardan.
+    El resultado queda en `request.sha256_subidas[campo] = (tamaño, hash)`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hash = hashlib.sha256()
+        self.tamaño = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hash.update(raw_data)
+        self.tamaño += len(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'sha256_subidas'):
+            self.request.sha256_subidas = {}
+        self.request.sha256_subidas[self.field_name] = (self.tamaño, self.hash.hexdigest())
+        # El archivo lo entrega el siguiente handler
+        return None
+
+
+def calcular_sha256(archivo):
+    """SHA-256 de un File de Django, leído por bloques."""
+    resultado = hashlib.sha256()
+    for bloque in archivo.chunks():
+        resultado.update(bloque)
+    archivo.seek(0)
+    return resultado.hexdigest()
+
+
+def sha256_de_subida(request, campo, archivo):
+    """
+    Hash calculado por `SHA256UploadHandler` para el archivo del campo, o
+    recorriendo el archivo si el handler no está configurado.
+    """
+    tamaño, sha256 = getattr(request, 'sha256_subidas', {}).get(campo, (None, None))
+    if sha256 is None or tamaño != archivo.size:
+        return calcular_sha256(archivo)
+    return sha256
+
+
+def ruta_contenido(sha256, nombre):
+    extension = os.path.splitext(nombre)[1].lower()
+    return f'memo_attachments/sha256/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}'
+
+
+def ruta_normalizada(sha256):
+    """Copia normalizada (PDF reescrito) compartida por el contenido."""
+    return f'memo_attachments/normalizados/{sha256}.pdf'
+
+
+def escribir_archivo(archivo, ruta):
+    """Escribe `archivo` en `ruta` salvo que ya esté completo."""
+    if default_storage.exists(ruta):
+        if default_storage.size(ruta) == archivo.size:
+            return ruta
+        # Escritura interrumpida de una subida anterior
+        default_storage.delete(ruta)
+    archivo.seek(0)
+    guardado = default_storage.save(ruta, archivo)
+    if guardado != ruta:
+        # Otra subida del mismo contenido lo escribió al mismo tiempo
+        default_storage.delete(guardado)
+    return ruta
+
+
+def guardar_contenido(archivo, nombre, sha256=None):
+    """
+    Devuelve el ContenidoAdjunto de `archivo` con una referencia más. El
+    archivo solo se escribe si ese contenido no estaba guardado. Debe llamarse
+    en la transacción que crea el adjunto, para que la referencia se deshaga
+    si el adjunto no llega a crearse.
+    """
+    if sha256 is None:
+        sha256 = calcular_sha256(archivo)
+
+    for _ in range(MAX_REINTENTOS):
+        contenido = ContenidoAdjunto.objects.filter(sha256=sha256).first()
+        if contenido is not None:
+            if ContenidoAdjunto.objects.filter(pk=contenido.pk).update(referencias=F('referencias') + 1):
+                contenido.referencias += 1
+                return contenido
+            # Purgado entre la lectura y la actualización
+            continue
+
+        ruta = escribir_archivo(archivo, ruta_contenido(sha256, nombre))
+        try:
+            with transaction.atomic():
+                return ContenidoAdjunto.objects.create(
+                    sha256=sha256, archivo=ruta, tamaño=archivo.size, referencias=1
+                )
+        except IntegrityError:
+            # Otra subida del mismo contenido creó la fila primero
+            continue
+
+    raise IntegrityError(f'No se pudo registrar el contenido {sha256}')
+
+
+def crear_adjunto(memo, archivo, nombre, usuario, sha256=None):
+    """
+    Guarda `archivo` por contenido y crea su MemoAttachment, que queda
+    pendiente de análisis. Debe llamarse dentro de una transacción.
+    """
+    contenido = guardar_contenido(archivo, nombre, sha256)
+    return MemoAttachment.objects.create(
+        memo=memo,
+        file=contenido.archivo.name,
+        contenido=contenido,
+        nombre_original=nombre,
+        uploaded_by=usuario,
+        file_size=archivo.size
+    )
+
+
+def liberar_contenido(contenido_id):
+    """Descuenta la referencia de un adjunto eliminado."""
+    ContenidoAdjunto.objects.filter(pk=contenido_id, referencias__gt=0).update(
+        referencias=F('referencias') - 1
+    )
+
+
+def reconciliar_referencias(aplicar=True):
+    """
+    Corrige `referencias` con el número real de adjuntos de cada contenido.
+    Devuelve [(contenido, actual, esperado)] de los desviados.
+    """
+    desviados = [
+        (contenido, contenido.referencias, contenido.total)
+        for contenido in ContenidoAdjunto.objects.annotate(total=Count('adjuntos')).exclude(referencias=F('total'))
+    ]
+    if aplicar:
+        for contenido, _, esperado in desviados:
+            ContenidoAdjunto.objects.filter(pk=contenido.pk).update(referencias=esperado)
+    return desviados
+
+
+def migrar_adjunto(attachment):
+    """
+    Pasa un adjunto guardado antes del almacenamiento por contenido a su
+    ContenidoAdjunto. Devuelve el nombre del archivo anterior.
+    """
+    anterior = attachment.file.name
+    attachment.file.open('rb')
+    try:
+        with transaction.atomic():
+            contenido = guardar_contenido(attachment.file, anterior)
+            MemoAttachment.objects.filter(pk=attachment.pk).update(
+                file=contenido.archivo.name,
+                contenido=contenido,
+                nombre_original=attachment.nombre_original or os.path.basename(anterior),
+            )
+    finally:
+        attachment.file.close()
+    return anterior
+
+
+def purgar_contenidos():
+    """
+    Elimina los contenidos sin referencias ni adjuntos, con su archivo y su
+    copia normalizada. Devuelve (cantidad, bytes liberados).
+    """
+    cantidad = liberados = 0
+    for contenido in ContenidoAdjunto.objects.filter(referencias=0, adjuntos__isnull=True).iterator():
+        eliminados, _ = ContenidoAdjunto.objects.filter(
+            pk=contenido.pk, referencias=0, adjuntos__isnull=True
+        ).delete()
+        if not eliminados:
+            continue
+        # Una subida simultánea pudo volver a registrar el mismo contenido
+        if not ContenidoAdjunto.objects.filter(sha256=contenido.sha256).exists():
+            default_storage.delete(contenido.archivo.name)
+            default_storage.delete(ruta_normalizada(contenido.sha256))
+        cantidad += 1
+        liberados += contenido.tamaño
+    return cantidad, liberados
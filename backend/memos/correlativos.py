@@ -0,0 +1,204 @@
+"""
+Asignación de números correlativos sin bloqueos de lectura.
+
+Cada reserva es un único `UPDATE ... SET ultima_secuencia = ultima_secuencia + n
+... RETURNING ultima_secuencia` sobre SecuenciaMemorando: la base de datos
+serializa solo esa sentencia y no hace falta `select_for_update` (que en SQLite
+no tiene efecto). Si la fila del mes no existe se inserta, y los conflictos
+(inserción concurrente, "database is locked", deadlocks) se reintentan con
+espera exponencial.
+
+Modos (`settings.CORRELATIVO_MODO`):
+
+- 'secuencial' (por defecto): el incremento se ejecuta en la transacción del
+  llamador, así que si esta se revierte el número vuelve a quedar libre. Sin
+  huecos, pero los envíos de un mismo departamento y mes se serializan hasta
+  el commit.
+- 'bloques': cada proceso arrienda un rango de CORRELATIVO_TAMANO_BLOQUE
+  números en una transacción propia y los entrega desde memoria. Casi no hay
+  contención, a cambio de admitir huecos (números arrendados que no llegan a
+  usarse) y de que el orden entre procesos no sea cronológico.
+"""
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connections, transaction
+from django.utils import timezone
+
+from .models import SecuenciaMemorando
+
+MODO_SECUENCIAL = 'secuencial'
+MODO_BLOQUES = 'bloques'
+
+MAX_REINTENTOS = 10
+ESPERA_INICIAL = 0.005  # segundos
+
+
+class CorrelativoNoDisponible(Exception):
+    pass
+
+
+def formatear_correlativo(prefijo, año, mes, secuencia):
+    """Formato [Prefijo]-[Año]-[Mes]-[Secuencial], p. ej. FIN-2024-03-0042."""
+    return f"{prefijo}-{año}-{str(mes).zfill(2)}-{str(secuencia).zfill(4)}"
+
+
+def _soporta_update_returning(conexion):
+    if conexion.vendor == 'postgresql':
+        return True
+    # SQLite admite RETURNING desde 3.35, la misma condición que usa Django para INSERT
+    return conexion.vendor == 'sqlite' and conexion.features.can_return_columns_from_insert
+
+
+def _incrementar(conexion, departamento, año, mes, cantidad):
+    """
+    Suma `cantidad` a la secuencia y devuelve el último número reservado.
+    Debe ejecutarse dentro de una transacción de `conexion`.
+    """
+    q = conexion.ops.quote_name
+    tabla = q(SecuenciaMemorando._meta.db_table)
+    ahora = timezone.now()
+    condicion = f"{q('departamento_id')} = %s AND {q('año')} = %s AND {q('mes')} = %s"
+    parametros = [departamento.id, año, mes]
+
+    with conexion.cursor() as cursor:
+        update = (
+            f"UPDATE {tabla} SET {q('ultima_secuencia')} = {q('ultima_secuencia')} + %s, "
+            f"{q('actualizado_en')} = %s WHERE {condicion}"
+        )
+        if _soporta_update_returning(conexion):
+            cursor.execute(f"{update} RETURNING {q('ultima_secuencia')}", [cantidad, ahora, *parametros])
+            fila = cursor.fetchone()
+        else:
+            # La fila queda bloqueada por el UPDATE hasta el final de la transacción
+            cursor.execute(update, [cantidad, ahora, *parametros])
+            fila = None
+            if cursor.rowcount:
+                cursor.execute(f"SELECT {q('ultima_secuencia')} FROM {tabla} WHERE {condicion}", parametros)
+                fila = cursor.fetchone()
+        if fila:
+            return fila[0]
+
+        cursor.execute(
+            f"INSERT INTO {tabla} ({q('departamento_id')}, {q('año')}, {q('mes')}, "
+            f"{q('ultima_secuencia')}, {q('prefijo')}, {q('creado_en')}, {q('actualizado_en')}) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [departamento.id, año, mes, cantidad, departamento.prefijo, ahora, ahora]
+        )
+        return cantidad
+
+
+def _con_reintentos(operacion, errores=(IntegrityError, OperationalError)):
+    for intento in range(MAX_REINTENTOS):
+        try:
+            return operacion()
+        except errores:
+            # IntegrityError: otro proceso insertó la fila del mes; OperationalError:
+            # base bloqueada, deadlock o conflicto de serialización
+            if intento == MAX_REINTENTOS - 1:
+                raise
+            time.sleep(ESPERA_INICIAL * (2 ** intento) * (1 + random.random()))
+
+
+def transaccion_con_reintentos(operacion, using=DEFAULT_DB_ALIAS):
+    """
+    Ejecuta `operacion()` en una transacción y la repite completa si la base
+    la aborta por contención. En SQLite una transacción que lee antes de
+    escribir recibe "database is locked" sin esperar cuando otra conexión ya
+    escribe; reintentarla entera es la única salida.
+    """
+    def en_transaccion():
+        with transaction.atomic(using=using):
+            return operacion()
+
+    return _con_reintentos(en_transaccion, errores=(OperationalError,))
+
+
+def incrementar_secuencia(departamento, año, mes, cantidad=1, using=DEFAULT_DB_ALIAS):
+    """
+    Reserva `cantidad` números en la transacción actual (un savepoint por
+    intento) y devuelve el primero.
+    """
+    conexion = connections[using]
+
+    def operacion():
+        with transaction.atomic(using=using):
+            return _incrementar(conexion, departamento, año, mes, cantidad)
+
+    ultimo = _con_reintentos(operacion)
+    return ultimo - cantidad + 1
+
+
+def incrementar_secuencia_autonoma(departamento, año, mes, cantidad, using=DEFAULT_DB_ALIAS):
+    """
+    Igual que `incrementar_secuencia`, pero confirmada en una conexión propia
+    para que el rango siga reservado aunque la transacción del llamador se
+    revierta.
+    """
+    conexion = connections.create_connection(using)
+    try:
+        def operacion():
+            conexion.set_autocommit(False)
+            try:
+                ultimo = _incrementar(conexion, departamento, año, mes, cantidad)
+                conexion.commit()
+                return ultimo
+            except Exception:
+                conexion.rollback()
+                raise
+            finally:
+                conexion.set_autocommit(True)
+
+        ultimo = _con_reintentos(operacion)
+    finally:
+        conexion.close()
+    return ultimo - cantidad + 1
+
+
+class ArrendadorCorrelativos:
+    """Rangos de correlativos arrendados por el proceso actual."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._rangos = {}
+
+    def siguiente(self, departamento, año, mes, tamaño_bloque):
+        clave = (departamento.id, año, mes)
+        with self._lock:
+            if self._pid != os.getpid():
+                # Proceso hijo (fork): los rangos del padre no le pertenecen
+                self._pid = os.getpid()
+                self._rangos = {}
+
+            siguiente, fin = self._rangos.get(clave, (1, 0))
+            if siguiente > fin:
+                siguiente = incrementar_secuencia_autonoma(departamento, año, mes, tamaño_bloque)
+                fin = siguiente + tamaño_bloque - 1
+            self._rangos[clave] = (siguiente + 1, fin)
+            return siguiente
+
+
+_arrendador = ArrendadorCorrelativos()
+
+
+def reserva_autonoma():
+    """True si los números individuales sobreviven a un rollback del llamador."""
+    return getattr(settings, 'CORRELATIVO_MODO', MODO_SECUENCIAL) == MODO_BLOQUES
+
+
+def asignar_secuencias(departamento, año, mes, cantidad=1):
+    """
+    Devuelve el primer número de un bloque contiguo de `cantidad` según el
+    modo configurado. El modo por bloques solo aplica a números individuales;
+    los bloques grandes (importación) siempre se reservan directamente.
+    """
+    modo = getattr(settings, 'CORRELATIVO_MODO', MODO_SECUENCIAL)
+    if modo == MODO_BLOQUES and cantidad == 1:
+        return _arrendador.siguiente(departamento, año, mes, settings.CORRELATIVO_TAMANO_BLOQUE)
+    if modo not in (MODO_SECUENCIAL, MODO_BLOQUES):
+        raise CorrelativoNoDisponible(f'Modo de correlativo desconocido: {modo}')
+    return incrementar_secuencia(departamento, año, mes, cantidad)
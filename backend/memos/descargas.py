@@ -0,0 +1,119 @@
+"""
+Entrega de PDF firmados y adjuntos.
+
+La vista comprueba con una sola consulta que el usuario ve el memo y obtiene
+el nombre del archivo; `respuesta_archivo` arma la respuesta:
+- ETag fuerte (el SHA-256 del contenido en los adjuntos; el nombre y el
+  tamaño en los PDF firmados, que nunca se sobrescriben) e `If-None-Match`
+  con respuesta 304;
+- `Cache-Control: private, max-age=31536000, immutable`: un mismo archivo
+  no cambia nunca de contenido;
+- con DESCARGAS_DELEGAR la transferencia la hace el servidor frontal
+  (`X-Accel-Redirect` de nginx o `X-Sendfile` de Apache/lighttpd), que
+  atiende también los Range; Python no lee el archivo;
+- sin delegar, `FileResponse` (que usa `wsgi.file_wrapper`/sendfile cuando el
+  servidor lo ofrece) o, para un Range, solo el tramo pedido con 206.
+"""
+import hashlib
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags
+
+CACHE_INMUTABLE = 'private, max-age=31536000, immutable'
+TAMAÑO_BLOQUE = 64 * 1024
+
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def etag_archivo(nombre, tamaño, sha256=None):
+    """ETag fuerte: el hash del contenido o, si no se conoce, nombre y tamaño."""
+    if sha256:
+        return f'"{sha256}"'
+    return f'"{hashlib.md5(nombre.encode()).hexdigest()}-{tamaño}"'
+
+
+def rango_pedido(request, tamaño, etag):
+    """
+    (inicio, fin) del Range pedido, None para el archivo completo o False si
+    el rango no es satisfacible. Solo se atiende un rango; varios rangos o un
+    If-Range que no coincide devuelven el archivo completo.
+    """
+    cabecera = request.headers.get('Range')
+    if not cabecera:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        return None
+    coincidencia = RANGO.match(cabecera.strip())
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if inicio:
+        inicio = int(inicio)
+        fin = min(int(fin), tamaño - 1) if fin else tamaño - 1
+    elif fin:
+        # bytes=-N: los últimos N bytes
+        inicio, fin = max(tamaño - int(fin), 0), tamaño - 1
+    else:
+        return None
+    if inicio >= tamaño or fin < inicio:
+        return False
+    return inicio, fin
+
+
+def leer_tramo(ruta, inicio, longitud):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while longitud:
+            datos = archivo.read(min(TAMAÑO_BLOQUE, longitud))
+            if not datos:
+                break
+            longitud -= len(datos)
+            yield datos
+
+
+def respuesta_archivo(request, nombre, nombre_descarga, sha256=None, content_type=None):
+    """Respuesta para el archivo `nombre` del storage (ver docstring del módulo)."""
+    if not default_storage.exists(nombre):
+        return None
+    tamaño = default_storage.size(nombre)
+    etag = etag_archivo(nombre, tamaño, sha256)
+    content_type = content_type or mimetypes.guess_type(nombre_descarga)[0] or 'application/octet-stream'
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and ('*' in parse_etags(if_none_match) or etag in parse_etags(if_none_match)):
+        respuesta = HttpResponse(status=304)
+    elif settings.DESCARGAS_DELEGAR == 'x-accel-redirect':
+        respuesta = HttpResponse(content_type=content_type)
+        respuesta['X-Accel-Redirect'] = quote(settings.DESCARGAS_ACCEL_PREFIJO + nombre)
+    elif settings.DESCARGAS_DELEGAR == 'x-sendfile':
+        respuesta = HttpResponse(content_type=content_type)
+        respuesta['X-Sendfile'] = default_storage.path(nombre)
+    else:
+        rango = rango_pedido(request, tamaño, etag)
+        if rango is False:
+            respuesta = HttpResponse(status=416)
+            respuesta['Content-Range'] = f'bytes */{tamaño}'
+        elif rango is None:
+            respuesta = FileResponse(default_storage.open(nombre, 'rb'), content_type=content_type)
+        else:
+            inicio, fin = rango
+            respuesta = StreamingHttpResponse(
+                leer_tramo(default_storage.path(nombre), inicio, fin - inicio + 1),
+                status=206,
+                content_type=content_type,
+            )
+            respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamaño}'
+            respuesta['Content-Length'] = fin - inicio + 1
+        respuesta['Accept-Ranges'] = 'bytes'
+
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = CACHE_INMUTABLE
+    if respuesta.status_code in (200, 206):
+        respuesta['Content-Disposition'] = content_disposition_header(True, nombre_descarga)
+    return respuesta
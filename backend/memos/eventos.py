@@ -0,0 +1,307 @@
+"""
+Eventos de memos en tiempo real para los tableros (`GET /api/eventos/`, SSE).
+
+Cada cambio que afecta las carpetas de un usuario publica un evento para ese
+usuario cuando se confirma la transacción:
+- `memo_recibido`: el memo entró en sus Recibidos (aprobado o distribuido);
+- `aprobacion_pendiente`: un memo quedó pendiente de su aprobación;
+- `estado_cambiado`: cambió el estado de un memo que ya estaba en sus carpetas;
+- `distribucion_entregada`: se entregó la notificación de un memo suyo a un
+  destinatario.
+
+El cliente mantiene abierta una conexión por pestaña y vuelve a pedir la
+carpeta solo al recibir un evento, en lugar de consultarla periódicamente.
+
+Reparto:
+- `BrokerLocal` guarda las suscripciones abiertas en este proceso (una cola
+  asyncio acotada por conexión) y reparte los eventos por usuario. Una
+  conexión inactiva solo ocupa su cola; no usa hilos ni consultas.
+- EVENTOS_BACKEND = 'memoria' publica directo en el broker del proceso: sirve
+  cuando los eventos se generan en el mismo proceso ASGI que atiende las
+  conexiones (desarrollo, un solo proceso).
+- EVENTOS_BACKEND = 'redis' publica en un canal pub/sub (Redis o un servidor
+  compatible, p. ej. Valkey o KeyDB); cada proceso ASGI mantiene una sola
+  suscripción que alimenta su broker. Así llegan también los eventos de otros
+  procesos (`run_workers`, `process_outbox`, otros workers del servidor).
+
+Si la cola de una conexión se llena (cliente que no lee), se vacía y se envía
+`resincronizar`: el cliente debe volver a pedir sus carpetas.
+
+EventSource no permite cabeceras, así que el navegador se autentica con un
+`TokenEventos` en la URL (`POST /api/eventos/token/`): dura pocos segundos y
+solo sirve para abrir el flujo. Un token de acceso en la URL se rechaza.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from rest_framework_simplejwt.tokens import Token
+
+logger = logging.getLogger(__name__)
+
+MEMO_RECIBIDO = 'memo_recibido'
+APROBACION_PENDIENTE = 'aprobacion_pendiente'
+ESTADO_CAMBIADO = 'estado_cambiado'
+DISTRIBUCION_ENTREGADA = 'distribucion_entregada'
+RESINCRONIZAR = 'resincronizar'
+
+
+class TokenEventos(Token):
+    """
+    JWT que solo abre el flujo de eventos: su tipo ('eventos') no lo acepta
+    ninguna otra vista y vence a los EVENTOS_TOKEN_DURACION segundos. Solo se
+    valida al conectar; la conexión abierta sigue después del vencimiento.
+    """
+    token_type = 'eventos'
+
+    @property
+    def lifetime(self):
+        return timedelta(seconds=settings.EVENTOS_TOKEN_DURACION)
+
+
+class Suscripcion:
+    """Conexión abierta de un usuario: su cola y el loop que la atiende."""
+
+    def __init__(self, usuario_id, loop, tamaño):
+        self.usuario_id = usuario_id
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=tamaño)
+
+    def entregar(self, evento):
+        # Se ejecuta en el loop de la suscripción (call_soon_threadsafe)
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait({'id': evento['id'], 'tipo': RESINCRONIZAR, 'datos': {}})
+
+
+class BrokerLocal:
+    """Suscripciones abiertas en este proceso, por usuario."""
+
+    def __init__(self):
+        self.suscripciones = defaultdict(set)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+
+    def suscribir(self, usuario_id):
+        suscripcion = Suscripcion(usuario_id, asyncio.get_running_loop(), settings.EVENTOS_COLA_MAX)
+        with self.lock:
+            self.suscripciones[usuario_id].add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self.lock:
+            abiertas = self.suscripciones.get(suscripcion.usuario_id)
+            if abiertas is not None:
+                abiertas.discard(suscripcion)
+                if not abiertas:
+                    del self.suscripciones[suscripcion.usuario_id]
+
+    def repartir(self, eventos):
+        """
+        Entrega cada evento (`{'usuario_id', 'tipo', 'datos'}`) a las conexiones
+        de su usuario. Se puede llamar desde cualquier hilo.
+        """
+        for evento in eventos:
+            with self.lock:
+                destinos = list(self.suscripciones.get(evento['usuario_id'], ()))
+            if not destinos:
+                continue
+            salida = {'id': next(self.ids), 'tipo': evento['tipo'], 'datos': evento['datos']}
+            for suscripcion in destinos:
+                try:
+                    suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, salida)
+                except RuntimeError:
+                    # Loop cerrado: la conexión ya terminó
+                    self.cancelar(suscripcion)
+
+    def conexiones(self):
+        with self.lock:
+            return sum(len(abiertas) for abiertas in self.suscripciones.values())
+
+
+broker = BrokerLocal()
+
+
+class BackendMemoria:
+    """Reparto dentro del proceso."""
+
+    def publicar(self, eventos):
+        broker.repartir(eventos)
+
+    def escuchar(self):
+        pass
+
+
+class BackendRedis:
+    """
+    Reparto entre procesos por un canal pub/sub. Requiere el paquete `redis`
+    (redis-py), que incluye el cliente asyncio.
+    """
+
+    def __init__(self, url, canal):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured("EVENTOS_BACKEND = 'redis' requiere el paquete redis")
+        self.url = url
+        self.canal = canal
+        self.cliente = None
+        self.tareas = {}
+
+    def publicar(self, eventos):
+        import redis
+
+        if self.cliente is None:
+            self.cliente = redis.Redis.from_url(self.url)
+        try:
+            self.cliente.publish(self.canal, json.dumps(eventos))
+        except redis.RedisError as e:
+            # Los eventos solo avisan: el cliente los recupera al resincronizar
+            logger.warning(f'No se pudieron publicar {len(eventos)} eventos: {str(e)}')
+
+    def escuchar(self):
+        """Inicia (una vez por loop) la suscripción que alimenta el broker."""
+        loop = asyncio.get_running_loop()
+        tarea = self.tareas.get(loop)
+        if tarea is None or tarea.done():
+            self.tareas[loop] = loop.create_task(self.recibir())
+
+    async def recibir(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                cliente = aioredis.Redis.from_url(self.url)
+                async with cliente.pubsub() as pubsub:
+                    await pubsub.subscribe(self.canal)
+                    async for mensaje in pubsub.listen():
+                        if mensaje['type'] == 'message':
+                            broker.repartir(json.loads(mensaje['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Suscripción de eventos interrumpida: {str(e)}')
+                await asyncio.sleep(1)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings.EVENTOS_BACKEND == 'redis':
+                _backend = BackendRedis(settings.EVENTOS_REDIS_URL, settings.EVENTOS_REDIS_CANAL)
+            else:
+                _backend = BackendMemoria()
+        return _backend
+
+
+def publicar(eventos):
+    """
+    Publica `eventos` (`{'usuario_id', 'tipo', 'datos'}`) cuando se confirme la
+    transacción en curso (o de inmediato fuera de una).
+    """
+    eventos = list(eventos)
+    if eventos:
+        transaction.on_commit(lambda: obtener_backend().publicar(eventos))
+
+
+def datos_memo(memo):
+    return {
+        'memo_id': memo.id,
+        'numero_correlativo': memo.numero_correlativo,
+        'subject': memo.subject,
+        'status': memo.status,
+    }
+
+
+def eventos_buzon(memo, anteriores, entradas):
+    """
+    Eventos del cambio de las filas del buzón de un memo: `anteriores` son las
+    claves (usuario_id, carpeta, status) que tenía y `entradas` las nuevas
+    filas de EntradaBuzon.
+    """
+    from .models import EntradaBuzon, Memo
+
+    Carpeta = EntradaBuzon.Carpeta
+    antes = {(usuario_id, carpeta) for usuario_id, carpeta, _ in anteriores}
+    estados_anteriores = {estado for _, _, estado in anteriores}
+    datos = datos_memo(memo)
+
+    tipos = {}
+    for entrada in entradas:
+        clave = (entrada.usuario_id, entrada.carpeta)
+        if entrada.carpeta == Carpeta.RECIBIDOS and clave not in antes:
+            tipos[entrada.usuario_id] = MEMO_RECIBIDO
+        elif (
+            entrada.carpeta == Carpeta.APROBACION
+            and memo.status == Memo.Status.PENDING_APPROVAL
+            and Memo.Status.PENDING_APPROVAL not in estados_anteriores
+        ):
+            tipos.setdefault(entrada.usuario_id, APROBACION_PENDIENTE)
+        elif estados_anteriores and estados_anteriores != {memo.status}:
+            tipos.setdefault(entrada.usuario_id, ESTADO_CAMBIADO)
+
+    return [{'usuario_id': usuario_id, 'tipo': tipo, 'datos': datos} for usuario_id, tipo in tipos.items()]
+
+
+def eventos_entregas(notificaciones):
+    """`distribucion_entregada` para el autor de cada distribución notificada."""
+    from .models import Memo
+
+    entregadas = [n for n in notificaciones if n.distribucion_id]
+    if not entregadas:
+        return []
+    autores = dict(
+        Memo.objects.filter(pk__in={n.memo_id for n in entregadas}).values_list('id', 'author_id')
+    )
+    return [
+        {
+            'usuario_id': autores[n.memo_id],
+            'tipo': DISTRIBUCION_ENTREGADA,
+            'datos': {
+                'memo_id': n.memo_id,
+                'distribucion_id': n.distribucion_id,
+                'destinatario_id': n.destinatario_id,
+            },
+        }
+        for n in entregadas if n.memo_id in autores
+    ]
+
+
+async def flujo_sse(usuario_id, resincronizar=False):
+    """
+    Cuerpo `text/event-stream` de los eventos del usuario, con un comentario
+    cada EVENTOS_HEARTBEAT segundos para que proxies y balanceadores no corten
+    la conexión inactiva. La suscripción se abre al empezar a enviar: si el
+    cliente se desconecta antes, no queda ninguna registrada.
+    """
+    suscripcion = broker.suscribir(usuario_id)
+    try:
+        yield f'retry: {settings.EVENTOS_REINTENTO_MS}\n\n'
+        if resincronizar:
+            # Reconexión: los eventos perdidos mientras tanto no se guardan
+            yield f'event: {RESINCRONIZAR}\ndata: {{}}\n\n'
+        while True:
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), timeout=settings.EVENTOS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            datos = json.dumps(evento['datos'], ensure_ascii=False)
+            yield f'id: {evento["id"]}\nevent: {evento["tipo"]}\ndata: {datos}\n\n'
+    finally:
+        broker.cancelar(suscripcion)
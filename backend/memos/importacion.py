@@ -0,0 +1,285 @@
+"""
+Importación masiva de memorandos históricos desde JSONL o CSV.
+
+Cada registro admite las claves:
+
+    subject, body                  obligatorias
+    author                         username del autor (obligatoria)
+    departamento                   prefijo (por defecto, el del autor)
+    approver                       username (por defecto, el director del departamento)
+    recipients                     lista de usernames (en CSV, separados por ';')
+    status, prioridad, confidencial
+    created_at, approved_at, fecha_distribucion   fechas ISO 8601
+    numero_correlativo             se conserva si viene; si no, se asigna a los
+                                   memos que ya salieron de borrador
+
+Los registros se procesan por lotes: usuarios y correlativos existentes se
+resuelven con una consulta por lote, los correlativos nuevos se reservan en
+bloques contiguos por (departamento, año, mes) y memos, destinatarios, buzón,
+contadores e índice de búsqueda se escriben con inserciones en bloque.
+"""
+import csv
+import io
+import json
+from collections import Counter, defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from accounts.models import User, Departamento
+from . import search
+from .models import Memo, EntradaBuzon
+from .services import (
+    MAX_RECIPIENTS, ajustar_contadores, calcular_entradas_buzon, reservar_correlativos,
+)
+
+TAMAÑO_LOTE = 1000
+MAX_ERRORES_INFORMADOS = 100
+
+VALORES_VERDADEROS = {'1', 'true', 'si', 'sí', 'yes', 'x'}
+
+
+class ErrorImportacion(ValueError):
+    pass
+
+
+def detectar_formato(nombre):
+    return 'csv' if nombre.lower().endswith('.csv') else 'jsonl'
+
+
+def leer_registros(archivo, formato):
+    """
+    Itera (número de línea, registro) sin cargar el archivo completo.
+    `archivo` puede abrirse en modo texto o binario.
+    """
+    if isinstance(archivo.read(0), bytes):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig')
+
+    if formato == 'csv':
+        for numero, fila in enumerate(csv.DictReader(archivo), start=2):
+            recipients = fila.get('recipients') or ''
+            fila['recipients'] = [r.strip() for r in recipients.split(';') if r.strip()]
+            yield numero, fila
+        return
+
+    for numero, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except json.JSONDecodeError as e:
+            yield numero, ErrorImportacion(f'JSON inválido: {e.msg}')
+
+
+def _fecha(valor, campo):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, datetime):
+        fecha = valor
+    else:
+        fecha = parse_datetime(str(valor))
+        if fecha is None:
+            solo_fecha = parse_date(str(valor))
+            if solo_fecha is None:
+                raise ErrorImportacion(f'Fecha inválida en {campo}: {valor}')
+            fecha = datetime.combine(solo_fecha, time.min)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    return str(valor).strip() if valor not in (None, '') else ''
+
+
+class ImportadorMemos:
+    """Acumula el resultado de una importación procesada por lotes."""
+
+    def __init__(self, tamaño_lote=TAMAÑO_LOTE):
+        self.tamaño_lote = tamaño_lote
+        self.importados = 0
+        self.errores = []
+        self.total_errores = 0
+        self.departamentos = {d.prefijo: d for d in Departamento.objects.select_related('director')}
+        self.departamentos_por_id = {d.id: d for d in self.departamentos.values()}
+        self.usuarios = {}
+
+    def importar(self, registros):
+        lote = []
+        for numero, registro in registros:
+            lote.append((numero, registro))
+            if len(lote) >= self.tamaño_lote:
+                self.procesar_lote(lote)
+                lote = []
+        if lote:
+            self.procesar_lote(lote)
+        return self
+
+    def registrar_error(self, numero, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES_INFORMADOS:
+            self.errores.append({'linea': numero, 'error': mensaje})
+
+    def resumen(self):
+        return {
+            'importados': self.importados,
+            'total_errores': self.total_errores,
+            'errores': self.errores,
+        }
+
+    def cargar_usuarios(self, lote):
+        """Resuelve con una consulta los usernames del lote que aún no están en caché."""
+        nombres = set()
+        for _, registro in lote:
+            if isinstance(registro, dict):
+                nombres.update(
+                    _texto(registro, campo) for campo in ('author', 'approver')
+                )
+                nombres.update(str(r).strip() for r in registro.get('recipients') or [])
+        nombres -= set(self.usuarios) | {''}
+        if nombres:
+            for usuario in User.objects.filter(username__in=nombres).only('id', 'username', 'departamento_id'):
+                self.usuarios[usuario.username] = usuario
+
+    def construir_memo(self, registro):
+        """Valida un registro y devuelve (memo, recipient_ids) sin guardar."""
+        subject = _texto(registro, 'subject')
+        body = registro.get('body') or ''
+        if not subject or not body:
+            raise ErrorImportacion('subject y body son obligatorios')
+        if len(subject) > 255:
+            raise ErrorImportacion('subject supera los 255 caracteres')
+
+        author = self.usuarios.get(_texto(registro, 'author'))
+        if author is None:
+            raise ErrorImportacion(f'Autor desconocido: {registro.get("author")}')
+
+        prefijo = _texto(registro, 'departamento')
+        if prefijo:
+            departamento = self.departamentos.get(prefijo)
+            if departamento is None:
+                raise ErrorImportacion(f'Departamento desconocido: {prefijo}')
+        else:
+            departamento = self.departamentos_por_id.get(author.departamento_id)
+
+        if _texto(registro, 'approver'):
+            approver = self.usuarios.get(_texto(registro, 'approver'))
+            if approver is None:
+                raise ErrorImportacion(f'Aprobador desconocido: {registro.get("approver")}')
+            approver_id = approver.id
+        else:
+            approver_id = departamento.director_id if departamento else None
+
+        recipients = [str(r).strip() for r in registro.get('recipients') or []]
+        if len(recipients) > MAX_RECIPIENTS:
+            raise ErrorImportacion(f'Máximo {MAX_RECIPIENTS} destinatarios permitidos')
+        desconocidos = [r for r in recipients if r not in self.usuarios]
+        if desconocidos:
+            raise ErrorImportacion(f'Destinatarios desconocidos: {", ".join(desconocidos)}')
+
+        estado = _texto(registro, 'status') or Memo.Status.DISTRIBUIDO
+        if estado not in Memo.Status.values:
+            raise ErrorImportacion(f'Estado inválido: {estado}')
+        prioridad = _texto(registro, 'prioridad') or Memo.Prioridad.NORMAL
+        if prioridad not in Memo.Prioridad.values:
+            raise ErrorImportacion(f'Prioridad inválida: {prioridad}')
+
+        memo = Memo(
+            numero_correlativo=_texto(registro, 'numero_correlativo') or None,
+            subject=subject,
+            body=body,
+            status=estado,
+            prioridad=prioridad,
+            confidencial=str(registro.get('confidencial', '')).strip().lower() in VALORES_VERDADEROS,
+            author_id=author.id,
+            approver_id=approver_id,
+            departamento=departamento,
+            approved_at=_fecha(registro.get('approved_at'), 'approved_at'),
+            fecha_distribucion=_fecha(registro.get('fecha_distribucion'), 'fecha_distribucion'),
+        )
+        memo.fecha_historica = _fecha(registro.get('created_at'), 'created_at') or timezone.now()
+        recipient_ids = list(dict.fromkeys(self.usuarios[r].id for r in recipients))
+        return memo, recipient_ids
+
+    def procesar_lote(self, lote):
+        self.cargar_usuarios(lote)
+
+        validos = []
+        for numero, registro in lote:
+            try:
+                if isinstance(registro, Exception):
+                    raise registro
+                if not isinstance(registro, dict):
+                    raise ErrorImportacion('El registro debe ser un objeto')
+                validos.append((numero, *self.construir_memo(registro)))
+            except ErrorImportacion as e:
+                self.registrar_error(numero, str(e))
+
+        # Correlativos heredados repetidos en el archivo o ya existentes en la base
+        heredados = Counter(memo.numero_correlativo for _, memo, _ in validos if memo.numero_correlativo)
+        existentes = set(
+            Memo.objects.filter(numero_correlativo__in=list(heredados)).values_list('numero_correlativo', flat=True)
+        )
+        vistos = set()
+        filtrados = []
+        for numero, memo, recipient_ids in validos:
+            correlativo = memo.numero_correlativo
+            if correlativo and (correlativo in existentes or correlativo in vistos):
+                self.registrar_error(numero, f'Correlativo duplicado: {correlativo}')
+                continue
+            vistos.add(correlativo)
+            filtrados.append((memo, recipient_ids))
+
+        if filtrados:
+            with transaction.atomic():
+                self.guardar(filtrados)
+            self.importados += len(filtrados)
+
+    def guardar(self, filas):
+        memos = [memo for memo, _ in filas]
+
+        # Un bloque contiguo de correlativos por (departamento, año, mes)
+        sin_numero = defaultdict(list)
+        for memo in memos:
+            if not memo.numero_correlativo and memo.status != Memo.Status.DRAFT and memo.departamento:
+                fecha = timezone.localtime(memo.fecha_historica)
+                sin_numero[(memo.departamento.id, fecha.year, fecha.month)].append(memo)
+        for (departamento_id, año, mes), grupo in sin_numero.items():
+            grupo.sort(key=lambda memo: memo.fecha_historica)
+            numeros = reservar_correlativos(self.departamentos_por_id[departamento_id], len(grupo), año, mes)
+            for memo, numero in zip(grupo, numeros):
+                memo.numero_correlativo = numero
+
+        Memo.objects.bulk_create(memos)
+
+        # bulk_create aplica auto_now_add/auto_now; las fechas históricas se fijan después
+        for memo in memos:
+            memo.created_at = memo.fecha_historica
+            memo.updated_at = memo.fecha_historica
+        Memo.objects.bulk_update(memos, ['created_at', 'updated_at'])
+
+        Through = Memo.recipients.through
+        Through.objects.bulk_create([
+            Through(memo_id=memo.id, user_id=user_id)
+            for memo, recipient_ids in filas
+            for user_id in recipient_ids
+        ])
+
+        entradas = []
+        for memo, recipient_ids in filas:
+            entradas.extend(calcular_entradas_buzon(memo, recipient_ids))
+        EntradaBuzon.objects.bulk_create(entradas)
+        ajustar_contadores(Counter((e.usuario_id, e.carpeta, e.status) for e in entradas))
+
+        search.indexar_memos(memos)
+
+
+def importar_memos(archivo, formato, tamaño_lote=TAMAÑO_LOTE):
+    """Importa un archivo JSONL o CSV y devuelve el resumen."""
+    if formato not in ('jsonl', 'csv'):
+        raise ValueError('Formato no soportado: use jsonl o csv')
+    return ImportadorMemos(tamaño_lote).importar(leer_registros(archivo, formato)).resumen()
@@ -0,0 +1,177 @@
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User, Departamento
+from memos.correlativos import MODO_BLOQUES, MODO_SECUENCIAL
+from memos.models import Memo, SecuenciaMemorando
+
+
+def enviar_memos(tareas):
+    """Ejecuta `submit` para cada (usuario_id, memo_id) con un cliente por hilo."""
+    def enviar(tarea):
+        usuario_id, memo_id = tarea
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(User.objects.get(pk=usuario_id))
+        inicio = time.monotonic()
+        try:
+            respuesta = client.post(f'/api/memos/{memo_id}/submit/')
+            return respuesta.status_code, time.monotonic() - inicio
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=enviar_memos.hilos) as executor:
+        return list(executor.map(enviar, tareas))
+
+
+def enviar_en_proceso(argumentos):
+    tareas, hilos = argumentos
+    # El proceso hijo no debe reutilizar las conexiones heredadas del padre
+    connections.close_all()
+    enviar_memos.hilos = hilos
+    return enviar_memos(tareas)
+
+
+class Command(BaseCommand):
+    help = (
+        'Envía a aprobación muchos memos en paralelo (hilos y procesos) y verifica '
+        'que los correlativos no se repitan ni, en modo secuencial, dejen huecos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--memos', type=int, default=200, help='Memos a enviar (default: 200)')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos por proceso (default: 8)')
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos (default: 1)')
+        parser.add_argument(
+            '--modo',
+            choices=[MODO_SECUENCIAL, MODO_BLOQUES],
+            help='Modo de asignación (por defecto, settings.CORRELATIVO_MODO)',
+        )
+        parser.add_argument(
+            '--conservar',
+            action='store_true',
+            help='No eliminar el departamento, usuarios y memos de prueba al terminar',
+        )
+
+    def handle(self, *args, **options):
+        if options['modo']:
+            settings.CORRELATIVO_MODO = options['modo']
+        modo = settings.CORRELATIVO_MODO
+        # Cliente de pruebas: host 'testserver' permitido y correo en memoria
+        setup_test_environment()
+
+        departamento, usuarios, memos = self.preparar(options['memos'], options['hilos'] * options['procesos'])
+        tareas = [(memo.author_id, memo.id) for memo in memos]
+
+        inicio = time.monotonic()
+        try:
+            resultados = self.ejecutar(tareas, options['hilos'], options['procesos'])
+            duracion = time.monotonic() - inicio
+            self.informar(departamento, modo, resultados, duracion)
+        finally:
+            if not options['conservar']:
+                self.limpiar(departamento, usuarios)
+
+    def preparar(self, total, autores):
+        sufijo = uuid.uuid4().hex[:6]
+        departamento = Departamento.objects.create(nombre=f'Benchmark {sufijo}', prefijo=f'B{sufijo[:5]}')
+        director = User.objects.create_user(
+            f'bench_dir_{sufijo}', f'bench_dir_{sufijo}@example.com', None,
+            role='DIRECTOR', departamento=departamento
+        )
+        departamento.director = director
+        departamento.save(update_fields=['director'])
+        usuarios = [
+            User.objects.create_user(
+                f'bench_{sufijo}_{i}', f'bench_{sufijo}_{i}@example.com', None,
+                role='SECONDARY_USER', departamento=departamento
+            )
+            for i in range(max(1, min(autores, total)))
+        ]
+        receptor = User.objects.create_user(
+            f'bench_rec_{sufijo}', f'bench_rec_{sufijo}@example.com', None,
+            role='AREA_USER', departamento=departamento
+        )
+        memos = Memo.objects.bulk_create([
+            Memo(
+                subject=f'Benchmark {i}',
+                body='Contenido del memo de benchmark',
+                author=usuarios[i % len(usuarios)],
+                approver=director,
+                departamento=departamento,
+            )
+            for i in range(total)
+        ])
+        Through = Memo.recipients.through
+        Through.objects.bulk_create([Through(memo_id=memo.id, user_id=receptor.id) for memo in memos])
+        return departamento, [director, receptor] + usuarios, memos
+
+    def ejecutar(self, tareas, hilos, procesos):
+        if procesos <= 1:
+            enviar_memos.hilos = hilos
+            return enviar_memos(tareas)
+
+        connections.close_all()
+        porciones = [(tareas[i::procesos], hilos) for i in range(procesos)]
+        with multiprocessing.get_context('fork').Pool(procesos) as pool:
+            return [resultado for porcion in pool.map(enviar_en_proceso, porciones) for resultado in porcion]
+
+    def informar(self, departamento, modo, resultados, duracion):
+        codigos = {}
+        for codigo, _ in resultados:
+            codigos[codigo] = codigos.get(codigo, 0) + 1
+        latencias = sorted(latencia for _, latencia in resultados)
+
+        correlativos = list(
+            Memo.objects.filter(departamento=departamento)
+            .exclude(numero_correlativo=None)
+            .values_list('numero_correlativo', flat=True)
+        )
+        numeros = [int(correlativo.rsplit('-', 1)[1]) for correlativo in correlativos]
+        duplicados = len(numeros) - len(set(numeros))
+        ahora = timezone.now()
+        secuencia = SecuenciaMemorando.objects.filter(
+            departamento=departamento, año=ahora.year, mes=ahora.month
+        ).values_list('ultima_secuencia', flat=True).first() or 0
+        huecos = sorted(set(range(1, secuencia + 1)) - set(numeros))
+
+        self.stdout.write(f'Modo: {modo}')
+        self.stdout.write(
+            f'Envíos: {len(resultados)} en {duracion:.2f}s ({len(resultados) / duracion:.1f}/s), '
+            f'respuestas: {codigos}'
+        )
+        if latencias:
+            self.stdout.write(
+                f'Latencia p50={latencias[len(latencias) // 2] * 1000:.1f}ms '
+                f'p95={latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f}ms '
+                f'max={latencias[-1] * 1000:.1f}ms'
+            )
+        self.stdout.write(
+            f'Correlativos asignados: {len(numeros)}, duplicados: {duplicados}, '
+            f'huecos: {len(huecos)}, última secuencia: {secuencia}'
+        )
+
+        errores = []
+        if codigos.get(200, 0) != len(resultados):
+            errores.append('hubo envíos fallidos')
+        if duplicados:
+            errores.append('hay correlativos duplicados')
+        if modo == MODO_SECUENCIAL and huecos:
+            errores.append(f'hay huecos en modo secuencial: {huecos[:10]}')
+        if errores:
+            raise CommandError('; '.join(errores))
+        self.stdout.write(self.style.SUCCESS('Sin duplicados' + (' ni huecos' if modo == MODO_SECUENCIAL else '')))
+
+    def limpiar(self, departamento, usuarios):
+        Memo.objects.filter(departamento=departamento).delete()
+        SecuenciaMemorando.objects.filter(departamento=departamento).delete()
+        User.objects.filter(id__in=[usuario.id for usuario in usuarios]).delete()
+        departamento.delete()
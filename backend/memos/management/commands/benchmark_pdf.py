@@ -0,0 +1,65 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from memos.models import Memo
+from memos.pdf import RenderizadorPDF
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide memos/segundo al generar PDF firmados creando un renderizador por '
+        'memo (comportamiento anterior) frente a un renderizador compartido'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--memos', type=int, default=50, help='Memos a renderizar (default: 50)')
+        parser.add_argument(
+            '--imagenes-prueba',
+            action='store_true',
+            help='Usar un sello y una firma PNG generados (600x600 y 900x300) en lugar de los de media/',
+        )
+
+    def handle(self, *args, **options):
+        memos = list(
+            Memo.objects.filter(approver__isnull=False)
+            .select_related('author', 'approver')
+            .prefetch_related('recipients')
+            .order_by('-id')[:options['memos']]
+        )
+        if not memos:
+            raise CommandError('No hay memos con aprobador para renderizar')
+
+        with tempfile.TemporaryDirectory() as temporal:
+            directorio = None
+            if options['imagenes_prueba']:
+                directorio = temporal
+                self.generar_imagenes(directorio)
+
+            sin_cache = self.medir(lambda memo: RenderizadorPDF(directorio).renderizar(memo), memos)
+            renderizador = RenderizadorPDF(directorio)
+            compartido = self.medir(renderizador.renderizar, memos)
+
+        self.stdout.write(f'Memos: {len(memos)}')
+        self.stdout.write(f'Renderizador por memo:   {len(memos) / sin_cache:.1f} memos/s')
+        self.stdout.write(f'Renderizador compartido: {len(memos) / compartido:.1f} memos/s')
+        self.stdout.write(self.style.SUCCESS(f'Mejora: x{sin_cache / compartido:.2f}'))
+
+    def medir(self, renderizar, memos):
+        inicio = time.perf_counter()
+        for memo in memos:
+            renderizar(memo)
+        return time.perf_counter() - inicio
+
+    def generar_imagenes(self, directorio):
+        from PIL import Image, ImageDraw
+
+        sello = Image.new('RGBA', (600, 600), (0, 0, 0, 0))
+        ImageDraw.Draw(sello).ellipse((20, 20, 580, 580), outline=(150, 0, 0, 255), width=24)
+        sello.save(os.path.join(directorio, 'seal.png'))
+
+        firma = Image.new('RGBA', (900, 300), (255, 255, 255, 0))
+        ImageDraw.Draw(firma).line([(30, 250), (300, 60), (520, 240), (870, 80)], fill=(0, 0, 90, 255), width=8)
+        firma.save(os.path.join(directorio, 'signature.png'))
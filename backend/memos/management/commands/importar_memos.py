@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from memos.importacion import TAMAÑO_LOTE, detectar_formato, importar_memos
+
+
+class Command(BaseCommand):
+    help = 'Importa memorandos históricos desde un archivo JSONL o CSV usando inserciones en bloque'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help='Archivo .jsonl o .csv')
+        parser.add_argument(
+            '--formato',
+            choices=['jsonl', 'csv'],
+            help='Formato del archivo (por defecto se deduce de la extensión)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TAMAÑO_LOTE,
+            help=f'Registros por lote (default: {TAMAÑO_LOTE})',
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['ruta']
+        formato = options['formato'] or detectar_formato(ruta)
+
+        inicio = time.monotonic()
+        try:
+            with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+                resumen = importar_memos(archivo, formato, options['batch_size'])
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir {ruta}: {e}')
+        duracion = time.monotonic() - inicio
+
+        for error in resumen['errores']:
+            self.stderr.write(f'  línea {error["linea"]}: {error["error"]}')
+        if resumen['total_errores'] > len(resumen['errores']):
+            self.stderr.write(f'  ... y {resumen["total_errores"] - len(resumen["errores"])} errores más')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{resumen["importados"]} memos importados en {duracion:.1f}s '
+                f'({resumen["total_errores"]} registros con errores)'
+            )
+        )
@@ -0,0 +1,33 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from memos.almacenamiento import migrar_adjunto
+from memos.models import MemoAttachment
+
+
+class Command(BaseCommand):
+    help = (
+        'Pasa los adjuntos guardados antes del almacenamiento por contenido a '
+        'memo_attachments/sha256/, dejando una sola copia de cada archivo'
+    )
+
+    def handle(self, *args, **options):
+        migrados = errores = liberados = 0
+        for attachment in MemoAttachment.objects.filter(contenido__isnull=True).iterator():
+            try:
+                anterior = migrar_adjunto(attachment)
+            except Exception as e:
+                errores += 1
+                self.stderr.write(f'  adjunto {attachment.id}: {str(e)}')
+                continue
+            migrados += 1
+            # El archivo anterior se borra cuando ningún otro adjunto lo usa
+            if not MemoAttachment.objects.filter(file=anterior).exists() and default_storage.exists(anterior):
+                liberados += default_storage.size(anterior)
+                default_storage.delete(anterior)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{migrados} adjuntos migrados, {liberados / (1024 * 1024):.1f} MB liberados'
+        ))
+        if errores:
+            self.stdout.write(self.style.WARNING(f'{errores} adjuntos no se pudieron migrar'))
@@ -0,0 +1,44 @@
+from memos.management.workers import ComandoWorkers
+from memos.models import NotificationOutbox
+from memos.notificaciones import ejecutar_notificaciones_pendientes, reintentar_fallidas
+
+
+class Command(ComandoWorkers):
+    help = (
+        'Envía las notificaciones pendientes del outbox por lotes, con reintentos y espera '
+        'exponencial; las que agotan los intentos quedan FALLIDA'
+    )
+    nombre_hilo = 'outbox'
+    elementos = 'notificaciones'
+    lote_default = 50
+    ayuda_lote = 'Notificaciones que reclama cada hilo por vuelta'
+    resumen = '{} notificaciones procesadas'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--canal',
+            action='append',
+            choices=NotificationOutbox.Canal.values,
+            help='Canal a atender (se puede repetir; default: todos)',
+        )
+        parser.add_argument(
+            '--reintentar-fallidas',
+            action='store_true',
+            help='Devolver a la cola las notificaciones FALLIDA antes de empezar',
+        )
+
+    def handle(self, *args, **options):
+        if options['reintentar_fallidas']:
+            self.stdout.write(f'{reintentar_fallidas()} notificaciones fallidas devueltas a la cola')
+        super().handle(*args, **options)
+
+    def procesar(self, options):
+        cantidad = 0
+        for canal in options['canal'] or NotificationOutbox.Canal.values:
+            try:
+                cantidad += ejecutar_notificaciones_pendientes(options['lote'], canal)
+            except Exception as e:
+                # Un canal con error no detiene a los demás; se reintenta en la siguiente vuelta
+                self.stderr.write(f'Error al procesar notificaciones ({canal}): {str(e)}')
+        return cantidad
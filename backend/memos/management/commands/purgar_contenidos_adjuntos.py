@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from memos.almacenamiento import purgar_contenidos, reconciliar_referencias
+
+
+class Command(BaseCommand):
+    help = (
+        'Corrige las referencias de los contenidos de adjuntos y elimina los '
+        'archivos que ningún adjunto usa'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa las referencias desviadas, sin corregir ni eliminar',
+        )
+
+    def handle(self, *args, **options):
+        desviados = reconciliar_referencias(aplicar=not options['dry_run'])
+        for contenido, actual, esperado in desviados:
+            self.stdout.write(f'  {contenido.sha256[:12]}: {actual} -> {esperado} referencias')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(desviados)} contenidos con referencias desviadas'))
+            return
+
+        cantidad, liberados = purgar_contenidos()
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(desviados)} referencias corregidas, {cantidad} contenidos eliminados '
+            f'({liberados / (1024 * 1024):.1f} MB)'
+        ))
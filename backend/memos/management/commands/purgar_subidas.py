@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from memos.subidas import purgar_subidas
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina las subidas por bloques sin actividad en SUBIDAS_EXPIRACION_HORAS, '
+        'con sus archivos parciales'
+    )
+
+    def handle(self, *args, **options):
+        cantidad = purgar_subidas()
+        self.stdout.write(self.style.SUCCESS(
+            f'{cantidad} subidas eliminadas (más de {settings.SUBIDAS_EXPIRACION_HORAS} h sin actividad)'
+        ))
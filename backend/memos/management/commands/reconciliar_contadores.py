@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from memos.services import reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara los contadores por carpeta con el buzón materializado y las '
+        'distribuciones sin acuse, y corrige las diferencias'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa las diferencias, sin corregirlas',
+        )
+
+    def handle(self, *args, **options):
+        diferencias = reconciliar_contadores(aplicar=not options['dry_run'])
+
+        for (usuario_id, carpeta, estado), actual, esperado in diferencias:
+            self.stdout.write(
+                f'  usuario={usuario_id} carpeta={carpeta} estado={estado or "-"}: '
+                f'{actual} -> {esperado}'
+            )
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Contadores consistentes'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(diferencias)} contadores desviados'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(diferencias)} contadores corregidos'))
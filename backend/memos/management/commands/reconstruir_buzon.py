@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from memos.models import Memo, EntradaBuzon
+from memos.services import calcular_entradas_buzon, reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el buzón materializado por usuario a partir de los memorandos existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Memorandos procesados por lote (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        memos = (
+            Memo.objects.only('id', 'author_id', 'approver_id', 'status', 'created_at')
+            .prefetch_related('recipients')
+            .order_by('id')
+        )
+
+        total_memos = 0
+        total_entradas = 0
+        with transaction.atomic():
+            EntradaBuzon.objects.all().delete()
+
+            lote = []
+            for memo in memos.iterator(chunk_size=batch_size):
+                lote.extend(calcular_entradas_buzon(memo))
+                total_memos += 1
+                if len(lote) >= batch_size:
+                    EntradaBuzon.objects.bulk_create(lote)
+                    total_entradas += len(lote)
+                    lote = []
+
+            if lote:
+                EntradaBuzon.objects.bulk_create(lote)
+                total_entradas += len(lote)
+
+            # Los contadores por carpeta se derivan del buzón
+            reconciliar_contadores()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Buzón reconstruido: {total_entradas} entradas para {total_memos} memorandos'
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from memos.search import motor_busqueda, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Regenera el índice de búsqueda de texto completo de los memorandos (SQLite FTS5)'
+
+    def handle(self, *args, **options):
+        motor = motor_busqueda()
+        if motor != 'fts5':
+            self.stdout.write(
+                self.style.WARNING(f'El motor de búsqueda "{motor}" no requiere reindexación.')
+            )
+            return
+
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda regenerado: {total} memorandos'))
@@ -0,0 +1,16 @@
+from memos.management.workers import ComandoWorkers
+from memos.trabajos import ejecutar_analisis_pendientes, ejecutar_pendientes
+
+
+class Command(ComandoWorkers):
+    help = (
+        'Procesa los trabajos de firma de PDF: genera el PDF firmado de los memos '
+        'aprobados, lo guarda y distribuye el memo, con reintentos y espera exponencial. '
+        'También analiza los adjuntos recién subidos'
+    )
+    nombre_hilo = 'firma-pdf'
+    ayuda_lote = 'Trabajos (y adjuntos) que reclama cada hilo por vuelta'
+    resumen = '{} trabajos de firma y adjuntos procesados'
+
+    def procesar(self, options):
+        return ejecutar_analisis_pendientes(options['lote']) + ejecutar_pendientes(options['lote'])
@@ -0,0 +1,86 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+
+class ComandoWorkers(BaseCommand):
+    """
+    Base de los comandos que procesan una cola con varios hilos (`run_workers`,
+    `process_outbox`). Cada hilo llama a `procesar` en bucle y espera
+    `--intervalo` cuando no hubo nada que hacer; SIGTERM/SIGINT detienen los
+    hilos al terminar la vuelta en curso. Las subclases definen `procesar` y
+    los textos de la ayuda.
+    """
+    nombre_hilo = 'worker'
+    elementos = 'trabajos'
+    lote_default = 5
+    ayuda_lote = 'Trabajos que reclama cada hilo por vuelta'
+    resumen = '{} trabajos procesados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Hilos de trabajo (default: 1)')
+        parser.add_argument(
+            '--lote', type=int, default=self.lote_default,
+            help=f'{self.ayuda_lote} (default: {self.lote_default})',
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=2.0,
+            help=f'Segundos de espera cuando no hay {self.elementos} disponibles (default: 2)',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help=f'Terminar cuando no queden {self.elementos} disponibles en lugar de seguir esperando',
+        )
+
+    def procesar(self, options):
+        """Una vuelta de un hilo: reclama y procesa un lote. Devuelve cuántos procesó."""
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        detener = threading.Event()
+        procesados = []
+        lock = threading.Lock()
+
+        def al_recibir_senal(signum, frame):
+            self.stdout.write('Deteniendo workers al terminar los lotes en curso...')
+            detener.set()
+
+        signal.signal(signal.SIGTERM, al_recibir_senal)
+        signal.signal(signal.SIGINT, al_recibir_senal)
+
+        def worker():
+            total = 0
+            try:
+                while not detener.is_set():
+                    close_old_connections()
+                    try:
+                        cantidad = self.procesar(options)
+                    except Exception as e:
+                        # Base de datos caída o bloqueada: se reintenta en la siguiente vuelta
+                        self.stderr.write(f'Error al procesar {self.elementos}: {str(e)}')
+                        cantidad = 0
+                    total += cantidad
+                    if cantidad == 0:
+                        if options['una_vez']:
+                            break
+                        detener.wait(options['intervalo'])
+            finally:
+                connections.close_all()
+                with lock:
+                    procesados.append(total)
+
+        hilos = [
+            threading.Thread(target=worker, name=f'{self.nombre_hilo}-{i}', daemon=True)
+            for i in range(max(1, options['workers']))
+        ]
+        for hilo in hilos:
+            hilo.start()
+        # join con timeout para que el hilo principal siga atendiendo señales
+        while any(hilo.is_alive() for hilo in hilos):
+            for hilo in hilos:
+                hilo.join(timeout=0.5)
+
+        self.stdout.write(self.style.SUCCESS(self.resumen.format(sum(procesados))))
@@ -0,0 +1,100 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:24
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_cargo_alter_user_role_departamento_and_more'),
+        ('memos', '0002_secuenciamemorando_memo_confidencial_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistribucionMemorando',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_destinatario', models.CharField(default='PRINCIPAL', help_text='PRINCIPAL o COPIA', max_length=20, verbose_name='Tipo de Destinatario')),
+                ('fecha_envio', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Envío')),
+                ('fecha_entrega', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Entrega')),
+                ('metodo', models.CharField(choices=[('SISTEMA', 'Sistema'), ('EMAIL', 'Email'), ('PUSH', 'Notificación Push')], default='SISTEMA', max_length=20, verbose_name='Método de Distribución')),
+                ('estado', models.CharField(choices=[('ENVIADO', 'Enviado'), ('ENTREGADO', 'Entregado'), ('ERROR', 'Error'), ('PENDIENTE', 'Pendiente')], default='ENVIADO', max_length=20, verbose_name='Estado')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Mensaje de Error')),
+                ('acuse_recibo', models.BooleanField(default=False, verbose_name='Acuse de Recibo')),
+                ('fecha_acuse', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Acuse')),
+            ],
+            options={
+                'verbose_name': 'Distribución de Memorando',
+                'verbose_name_plural': 'Distribuciones de Memorandos',
+                'db_table': 'distribuciones_memorandos',
+                'ordering': ['-fecha_envio'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='secuenciamemorando',
+            options={'ordering': ['-año', '-mes', 'departamento'], 'verbose_name': 'Secuencia de Memorando', 'verbose_name_plural': 'Secuencias de Memorandos'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='secuenciamemorando',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='secuenciamemorando',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización'),
+        ),
+        migrations.AddField(
+            model_name='secuenciamemorando',
+            name='creado_en',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Fecha de Creación'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='secuenciamemorando',
+            name='mes',
+            field=models.IntegerField(default=1, help_text='Mes (1-12)', validators=[django.core.validators.MaxValueValidator(12), django.core.validators.MinValueValidator(1)], verbose_name='Mes'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='secuenciamemorando',
+            name='prefijo',
+            field=models.CharField(blank=True, help_text='Caché del prefijo del departamento', max_length=10, null=True, verbose_name='Prefijo'),
+        ),
+        migrations.AlterField(
+            model_name='memo',
+            name='numero_correlativo',
+            field=models.CharField(blank=True, help_text='Formato: [Prefijo]-[Año]-[Mes]-[Secuencial]', max_length=50, null=True, unique=True, verbose_name='Número Correlativo'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='secuenciamemorando',
+            unique_together={('departamento', 'año', 'mes')},
+        ),
+        migrations.AddIndex(
+            model_name='secuenciamemorando',
+            index=models.Index(fields=['departamento', 'año', 'mes'], name='secuencias__departa_0391c6_idx'),
+        ),
+        migrations.AddField(
+            model_name='distribucionmemorando',
+            name='destinatario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distribuciones_recibidas', to=settings.AUTH_USER_MODEL, verbose_name='Destinatario'),
+        ),
+        migrations.AddField(
+            model_name='distribucionmemorando',
+            name='memorandum',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distribuciones', to='memos.memo', verbose_name='Memorando'),
+        ),
+        migrations.AddIndex(
+            model_name='distribucionmemorando',
+            index=models.Index(fields=['memorandum', 'destinatario'], name='distribucio_memoran_91a33f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='distribucionmemorando',
+            index=models.Index(fields=['estado', 'fecha_envio'], name='distribucio_estado_4f2ab9_idx'),
+        ),
+    ]
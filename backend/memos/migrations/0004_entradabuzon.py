@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0003_distribucionmemorando_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntradaBuzon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carpeta', models.CharField(choices=[('PROPIOS', 'Propios'), ('APROBACION', 'Para Aprobación'), ('RECIBIDOS', 'Recibidos'), ('BANDEJA', 'Bandeja General')], max_length=15, verbose_name='Carpeta')),
+                ('status', models.CharField(choices=[('DRAFT', 'Borrador'), ('PENDING_APPROVAL', 'Pendiente de Aprobación'), ('APPROVED', 'Aprobado'), ('REJECTED', 'Rechazado'), ('MODIFICACION_SOLICITADA', 'Modificación Solicitada'), ('DISTRIBUIDO', 'Distribuido')], max_length=25, verbose_name='Estado del Memo')),
+                ('sort_key', models.DateTimeField(verbose_name='Clave de Orden')),
+                ('memo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas_buzon', to='memos.memo', verbose_name='Memo')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buzon', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Buzón',
+                'verbose_name_plural': 'Entradas de Buzón',
+                'db_table': 'buzon_usuarios',
+                'indexes': [models.Index(fields=['usuario', 'carpeta', 'sort_key', 'memo'], name='buzon_usuar_usuario_586875_idx'), models.Index(fields=['usuario', 'carpeta', 'status', 'sort_key', 'memo'], name='buzon_usuar_usuario_4cc5bb_idx')],
+                'unique_together': {('usuario', 'carpeta', 'memo')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_cargo_alter_user_role_departamento_and_more'),
+        ('memos', '0004_entradabuzon'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='memo',
+            index=models.Index(fields=['author', 'status', 'created_at'], name='memos_author__84ac9b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memo',
+            index=models.Index(fields=['approver', 'status', 'created_at'], name='memos_approve_d32218_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memo',
+            index=models.Index(fields=['departamento', 'status', 'created_at'], name='memos_departa_bc1204_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# Las sentencias se escriben literalmente: la migración debe seguir creando el
+# mismo esquema aunque cambie memos.search.
+
+SQLITE_CREATE_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memos_fts USING fts5("
+    "numero_correlativo, subject, body, tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO memos_fts(memos_fts, rank) VALUES('rank', 'bm25(10.0, 10.0, 1.0)')",
+    "INSERT INTO memos_fts(rowid, numero_correlativo, subject, body) "
+    "SELECT id, coalesce(numero_correlativo, ''), subject, body FROM memos",
+]
+SQLITE_DROP_SQL = ["DROP TABLE IF EXISTS memos_fts"]
+
+POSTGRES_CREATE_SQL = [
+    "ALTER TABLE memos ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('spanish', coalesce(numero_correlativo, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(subject, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(body, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS memos_search_vector_gin ON memos USING GIN (search_vector)",
+]
+POSTGRES_DROP_SQL = [
+    "DROP INDEX IF EXISTS memos_search_vector_gin",
+    "ALTER TABLE memos DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def sqlite_fts5_disponible(conn):
+    """Comprueba si la biblioteca SQLite enlazada fue compilada con FTS5."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Algunas compilaciones cargan FTS5 sin declarar la opción
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+            return True
+        except Exception:
+            return False
+
+
+def crear_indice(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        sentencias = POSTGRES_CREATE_SQL
+    elif conn.vendor == 'sqlite' and sqlite_fts5_disponible(conn):
+        sentencias = SQLITE_CREATE_SQL
+    else:
+        # Sin índice invertido la búsqueda usa icontains
+        return
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+def eliminar_indice(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        sentencias = POSTGRES_DROP_SQL
+    elif conn.vendor == 'sqlite':
+        sentencias = SQLITE_DROP_SQL
+    else:
+        return
+    for sql in sentencias:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0005_indices_carpetas_por_rol'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
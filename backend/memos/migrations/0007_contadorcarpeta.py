@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0006_indice_busqueda_texto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorCarpeta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carpeta', models.CharField(max_length=15, verbose_name='Carpeta')),
+                ('status', models.CharField(blank=True, default='', max_length=25, verbose_name='Estado del Memo')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contadores', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Contador de Carpeta',
+                'verbose_name_plural': 'Contadores de Carpetas',
+                'db_table': 'contadores_carpetas',
+                'unique_together': {('usuario', 'carpeta', 'status')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0007_contadorcarpeta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contadorcarpeta',
+            name='version',
+            field=models.BigIntegerField(default=0, verbose_name='Versión'),
+        ),
+        migrations.AddField(
+            model_name='memo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+ANCHO_RUTA = 10
+
+
+def poblar_hilos(apps, schema_editor):
+    """Calcula raíz, profundidad y ruta de las respuestas existentes."""
+    Memo = apps.get_model('memos', 'Memo')
+    hilos = {}
+    pendientes = []
+    # Un padre siempre se crea antes que sus respuestas, así que basta recorrer por id
+    for memo_id, padre_id in Memo.objects.order_by('id').values_list('id', 'parent_memo_id').iterator():
+        if padre_id is None or padre_id not in hilos:
+            hilos[memo_id] = (None, 0, '')
+            continue
+        raiz, profundidad, ruta = hilos[padre_id]
+        hilos[memo_id] = (raiz or padre_id, profundidad + 1, f'{ruta}{padre_id:0{ANCHO_RUTA}d}/')
+        pendientes.append(Memo(id=memo_id, thread_root_id=hilos[memo_id][0],
+                               depth=hilos[memo_id][1], thread_path=hilos[memo_id][2]))
+    Memo.objects.bulk_update(pendientes, ['thread_root', 'depth', 'thread_path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_cargo_alter_user_role_departamento_and_more'),
+        ('memos', '0008_versiones_condicionales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memo',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Profundidad en el Hilo'),
+        ),
+        migrations.AddField(
+            model_name='memo',
+            name='thread_path',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Ruta en el Hilo'),
+        ),
+        migrations.AddField(
+            model_name='memo',
+            name='thread_root',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='thread_memos', to='memos.memo', verbose_name='Raíz del Hilo'),
+        ),
+        migrations.AddIndex(
+            model_name='memo',
+            index=models.Index(fields=['thread_root', 'thread_path'], name='memos_thread__3b8bc8_idx'),
+        ),
+        migrations.RunPython(poblar_hilos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def marcar_firmados(apps, schema_editor):
+    """Los memos que ya tienen PDF firmado quedan como listos."""
+    Memo = apps.get_model('memos', 'Memo')
+    Memo.objects.exclude(signed_file__isnull=True).exclude(signed_file='').update(signed_file_status='LISTO')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0009_hilo_materializado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memo',
+            name='signed_file_status',
+            field=models.CharField(blank=True, choices=[('PENDIENTE', 'Pendiente'), ('LISTO', 'Listo'), ('FALLIDO', 'Fallido')], default='', max_length=10, verbose_name='Estado del Archivo Firmado'),
+        ),
+        migrations.CreateModel(
+            name='TrabajoFirmaPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('COMPLETADO', 'Completado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=15, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible Desde')),
+                ('reclamado_por', models.CharField(blank=True, default='', max_length=64, verbose_name='Reclamado Por')),
+                ('reclamado_en', models.DateTimeField(blank=True, null=True, verbose_name='Reclamado En')),
+                ('ultimo_error', models.TextField(blank=True, default='', verbose_name='Último Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('completado_en', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Término')),
+                ('memo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_firma', to='memos.memo', verbose_name='Memorando')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Firma PDF',
+                'verbose_name_plural': 'Trabajos de Firma PDF',
+                'db_table': 'trabajos_firma_pdf',
+                'ordering': ['disponible_en', 'id'],
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='trabajos_fi_estado_8cc92c_idx')],
+            },
+        ),
+        migrations.RunPython(marcar_firmados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-16 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0010_trabajos_firma_pdf'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memoattachment',
+            name='analizado_en',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Análisis'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='analizado_por',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Analizado Por'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='archivo_normalizado',
+            field=models.FileField(blank=True, null=True, upload_to='memo_attachments/normalizados/', verbose_name='PDF Normalizado'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='error_analisis',
+            field=models.TextField(blank=True, default='', verbose_name='Error del Análisis'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='estado_analisis',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('VALIDO', 'Válido'), ('INVALIDO', 'Inválido')], default='PENDIENTE', max_length=10, verbose_name='Estado del Análisis'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='paginas',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Páginas'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='tipo_detectado',
+            field=models.CharField(blank=True, default='', max_length=10, verbose_name='Tipo Detectado'),
+        ),
+        migrations.AddIndex(
+            model_name='memoattachment',
+            index=models.Index(fields=['estado_analisis', 'analizado_en'], name='memo_attach_estado__5f8683_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0011_analisis_adjuntos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContenidoAdjunto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('archivo', models.FileField(max_length=255, upload_to='', verbose_name='Archivo')),
+                ('tamaño', models.BigIntegerField(verbose_name='Tamaño (bytes)')),
+                ('referencias', models.PositiveIntegerField(default=0, verbose_name='Referencias')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Contenido de Adjunto',
+                'verbose_name_plural': 'Contenidos de Adjuntos',
+                'db_table': 'contenidos_adjuntos',
+            },
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='nombre_original',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Nombre Original'),
+        ),
+        migrations.AddField(
+            model_name='memoattachment',
+            name='contenido',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='adjuntos', to='memos.contenidoadjunto', verbose_name='Contenido'),
+        ),
+    ]
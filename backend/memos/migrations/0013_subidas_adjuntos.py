@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0012_contenido_adjuntos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaAdjunto',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre_original', models.CharField(max_length=255, verbose_name='Nombre Original')),
+                ('tamaño', models.BigIntegerField(verbose_name='Tamaño (bytes)')),
+                ('recibido', models.BigIntegerField(default=0, verbose_name='Bytes Recibidos')),
+                ('estado', models.CharField(choices=[('EN_CURSO', 'En Curso'), ('COMPLETADA', 'Completada')], default='EN_CURSO', max_length=10, verbose_name='Estado')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Inicio')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actividad')),
+                ('adjunto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='memos.memoattachment', verbose_name='Adjunto Creado')),
+                ('memo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to='memos.memo', verbose_name='Memo')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Subida de Adjunto',
+                'verbose_name_plural': 'Subidas de Adjuntos',
+                'db_table': 'subidas_adjuntos',
+                'indexes': [models.Index(fields=['memo', 'estado'], name='subidas_adj_memo_id_b85ed1_idx'), models.Index(fields=['estado', 'updated_at'], name='subidas_adj_estado_9af112_idx')],
+            },
+        ),
+    ]
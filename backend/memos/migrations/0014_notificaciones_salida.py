@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0013_subidas_adjuntos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento', models.CharField(max_length=30, verbose_name='Evento')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('asunto', models.CharField(max_length=255, verbose_name='Asunto')),
+                ('mensaje', models.TextField(verbose_name='Mensaje')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('ENVIADA', 'Enviada'), ('ERROR', 'Error')], default='PENDIENTE', max_length=15, verbose_name='Estado')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('reclamado_por', models.CharField(blank=True, default='', max_length=64, verbose_name='Reclamado Por')),
+                ('reclamado_en', models.DateTimeField(blank=True, null=True, verbose_name='Reclamado En')),
+                ('ultimo_error', models.TextField(blank=True, default='', verbose_name='Último Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('enviado_en', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Envío')),
+                ('destinatario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Destinatario')),
+                ('distribucion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='memos.distribucionmemorando', verbose_name='Distribución')),
+                ('memo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='memos.memo', verbose_name='Memorando')),
+            ],
+            options={
+                'verbose_name': 'Notificación Pendiente',
+                'verbose_name_plural': 'Notificaciones Pendientes',
+                'db_table': 'notificaciones_salida',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['estado', 'created_at'], name='notificacio_estado_401914_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:11
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def errores_a_fallidas(apps, schema_editor):
+    """Las notificaciones en ERROR no se reintentaban: pasan a FALLIDA."""
+    NotificationOutbox = apps.get_model('memos', 'NotificationOutbox')
+    NotificationOutbox.objects.filter(estado='ERROR').update(estado='FALLIDA')
+    NotificationOutbox.objects.update(disponible_en=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0015_notificacion_pendiente_unica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='notificationoutbox',
+            options={'ordering': ['disponible_en', 'id'], 'verbose_name': 'Notificación Pendiente', 'verbose_name_plural': 'Notificaciones Pendientes'},
+        ),
+        migrations.RemoveIndex(
+            model_name='notificationoutbox',
+            name='notificacio_estado_401914_idx',
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='canal',
+            field=models.CharField(choices=[('EMAIL', 'Email')], default='EMAIL', max_length=10, verbose_name='Canal'),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='disponible_en',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponible Desde'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('ENVIADA', 'Enviada'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=15, verbose_name='Estado'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationoutbox',
+            index=models.Index(fields=['canal', 'estado', 'disponible_en'], name='notificacio_canal_01da1d_idx'),
+        ),
+        migrations.RunPython(errores_a_fallidas, migrations.RunPython.noop),
+    ]
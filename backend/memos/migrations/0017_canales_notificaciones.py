@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+def crear_canales(apps, schema_editor):
+    CanalNotificacion = apps.get_model('memos', 'CanalNotificacion')
+    CanalNotificacion.objects.get_or_create(canal='EMAIL')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('memos', '0016_reintentos_notificaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanalNotificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canal', models.CharField(choices=[('EMAIL', 'Email')], max_length=10, unique=True, verbose_name='Canal')),
+                ('bloqueado_en', models.DateTimeField(blank=True, null=True, verbose_name='Último Reclamo')),
+            ],
+            options={
+                'verbose_name': 'Canal de Notificaciones',
+                'verbose_name_plural': 'Canales de Notificaciones',
+                'db_table': 'canales_notificaciones',
+            },
+        ),
+        migrations.RunPython(crear_canales, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 import json
+import os
+import uuid
 
 
 class SecuenciaMemorando(models.Model):
@@ -58,6 +61,11 @@ class Memo(models.Model):
         ALTA = 'alta', 'Alta'
         URGENTE = 'urgente', 'Urgente'
 
+    class EstadoFirma(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        LISTO = 'LISTO', 'Listo'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
     # Campos básicos
     numero_correlativo = models.CharField(
         max_length=50,
@@ -121,10 +129,25 @@ class Memo(models.Model):
         verbose_name='Memo Padre'
     )
     
+    # Hilo materializado: raíz de la conversación (None en la propia raíz),
+    # nivel y ruta de ancestros (ids de THREAD_PATH_WIDTH dígitos separados por '/')
+    thread_root = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='thread_memos',
+        verbose_name='Raíz del Hilo'
+    )
+    depth = models.PositiveSmallIntegerField(default=0, verbose_name='Profundidad en el Hilo')
+    thread_path = models.CharField(max_length=255, blank=True, default='', verbose_name='Ruta en el Hilo')
+    
     # Fechas
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
     approved_at = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Aprobación')
     fecha_distribucion = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Distribución')
+    # Marca de cambio para las validaciones condicionales (ETag / Last-Modified)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de Modificación')
     
     # Archivos
     signed_file = models.FileField(
@@ -133,6 +156,14 @@ class Memo(models.Model):
         blank=True,
         verbose_name='Archivo Firmado'
     )
+    # Lo actualiza el trabajo de firma (TrabajoFirmaPDF); vacío si nunca se aprobó
+    signed_file_status = models.CharField(
+        max_length=10,
+        choices=EstadoFirma.choices,
+        blank=True,
+        default='',
+        verbose_name='Estado del Archivo Firmado'
+    )
     
     # Firma digital y sello
     sello_digital = models.JSONField(
@@ -162,15 +193,107 @@ class Memo(models.Model):
         indexes = [
             models.Index(fields=['numero_correlativo']),
             models.Index(fields=['status', 'created_at']),
+            # Carpetas por rol de get_queryset: filtro por igualdad y orden por -created_at
+            models.Index(fields=['author', 'status', 'created_at']),
+            models.Index(fields=['approver', 'status', 'created_at']),
+            models.Index(fields=['departamento', 'status', 'created_at']),
+            # Hilos: conversación completa y subárboles por rango de ruta
+            models.Index(fields=['thread_root', 'thread_path']),
         ]
 
+    THREAD_PATH_WIDTH = 10
+
     def __str__(self):
         correlativo = self.numero_correlativo or 'Sin correlativo'
         return f"{correlativo} - {self.subject} - {self.get_status_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        memo = super().from_db(db, field_names, values)
+        # Estado tal como se leyó: post_save lo compara con el nuevo para
+        # notificar el cambio sin volver a consultar el memo. Vive en la
+        # instancia, así que cada request/hilo ve solo el suyo
+        if 'status' in memo.__dict__:
+            memo._status_guardado = memo.status
+        return memo
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'status' in fields:
+            self._status_guardado = self.status
+
+    @property
+    def status_guardado(self):
+        """Estado que tiene el memo en la base (antes de los cambios en memoria)."""
+        return getattr(self, '_status_guardado', None)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_memo_id and not self.thread_path:
+            self.asignar_hilo(self.parent_memo)
+        if self.pk is not None and 'status' in self.__dict__ and not hasattr(self, '_status_guardado'):
+            # Instancia armada a mano con un pk existente: no hay estado leído
+            self._status_guardado = (
+                type(self)._base_manager.filter(pk=self.pk).values_list('status', flat=True).first()
+            )
+        # post_save encola las notificaciones del cambio de estado: así quedan
+        # en la misma transacción que el memo aunque el llamador no abra una
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if 'status' in self.__dict__ and (update_fields is None or 'status' in update_fields):
+            self._status_guardado = self.status
+
+    def asignar_hilo(self, padre):
+        """Deriva raíz, profundidad y ruta del hilo a partir del memo padre."""
+        self.thread_root_id = padre.thread_root_id or padre.id
+        self.depth = padre.depth + 1
+        self.thread_path = padre.ruta_descendientes
+
+    @property
+    def ruta_descendientes(self):
+        """Prefijo de `thread_path` que comparten todas las respuestas de este memo."""
+        return f'{self.thread_path}{self.id:0{self.THREAD_PATH_WIDTH}d}/'
+
+    @property
+    def raiz_hilo_id(self):
+        return self.thread_root_id or self.id
+
+
+class ContenidoAdjunto(models.Model):
+    """
+    Archivo físico de los adjuntos, guardado una sola vez por contenido en
+    `memo_attachments/sha256/ab/cd/<sha256><ext>` y compartido por todos los
+    adjuntos idénticos (ver `memos/almacenamiento.py`).
+    """
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='SHA-256')
+    archivo = models.FileField(max_length=255, verbose_name='Archivo')
+    tamaño = models.BigIntegerField(verbose_name='Tamaño (bytes)')
+    # Adjuntos que lo usan; en 0 lo elimina `purgar_contenidos_adjuntos`
+    referencias = models.PositiveIntegerField(default=0, verbose_name='Referencias')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+
+    class Meta:
+        db_table = 'contenidos_adjuntos'
+        verbose_name = 'Contenido de Adjunto'
+        verbose_name_plural = 'Contenidos de Adjuntos'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.referencias} referencias)"
+
 
 class MemoAttachment(models.Model):
-    """Adjuntos de memorandos con validación de tamaño y formato."""
+    """
+    Adjuntos de memorandos con validación de tamaño y formato. El archivo se
+    guarda por contenido (`ContenidoAdjunto`). Al subirlos quedan pendientes
+    de análisis: `run_workers` detecta su tipo real, cuenta las páginas y
+    guarda una copia normalizada de los PDF (ver `memos/adjuntos.py`).
+    """
+    class EstadoAnalisis(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_PROCESO = 'EN_PROCESO', 'En Proceso'
+        VALIDO = 'VALIDO', 'Válido'
+        INVALIDO = 'INVALIDO', 'Inválido'
+
     memo = models.ForeignKey(
         Memo,
         on_delete=models.CASCADE,
@@ -189,16 +312,121 @@ class MemoAttachment(models.Model):
     )
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Subida')
     file_size = models.BigIntegerField(null=True, blank=True, verbose_name='Tamaño del Archivo (bytes)')
+    # `file` apunta al archivo de `contenido`; el nombre con que se subió se
+    # conserva aparte
+    contenido = models.ForeignKey(
+        ContenidoAdjunto,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='adjuntos',
+        verbose_name='Contenido'
+    )
+    nombre_original = models.CharField(max_length=255, blank=True, default='', verbose_name='Nombre Original')
+    estado_analisis = models.CharField(
+        max_length=10,
+        choices=EstadoAnalisis.choices,
+        default=EstadoAnalisis.PENDIENTE,
+        verbose_name='Estado del Análisis'
+    )
+    # pdf, docx, xlsx u ole (DOC/XLS); vacío si no se reconoce
+    tipo_detectado = models.CharField(max_length=10, blank=True, default='', verbose_name='Tipo Detectado')
+    paginas = models.PositiveIntegerField(null=True, blank=True, verbose_name='Páginas')
+    archivo_normalizado = models.FileField(
+        upload_to='memo_attachments/normalizados/',
+        null=True,
+        blank=True,
+        verbose_name='PDF Normalizado'
+    )
+    error_analisis = models.TextField(blank=True, default='', verbose_name='Error del Análisis')
+    # Token del worker que lo analiza; `analizado_en` es el momento del
+    # reclamo mientras está EN_PROCESO y el del resultado después
+    analizado_por = models.CharField(max_length=64, blank=True, default='', verbose_name='Analizado Por')
+    analizado_en = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Análisis')
 
     class Meta:
         db_table = 'memo_attachments'
         verbose_name = 'Adjunto de Memorándum'
         verbose_name_plural = 'Adjuntos de Memorándums'
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['estado_analisis', 'analizado_en']),
+        ]
 
     def __str__(self):
         return f"{self.memo.subject} - {self.file.name}"
 
+    @property
+    def extension(self):
+        """Extensión con que se subió (el archivo guardado puede tener otra)."""
+        return os.path.splitext(self.nombre_original or self.file.name)[1].lower()
+
+    @property
+    def se_incluye_en_pdf(self):
+        """
+        Si se agrega al PDF firmado: los PDF válidos y, si otro worker lo está
+        analizando en ese momento, el original (se omite si no se puede leer).
+        """
+        if self.estado_analisis == self.EstadoAnalisis.VALIDO:
+            return self.tipo_detectado == 'pdf'
+        return self.estado_analisis != self.EstadoAnalisis.INVALIDO
+
+
+class SubidaAdjunto(models.Model):
+    """
+    Subida de un adjunto por bloques, reanudable. Los bloques se escriben en
+    un archivo parcial (`SUBIDAS_DIR/<id>.part`); al completarse se convierte
+    en un MemoAttachment (ver `memos/subidas.py`).
+    """
+    class Estado(models.TextChoices):
+        EN_CURSO = 'EN_CURSO', 'En Curso'
+        COMPLETADA = 'COMPLETADA', 'Completada'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    memo = models.ForeignKey(
+        Memo,
+        on_delete=models.CASCADE,
+        related_name='subidas',
+        verbose_name='Memo'
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Usuario'
+    )
+    nombre_original = models.CharField(max_length=255, verbose_name='Nombre Original')
+    # Tamaño declarado al iniciar; queda reservado en el límite del memo
+    tamaño = models.BigIntegerField(verbose_name='Tamaño (bytes)')
+    recibido = models.BigIntegerField(default=0, verbose_name='Bytes Recibidos')
+    estado = models.CharField(
+        max_length=10,
+        choices=Estado.choices,
+        default=Estado.EN_CURSO,
+        verbose_name='Estado'
+    )
+    adjunto = models.ForeignKey(
+        MemoAttachment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Adjunto Creado'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Inicio')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última Actividad')
+
+    class Meta:
+        db_table = 'subidas_adjuntos'
+        verbose_name = 'Subida de Adjunto'
+        verbose_name_plural = 'Subidas de Adjuntos'
+        indexes = [
+            models.Index(fields=['memo', 'estado']),
+            models.Index(fields=['estado', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre_original} ({self.recibido}/{self.tamaño} bytes, {self.estado})"
+
 
 class DistribucionMemorando(models.Model):
     """Registro de distribución de memorandos a destinatarios."""
@@ -262,3 +490,245 @@ class DistribucionMemorando(models.Model):
     def __str__(self):
         return f"{self.memorandum.numero_correlativo} -> {self.destinatario.username} ({self.estado})"
 
+
+class EntradaBuzon(models.Model):
+    """
+    Buzón materializado por usuario: una fila por cada memorando visible en
+    cada carpeta del usuario, ordenada por `sort_key` (fecha de creación del memo).
+
+    Las carpetas reflejan las ramas de `MemoViewSet.get_queryset`:
+    - PROPIOS: memos de los que el usuario es autor.
+    - APROBACION: memos de los que el usuario es aprobador.
+    - RECIBIDOS: memos aprobados o distribuidos de los que es destinatario.
+    - BANDEJA: unión de PROPIOS y RECIBIDOS (carpeta por defecto del receptor).
+
+    Se mantiene desde `services.actualizar_buzon` y se reconstruye con el
+    comando `reconstruir_buzon`.
+    """
+    class Carpeta(models.TextChoices):
+        PROPIOS = 'PROPIOS', 'Propios'
+        APROBACION = 'APROBACION', 'Para Aprobación'
+        RECIBIDOS = 'RECIBIDOS', 'Recibidos'
+        BANDEJA = 'BANDEJA', 'Bandeja General'
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='buzon',
+        verbose_name='Usuario'
+    )
+    memo = models.ForeignKey(
+        Memo,
+        on_delete=models.CASCADE,
+        related_name='entradas_buzon',
+        verbose_name='Memo'
+    )
+    carpeta = models.CharField(max_length=15, choices=Carpeta.choices, verbose_name='Carpeta')
+    status = models.CharField(
+        max_length=25,
+        choices=Memo.Status.choices,
+        verbose_name='Estado del Memo'
+    )
+    sort_key = models.DateTimeField(verbose_name='Clave de Orden')
+
+    class Meta:
+        db_table = 'buzon_usuarios'
+        verbose_name = 'Entrada de Buzón'
+        verbose_name_plural = 'Entradas de Buzón'
+        unique_together = [['usuario', 'carpeta', 'memo']]
+        indexes = [
+            models.Index(fields=['usuario', 'carpeta', 'sort_key', 'memo']),
+            models.Index(fields=['usuario', 'carpeta', 'status', 'sort_key', 'memo']),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} [{self.carpeta}] -> {self.memo_id}"
+
+
+class ContadorCarpeta(models.Model):
+    """
+    Totales materializados por usuario, carpeta y estado para los indicadores
+    del dashboard. Se ajustan en la misma transacción que el buzón
+    (`services.actualizar_buzon`) y se reparan con `reconciliar_contadores`.
+
+    La carpeta NO_LEIDOS (estado vacío) cuenta las distribuciones del usuario
+    sin acuse de recibo.
+    """
+    NO_LEIDOS = 'NO_LEIDOS'
+
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='contadores',
+        verbose_name='Usuario'
+    )
+    carpeta = models.CharField(max_length=15, verbose_name='Carpeta')
+    status = models.CharField(max_length=25, blank=True, default='', verbose_name='Estado del Memo')
+    total = models.IntegerField(default=0, verbose_name='Total')
+    # Se incrementa con cada cambio de un memo de la carpeta; identifica la
+    # versión del listado para las respuestas 304
+    version = models.BigIntegerField(default=0, verbose_name='Versión')
+
+    class Meta:
+        db_table = 'contadores_carpetas'
+        verbose_name = 'Contador de Carpeta'
+        verbose_name_plural = 'Contadores de Carpetas'
+        unique_together = [['usuario', 'carpeta', 'status']]
+
+    def __str__(self):
+        return f"{self.usuario_id} [{self.carpeta}/{self.status}]: {self.total}"
+
+
+
+class TrabajoFirmaPDF(models.Model):
+    """
+    Trabajo persistente que genera el PDF firmado de un memo aprobado y lo
+    distribuye. Lo encola la aprobación y lo ejecuta `run_workers`
+    (ver `memos/trabajos.py`).
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_PROCESO = 'EN_PROCESO', 'En Proceso'
+        COMPLETADO = 'COMPLETADO', 'Completado'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
+    memo = models.ForeignKey(
+        Memo,
+        on_delete=models.CASCADE,
+        related_name='trabajos_firma',
+        verbose_name='Memorando'
+    )
+    estado = models.CharField(
+        max_length=15,
+        choices=Estado.choices,
+        default=Estado.PENDIENTE,
+        verbose_name='Estado'
+    )
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    disponible_en = models.DateTimeField(default=timezone.now, verbose_name='Disponible Desde')
+    # Token del worker que lo reclamó y momento del reclamo (para recuperar
+    # trabajos de workers caídos)
+    reclamado_por = models.CharField(max_length=64, blank=True, default='', verbose_name='Reclamado Por')
+    reclamado_en = models.DateTimeField(null=True, blank=True, verbose_name='Reclamado En')
+    ultimo_error = models.TextField(blank=True, default='', verbose_name='Último Error')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    completado_en = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Término')
+
+    class Meta:
+        db_table = 'trabajos_firma_pdf'
+        verbose_name = 'Trabajo de Firma PDF'
+        verbose_name_plural = 'Trabajos de Firma PDF'
+        ordering = ['disponible_en', 'id']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_en']),
+        ]
+
+    def __str__(self):
+        return f"Firma memo {self.memo_id} ({self.estado}, intento {self.intentos})"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notificación pendiente de envío (outbox). Se crea en la misma transacción
+    que el cambio que la origina y la envía `process_outbox`, fuera de esa
+    transacción, con reintentos (ver `memos/notificaciones.py`).
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        EN_PROCESO = 'EN_PROCESO', 'En Proceso'
+        ENVIADA = 'ENVIADA', 'Enviada'
+        # Agotó los intentos (dead-letter); solo se reenvía a mano
+        FALLIDA = 'FALLIDA', 'Fallida'
+
+    class Canal(models.TextChoices):
+        EMAIL = 'EMAIL', 'Email'
+
+    memo = models.ForeignKey(
+        Memo,
+        on_delete=models.CASCADE,
+        related_name='notificaciones',
+        verbose_name='Memorando'
+    )
+    destinatario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Destinatario'
+    )
+    # Distribución cuyo estado se actualiza al enviar (solo las de distribución)
+    distribucion = models.ForeignKey(
+        DistribucionMemorando,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notificaciones',
+        verbose_name='Distribución'
+    )
+    evento = models.CharField(max_length=30, verbose_name='Evento')
+    canal = models.CharField(
+        max_length=10,
+        choices=Canal.choices,
+        default=Canal.EMAIL,
+        verbose_name='Canal'
+    )
+    email = models.EmailField(verbose_name='Email')
+    asunto = models.CharField(max_length=255, verbose_name='Asunto')
+    mensaje = models.TextField(verbose_name='Mensaje')
+    estado = models.CharField(
+        max_length=15,
+        choices=Estado.choices,
+        default=Estado.PENDIENTE,
+        verbose_name='Estado'
+    )
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')
+    disponible_en = models.DateTimeField(default=timezone.now, verbose_name='Disponible Desde')
+    reclamado_por = models.CharField(max_length=64, blank=True, default='', verbose_name='Reclamado Por')
+    reclamado_en = models.DateTimeField(null=True, blank=True, verbose_name='Reclamado En')
+    ultimo_error = models.TextField(blank=True, default='', verbose_name='Último Error')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    enviado_en = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Envío')
+
+    class Meta:
+        db_table = 'notificaciones_salida'
+        verbose_name = 'Notificación Pendiente'
+        verbose_name_plural = 'Notificaciones Pendientes'
+        ordering = ['disponible_en', 'id']
+        indexes = [
+            models.Index(fields=['canal', 'estado', 'disponible_en']),
+        ]
+        constraints = [
+            # Un mismo aviso (memo, destinatario, evento) no se encola dos
+            # veces mientras el anterior no se haya enviado
+            models.UniqueConstraint(
+                fields=['memo', 'destinatario', 'evento'],
+                condition=models.Q(estado__in=['PENDIENTE', 'EN_PROCESO']),
+                name='notificacion_pendiente_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.evento} memo {self.memo_id} -> {self.email} ({self.estado})"
+
+
+class CanalNotificacion(models.Model):
+    """
+    Fila de bloqueo por canal de notificaciones. `notificaciones.cupo_canal`
+    la actualiza al comenzar cada reclamo: los reclamos del mismo canal se
+    serializan hasta el commit, así que el conteo de workers activos y la
+    marca de las notificaciones reclamadas no se intercalan.
+    """
+    canal = models.CharField(
+        max_length=10,
+        choices=NotificationOutbox.Canal.choices,
+        unique=True,
+        verbose_name='Canal'
+    )
+    bloqueado_en = models.DateTimeField(null=True, blank=True, verbose_name='Último Reclamo')
+
+    class Meta:
+        db_table = 'canales_notificaciones'
+        verbose_name = 'Canal de Notificaciones'
+        verbose_name_plural = 'Canales de Notificaciones'
+
+    def __str__(self):
+        return self.canal
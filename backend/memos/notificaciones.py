@@ -0,0 +1,330 @@
+"""
+Notificaciones en dos fases (outbox).
+
+1. La operación que origina la notificación (`distribuir_memorando`, los
+   cambios de estado del memo vía `signals.py` y las operaciones en lote)
+   crea las filas de NotificationOutbox con `bulk_create` en su propia
+   transacción, junto con el resto de sus cambios. Ningún request habla con
+   el servidor SMTP.
+2. `process_outbox` reclama las notificaciones disponibles de cada canal por
+   lotes (con el mismo mecanismo que los trabajos de firma, ver
+   `trabajos.reclamar`), las envía reutilizando una conexión SMTP para cada
+   NOTIFICACIONES_POR_CONEXION mensajes y registra el resultado con un UPDATE
+   por grupo: las enviadas y sus distribuciones (ENTREGADO, `fecha_entrega`)
+   en una sola actualización, y las fallidas por (error, intento).
+
+Reintentos: una notificación fallida vuelve a PENDIENTE con espera
+exponencial; agotados NOTIFICACIONES_MAX_INTENTOS queda FALLIDA (dead-letter)
+hasta que se reprograme a mano (`process_outbox --reintentar-fallidas`). Una
+notificación EN_PROCESO cuyo worker murió se vuelve a reclamar pasado
+NOTIFICACIONES_TIMEOUT segundos.
+
+Concurrencia: NOTIFICACIONES_CONCURRENCIA limita cuántos workers envían a la
+vez por cada canal; el resto no reclama hasta que se libere un lugar.
+
+Un mismo aviso (memo, destinatario, evento) no se encola dos veces mientras
+esté pendiente: la restricción `notificacion_pendiente_unica` descarta el
+duplicado en el INSERT. Así el destinatario de un memo distribuido recibe un
+solo correo aunque lo encolen la distribución y la señal de cambio de estado.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .correlativos import transaccion_con_reintentos
+from .eventos import eventos_entregas, publicar
+from .models import CanalNotificacion, DistribucionMemorando, Memo, NotificationOutbox
+from .trabajos import espera_reintento, reclamar
+
+logger = logging.getLogger(__name__)
+
+EVENTO_DISTRIBUCION = Memo.Status.DISTRIBUIDO
+
+
+def notificacion(memo, usuario, evento, asunto, mensaje, distribucion=None):
+    """Notificación (sin guardar) para `usuario`; None si no tiene email."""
+    if usuario is None or not usuario.email:
+        return None
+    return NotificationOutbox(
+        memo_id=memo.id,
+        destinatario_id=usuario.id,
+        distribucion_id=distribucion.id if distribucion else None,
+        evento=evento,
+        email=usuario.email,
+        asunto=asunto[:255],
+        mensaje=mensaje,
+    )
+
+
+def notificacion_distribucion(memo, destinatario, distribucion=None):
+    """Notificación (sin guardar) de un memo distribuido a un destinatario."""
+    fecha = memo.approved_at.strftime("%d/%m/%Y %H:%M") if memo.approved_at else "N/A"
+    mensaje = f'''
+Has recibido un nuevo memorando:
+
+Número: {memo.numero_correlativo or "N/A"}
+Asunto: {memo.subject}
+Remitente: {memo.author.nombre_completo or memo.author.username}
+Departamento: {memo.departamento.nombre if memo.departamento else "N/A"}
+Fecha: {fecha}
+
+Puede acceder al memorando desde el sistema.
+    '''
+    return notificacion(
+        memo, destinatario, EVENTO_DISTRIBUCION,
+        f'Nuevo Memorando Recibido: {memo.subject}', mensaje, distribucion
+    )
+
+
+def notificaciones_cambio_estado(memo, old_status):
+    """
+    Notificaciones (sin guardar) del cambio de estado de un memo desde
+    `old_status`. Los destinatarios no se avisan al aprobar: reciben un único
+    aviso cuando el memo se distribuye, justo después.
+    """
+    Status = Memo.Status
+    if old_status == memo.status:
+        return []
+
+    autor = memo.author.get_full_name() or memo.author.username
+    if memo.status == Status.APPROVED:
+        aprobador = (memo.approver.get_full_name() or memo.approver.username) if memo.approver else 'N/A'
+        avisos = [notificacion(
+            memo, memo.author, Status.APPROVED,
+            f'Su memo ha sido aprobado: {memo.subject}',
+            f'Su memo "{memo.subject}" ha sido aprobado por {aprobador}.',
+        )]
+    elif memo.status == Status.REJECTED:
+        mensaje = f'Su memo "{memo.subject}" ha sido rechazado.'
+        if memo.rejection_reason:
+            mensaje += f'\n\nMotivo: {memo.rejection_reason}'
+        avisos = [notificacion(
+            memo, memo.author, Status.REJECTED, f'Su memo ha sido rechazado: {memo.subject}', mensaje
+        )]
+    elif memo.status == Status.PENDING_APPROVAL:
+        avisos = [notificacion(
+            memo, memo.approver, Status.PENDING_APPROVAL,
+            f'Nuevo memo pendiente de aprobación: {memo.subject}',
+            f'El memo "{memo.subject}" de {autor} está pendiente de su aprobación.',
+        )]
+    elif memo.status == Status.DISTRIBUIDO:
+        avisos = [notificacion_distribucion(memo, destinatario) for destinatario in memo.recipients.all()]
+    elif memo.status == Status.MODIFICACION_SOLICITADA:
+        comentarios = memo.modificacion_solicitada or 'Sin comentarios específicos'
+        avisos = [notificacion(
+            memo, memo.author, Status.MODIFICACION_SOLICITADA,
+            f'Modificaciones solicitadas en su memo: {memo.subject}',
+            f'Su memo "{memo.subject}" requiere modificaciones.\n\nComentarios:\n{comentarios}\n\n'
+            'El memo ha sido retornado a borrador para que pueda realizar los cambios necesarios.',
+        )]
+    else:
+        avisos = []
+    return [aviso for aviso in avisos if aviso is not None]
+
+
+def encolar(notificaciones):
+    """
+    Guarda las notificaciones con un solo INSERT. Los avisos repetidos (en la
+    lista o ya pendientes en la tabla) se descartan.
+    """
+    unicas = {}
+    for aviso in notificaciones:
+        if aviso is not None:
+            unicas.setdefault((aviso.memo_id, aviso.destinatario_id, aviso.evento), aviso)
+    if not unicas:
+        return []
+    return NotificationOutbox.objects.bulk_create(unicas.values(), ignore_conflicts=True)
+
+
+def encolar_distribucion(memo, distribuciones):
+    """
+    Encola las notificaciones de las distribuciones cuyos destinatarios
+    tienen email. Debe llamarse en la transacción que crea las distribuciones.
+    """
+    return encolar([
+        notificacion_distribucion(memo, distribucion.destinatario, distribucion)
+        for distribucion in distribuciones
+    ])
+
+
+def cupo_canal(canal, limite, vigentes_desde):
+    """
+    Cupo de reclamo del canal según NOTIFICACIONES_CONCURRENCIA: `limite` si
+    hay menos workers enviando por el canal que el máximo, o 0. Cada worker
+    con notificaciones EN_PROCESO vigentes cuenta una vez (por su token).
+    """
+    maximo = settings.NOTIFICACIONES_CONCURRENCIA.get(canal)
+    if not maximo:
+        return None
+
+    def cupo():
+        # Se bloquea primero la fila del canal (hasta el commit del reclamo):
+        # sin esto dos workers podían contar los mismos activos y reclamar
+        # los dos, superando el máximo
+        bloquear_canal(canal)
+        activos = NotificationOutbox.objects.filter(
+            canal=canal,
+            estado=NotificationOutbox.Estado.EN_PROCESO,
+            reclamado_en__gte=vigentes_desde,
+        ).values('reclamado_por').distinct().count()
+        return limite if activos < maximo else 0
+
+    return cupo
+
+
+def bloquear_canal(canal):
+    """
+    Bloquea la fila CanalNotificacion del canal hasta el final de la
+    transacción actual. Es un UPDATE y no `select_for_update`, que en SQLite
+    no tiene efecto: allí el UPDATE toma además el bloqueo de escritura.
+    """
+    ahora = timezone.now()
+    if not CanalNotificacion.objects.filter(canal=canal).update(bloqueado_en=ahora):
+        CanalNotificacion.objects.get_or_create(canal=canal)
+        CanalNotificacion.objects.filter(canal=canal).update(bloqueado_en=ahora)
+
+
+def reclamar_notificaciones(limite, canal=NotificationOutbox.Canal.EMAIL):
+    """
+    Marca como EN_PROCESO hasta `limite` notificaciones del canal disponibles
+    y las devuelve; ninguna si el canal ya tiene el máximo de workers.
+    """
+    ahora = timezone.now()
+    vigentes_desde = ahora - timedelta(seconds=settings.NOTIFICACIONES_TIMEOUT)
+    disponibles = NotificationOutbox.objects.filter(canal=canal).filter(
+        Q(estado=NotificationOutbox.Estado.PENDIENTE, disponible_en__lte=ahora)
+        | Q(estado=NotificationOutbox.Estado.EN_PROCESO, reclamado_en__lt=vigentes_desde)
+    )
+    return reclamar(
+        disponibles, ['disponible_en', 'id'], limite, 'reclamado_por',
+        cupo=cupo_canal(canal, limite, vigentes_desde),
+        estado=NotificationOutbox.Estado.EN_PROCESO,
+        reclamado_en=ahora,
+        intentos=F('intentos') + 1,
+    )
+
+
+def registrar_envios(enviadas, fallidas):
+    """
+    Guarda el resultado de un lote con actualizaciones masivas: una para las
+    enviadas, otra para sus distribuciones y una por cada (error, intento)
+    de las fallidas. Las fallidas se reprograman con espera exponencial; las
+    que agotaron NOTIFICACIONES_MAX_INTENTOS pasan a FALLIDA y su
+    distribución a ERROR.
+    """
+    ahora = timezone.now()
+    grupos = defaultdict(list)
+    for aviso, error in fallidas:
+        grupos[(error, aviso.intentos)].append(aviso)
+
+    def guardar():
+        if enviadas:
+            NotificationOutbox.objects.filter(
+                pk__in=[n.pk for n in enviadas], reclamado_por=enviadas[0].reclamado_por
+            ).update(estado=NotificationOutbox.Estado.ENVIADA, enviado_en=ahora, ultimo_error='')
+            DistribucionMemorando.objects.filter(
+                pk__in=[n.distribucion_id for n in enviadas if n.distribucion_id]
+            ).update(estado=DistribucionMemorando.EstadoDistribucion.ENTREGADO, fecha_entrega=ahora)
+            publicar(eventos_entregas(enviadas))
+
+        for (error, intentos), avisos in grupos.items():
+            propias = NotificationOutbox.objects.filter(
+                pk__in=[n.pk for n in avisos], reclamado_por=avisos[0].reclamado_por
+            )
+            if intentos < settings.NOTIFICACIONES_MAX_INTENTOS:
+                espera = espera_reintento(
+                    intentos, settings.NOTIFICACIONES_ESPERA_BASE, settings.NOTIFICACIONES_ESPERA_MAXIMA
+                )
+                propias.update(
+                    estado=NotificationOutbox.Estado.PENDIENTE,
+                    disponible_en=ahora + timedelta(seconds=espera),
+                    ultimo_error=error,
+                )
+                continue
+            propias.update(estado=NotificationOutbox.Estado.FALLIDA, ultimo_error=error)
+            DistribucionMemorando.objects.filter(
+                pk__in=[n.distribucion_id for n in avisos if n.distribucion_id]
+            ).update(estado=DistribucionMemorando.EstadoDistribucion.ERROR, error=error)
+
+    transaccion_con_reintentos(guardar)
+
+
+def enviar_correos(notificaciones):
+    """
+    Envía las notificaciones abriendo una conexión SMTP por cada
+    NOTIFICACIONES_POR_CONEXION mensajes. Devuelve (enviadas, [(fallida, error)]).
+    """
+    enviadas, fallidas = [], []
+    remitente = settings.DEFAULT_FROM_EMAIL or 'noreply@example.com'
+    por_conexion = max(1, settings.NOTIFICACIONES_POR_CONEXION)
+
+    for inicio in range(0, len(notificaciones), por_conexion):
+        tramo = notificaciones[inicio:inicio + por_conexion]
+        conexion = get_connection()
+        try:
+            conexion.open()
+        except Exception as e:
+            logger.error(f'No se pudo conectar al servidor de correo: {str(e)}')
+            fallidas.extend((aviso, str(e)) for aviso in tramo)
+            continue
+        try:
+            for aviso in tramo:
+                mensaje = EmailMessage(aviso.asunto, aviso.mensaje, remitente, [aviso.email], connection=conexion)
+                try:
+                    # Con la conexión abierta, send_messages la reutiliza
+                    conexion.send_messages([mensaje])
+                    enviadas.append(aviso)
+                except Exception as e:
+                    logger.error(f'Error al enviar email a {aviso.email}: {str(e)}')
+                    fallidas.append((aviso, str(e)))
+        finally:
+            try:
+                conexion.close()
+            except Exception:
+                pass
+
+    return enviadas, fallidas
+
+
+# Función de envío de cada canal: recibe las notificaciones reclamadas y
+# devuelve (enviadas, [(fallida, error)])
+ENVIOS_POR_CANAL = {
+    NotificationOutbox.Canal.EMAIL: enviar_correos,
+}
+
+
+def ejecutar_notificaciones_pendientes(limite=50, canal=NotificationOutbox.Canal.EMAIL):
+    """Reclama y envía hasta `limite` notificaciones del canal; devuelve cuántas procesó."""
+    notificaciones = reclamar_notificaciones(limite, canal)
+    if not notificaciones:
+        return 0
+    registrar_envios(*ENVIOS_POR_CANAL[canal](notificaciones))
+    return len(notificaciones)
+
+
+def reintentar_fallidas(ids=None):
+    """
+    Devuelve a PENDIENTE las notificaciones FALLIDA (de `ids`, si se indica)
+    con los intentos en cero, salvo las que ya tienen un aviso igual en cola.
+    Devuelve cuántas reprogramó.
+    """
+    en_cola = NotificationOutbox.objects.filter(
+        memo_id=OuterRef('memo_id'),
+        destinatario_id=OuterRef('destinatario_id'),
+        evento=OuterRef('evento'),
+        estado__in=[NotificationOutbox.Estado.PENDIENTE, NotificationOutbox.Estado.EN_PROCESO],
+    )
+    fallidas = NotificationOutbox.objects.filter(estado=NotificationOutbox.Estado.FALLIDA)
+    if ids is not None:
+        fallidas = fallidas.filter(pk__in=ids)
+    return fallidas.exclude(Exists(en_cola)).update(
+        estado=NotificationOutbox.Estado.PENDIENTE,
+        intentos=0,
+        disponible_en=timezone.now(),
+        reclamado_por='',
+    )
@@ -0,0 +1,187 @@
+import base64
+from collections import OrderedDict
+from datetime import datetime
+from urllib import parse
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre la clave compuesta (created_at, id).
+
+    A diferencia de OFFSET, cada página se obtiene con un filtro
+    `(created_at, id) < (cursor)` sobre el orden del índice, por lo que
+    la página N cuesta lo mismo que la primera. El cursor es opaco para el
+    cliente (base64 de la posición y la dirección).
+    """
+    cursor_query_param = 'cursor'
+    page_size = settings.MEMOS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido'
+
+    # Campos de la clave: el primero ordena, el segundo desempata (único)
+    timestamp_field = 'created_at'
+    tiebreaker_field = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.pagina_explicita = any(
+            param in request.query_params for param in (self.cursor_query_param, self.page_size_query_param)
+        )
+
+        ts_field, pk_field = self.get_keyset_fields(view)
+        self.keyset_fields = (ts_field, pk_field)
+
+        if self.cursor is None:
+            reverse = False
+            queryset = queryset.order_by(f'-{ts_field}', f'-{pk_field}')
+        else:
+            timestamp, pk, reverse = self.cursor
+            if reverse:
+                # Página anterior: recorrer la clave en sentido ascendente
+                queryset = queryset.order_by(ts_field, pk_field).filter(
+                    Q(**{f'{ts_field}__gt': timestamp}) |
+                    Q(**{ts_field: timestamp, f'{pk_field}__gt': pk})
+                )
+            else:
+                queryset = queryset.order_by(f'-{ts_field}', f'-{pk_field}').filter(
+                    Q(**{f'{ts_field}__lt': timestamp}) |
+                    Q(**{ts_field: timestamp, f'{pk_field}__lt': pk})
+                )
+
+        # Se pide un elemento extra para saber si existe otra página
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_keyset_fields(self, view):
+        """
+        Campos de la clave. La vista puede sustituirlos con `keyset_fields`
+        cuando pagina otra tabla con la misma clave (p. ej. el buzón materializado).
+        """
+        return getattr(view, 'keyset_fields', None) or (self.timestamp_field, self.tiebreaker_field)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                value = int(request.query_params[self.page_size_query_param])
+                if value > 0:
+                    return min(value, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        """
+        Con `?cursor=` o `?page_size=` responde la página `{next, previous,
+        results}`. Sin ellos mantiene la forma anterior (un arreglo con la
+        primera página) para los clientes existentes. En ambos casos los
+        enlaces van también en el header `Link`.
+        """
+        siguiente, anterior = self.get_next_link(), self.get_previous_link()
+        if self.pagina_explicita:
+            response = Response(OrderedDict([
+                ('next', siguiente),
+                ('previous', anterior),
+                ('results', data),
+            ]))
+        else:
+            response = Response(data)
+        enlaces = [f'<{url}>; rel="{rel}"' for url, rel in ((siguiente, 'next'), (anterior, 'prev')) if url]
+        if enlaces:
+            response['Link'] = ', '.join(enlaces)
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def decode_cursor(self, request):
+        """Decodifica el cursor recibido en `(created_at, id, reverse)`."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            timestamp = datetime.fromisoformat(tokens['t'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return timestamp, pk, reverse
+
+    def encode_cursor(self, instance, reverse):
+        """Construye la URL de la página contigua a partir de un registro."""
+        ts_field, pk_field = self.keyset_fields
+        tokens = {
+            't': getattr(instance, ts_field).isoformat(),
+            'i': str(getattr(instance, pk_field)),
+        }
+        if reverse:
+            tokens['r'] = '1'
+
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = base64.urlsafe_b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def to_html(self):
+        return ''
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor opaco de paginación',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Número de resultados por página',
+                'schema': {'type': 'integer'},
+            },
+        ]
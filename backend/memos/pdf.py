@@ -0,0 +1,464 @@
+"""
+Renderizado de los PDF firmados.
+
+`RenderizadorPDF` prepara una sola vez por proceso lo que no depende del memo:
+- los estilos de párrafo;
+- el sello y la firma (`media/seal.png`, `media/signature.png`), ya leídos
+  y decodificados en un `ImageReader`.
+
+Renderizar muchos memos seguidos (trabajos de firma, aprobación en lote) ya
+no repite `getSampleStyleSheet()` ni la lectura y decodificación del PNG por
+cada documento; las imágenes se dibujan con `Canvas.drawImage`. Las imágenes se recargan si cambia su mtime o su tamaño, y
+dejan de usarse si se eliminan.
+
+Las fuentes son las estándar de PDF (Helvetica), que reportlab no necesita
+cargar ni incrustar.
+
+Los adjuntos se agregan con `FusionPDF`, que copia los objetos de cada PDF
+directamente al archivo de salida: la memoria no crece con el tamaño total de
+los adjuntos.
+"""
+import html
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+
+from django.conf import settings
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer
+
+logger = logging.getLogger(__name__)
+
+
+class ImagenPreparada:
+    """
+    Imagen leída y decodificada una vez por proceso, lista para dibujarse en
+    cualquier documento sin volver a abrir ni decodificar el PNG.
+    """
+
+    def __init__(self, ruta):
+        with open(ruta, 'rb') as f:
+            self.reader = ImageReader(BytesIO(f.read()))
+        # Decodifica ahora: ImageReader conserva los píxeles (y el canal alfa)
+        # para los siguientes drawImage
+        self.reader.getRGBData()
+
+    def dibujar(self, canv, x, y, ancho, alto):
+        canv.drawImage(self.reader, x, y, ancho, alto, mask='auto')
+
+
+class ImagenCacheada(Flowable):
+    """Flowable de tamaño fijo que dibuja una ImagenPreparada."""
+
+    def __init__(self, imagen, width, height):
+        super().__init__()
+        self.imagen = imagen
+        self.width = width
+        self.height = height
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.imagen.dibujar(self.canv, 0, 0, self.width, self.height)
+
+
+class RenderizadorPDF:
+    """Genera PDF firmados reutilizando estilos e imágenes entre memos."""
+
+    def __init__(self, directorio_imagenes=None):
+        self.directorio_imagenes = directorio_imagenes or os.path.join(settings.BASE_DIR, 'media')
+        self._imagenes = {}
+        self._lock = threading.Lock()
+
+        styles = getSampleStyleSheet()
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor='black',
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor='black',
+            spaceAfter=12
+        )
+        self.normal_style = ParagraphStyle(
+            'CustomNormal',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor='black',
+            alignment=TA_LEFT,
+            spaceAfter=12
+        )
+        self.confidencial_style = ParagraphStyle(
+            'Confidencial', parent=self.normal_style, textColor='red', fontSize=12, alignment=TA_CENTER
+        )
+        # reportlab no reconoce el nombre 'lightgray'; su constante es lightgrey
+        self.sello_style = ParagraphStyle(
+            'SelloDigital', parent=self.normal_style, alignment=TA_RIGHT, fontSize=9, backColor=colors.lightgrey
+        )
+        self.signature_style = ParagraphStyle('Signature', parent=self.normal_style, alignment=TA_RIGHT)
+        self.signature_date_style = ParagraphStyle(
+            'SignatureDate', parent=self.normal_style, alignment=TA_RIGHT, fontSize=9
+        )
+
+    def imagen(self, nombre):
+        """
+        Devuelve la ImagenPreparada de `nombre` (p. ej. 'seal.png') o None si
+        no existe o no se puede leer. Se recarga cuando cambian mtime o tamaño.
+        """
+        ruta = os.path.join(self.directorio_imagenes, nombre)
+        try:
+            estado = os.stat(ruta)
+        except OSError:
+            self._imagenes.pop(ruta, None)
+            return None
+        firma = (estado.st_mtime_ns, estado.st_size)
+
+        cacheada = self._imagenes.get(ruta)
+        if cacheada and cacheada[0] == firma:
+            return cacheada[1]
+
+        with self._lock:
+            cacheada = self._imagenes.get(ruta)
+            if cacheada and cacheada[0] == firma:
+                return cacheada[1]
+            try:
+                imagen = ImagenPreparada(ruta)
+            except Exception as e:
+                logger.warning(f'No se pudo cargar la imagen {ruta}: {str(e)}')
+                imagen = None
+            self._imagenes[ruta] = (firma, imagen)
+            return imagen
+
+    def renderizar(self, memo, attachments=None, destino=None):
+        """
+        Genera el PDF firmado del memo, incluyendo el contenido y los adjuntos.
+        Lo escribe en `destino` (archivo binario) o, si no se indica, en un
+        BytesIO. Devuelve el archivo posicionado al inicio.
+        """
+        if destino is None:
+            destino = BytesIO()
+
+        principal = BytesIO()
+        doc = SimpleDocTemplate(principal, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
+        try:
+            doc.build(self.contenido(memo))
+            principal.seek(0)
+        except Exception as e:
+            logger.error(f'Error al construir PDF: {str(e)}')
+            raise
+
+        attachments = list(attachments or [])
+        if not attachments:
+            shutil.copyfileobj(principal, destino)
+        else:
+            fusion = FusionPDF(destino)
+            fusion.agregar(principal)
+            del principal
+            for attachment in attachments:
+                try:
+                    # La copia normalizada del análisis, si ya existe
+                    with abrir_archivo(attachment.archivo_normalizado or attachment.file) as archivo:
+                        fusion.agregar(archivo)
+                except Exception as e:
+                    # Si no es PDF o hay error, se omite pero se registra
+                    logger.warning(f'Error al procesar adjunto {attachment.id}: {str(e)}')
+            fusion.cerrar()
+
+        destino.seek(0)
+        return destino
+
+    def contenido(self, memo):
+        normal_style = self.normal_style
+        story = []
+
+        # Encabezado del memo
+        story.append(Paragraph("MEMORÁNDUM INTERNO", self.title_style))
+        story.append(Spacer(1, 0.3*inch))
+
+        # Información del memo
+        if memo.numero_correlativo:
+            story.append(Paragraph(f"<b>Número:</b> {memo.numero_correlativo}", normal_style))
+            story.append(Spacer(1, 0.1*inch))
+
+        story.append(Paragraph(f"<b>Asunto:</b> {memo.subject}", normal_style))
+        story.append(Spacer(1, 0.1*inch))
+
+        story.append(Paragraph(f"<b>Fecha:</b> {memo.created_at.strftime('%d/%m/%Y %H:%M')}", normal_style))
+        story.append(Spacer(1, 0.1*inch))
+
+        if memo.prioridad:
+            prioridad_display = dict(memo.Prioridad.choices).get(memo.prioridad, memo.prioridad)
+            story.append(Paragraph(f"<b>Prioridad:</b> {prioridad_display}", normal_style))
+            story.append(Spacer(1, 0.1*inch))
+
+        if memo.confidencial:
+            story.append(Paragraph("<b>CONFIDENCIAL</b>", self.confidencial_style))
+            story.append(Spacer(1, 0.1*inch))
+
+        if memo.author:
+            story.append(Paragraph(f"<b>Autor:</b> {memo.author.get_full_name() or memo.author.username}", normal_style))
+            story.append(Spacer(1, 0.1*inch))
+
+        if memo.approver:
+            story.append(Paragraph(f"<b>Aprobador:</b> {memo.approver.get_full_name() or memo.approver.username}", normal_style))
+            story.append(Spacer(1, 0.1*inch))
+
+        # Una sola consulta (o ninguna si los destinatarios vienen precargados)
+        destinatarios = list(memo.recipients.all())
+        if destinatarios:
+            recipients_names = ', '.join([r.get_full_name() or r.username for r in destinatarios])
+            story.append(Paragraph(f"<b>Destinatarios:</b> {recipients_names}", normal_style))
+            story.append(Spacer(1, 0.2*inch))
+
+        # Contenido del memo
+        story.append(Paragraph("<b>Contenido:</b>", self.heading_style))
+        story.append(Spacer(1, 0.1*inch))
+
+        # Convertir el body a HTML seguro para reportlab
+        body_text = html.escape(memo.body)
+        body_text = body_text.replace('\n', '<br/>')
+        body_text = body_text.replace('\r', '')
+        story.append(Paragraph(body_text, normal_style))
+        story.append(Spacer(1, 0.3*inch))
+
+        # Agregar sello y firma (si existen)
+        seal = self.imagen('seal.png')
+        if seal:
+            story.append(Spacer(1, 0.2*inch))
+            story.append(ImagenCacheada(seal, 2*inch, 2*inch))
+
+        signature = self.imagen('signature.png')
+        if signature:
+            story.append(Spacer(1, 0.2*inch))
+            story.append(ImagenCacheada(signature, 3*inch, 1*inch))
+
+        # Sello digital y firma del aprobador
+        if memo.approver:
+            story.append(Spacer(1, 0.5*inch))
+
+            # Mostrar sello digital si existe
+            if memo.sello_digital:
+                sello = memo.sello_digital
+                sello_text = f"""
+                <b>Certificado digitalmente por:</b> {sello.get('director', 'N/A')}<br/>
+                <b>Cargo:</b> {sello.get('cargo', 'N/A')}<br/>
+                <b>Departamento:</b> {sello.get('departamento', 'N/A')}<br/>
+                <b>Fecha:</b> {datetime.fromisoformat(sello.get('fechaFirma', '')).strftime('%d/%m/%Y %H:%M') if sello.get('fechaFirma') else 'N/A'}<br/>
+                <b>Código de Verificación:</b> {sello.get('codigoVerificacion', 'N/A')}
+                """
+                story.append(Paragraph(sello_text, self.sello_style))
+                story.append(Spacer(1, 0.2*inch))
+            else:
+                # Firma simple si no hay sello digital
+                story.append(Paragraph(
+                    f"<b>{memo.approver.nombre_completo or memo.approver.username}</b><br/>Director",
+                    self.signature_style
+                ))
+                # Usar datetime.now() si approved_at aún no está establecido
+                approval_date = memo.approved_at if memo.approved_at else datetime.now()
+                story.append(Paragraph(
+                    f"Fecha de aprobación: {approval_date.strftime('%d/%m/%Y %H:%M')}",
+                    self.signature_date_style
+                ))
+
+        return story
+
+
+class FusionPDF:
+    """
+    Concatena PDF escribiendo cada objeto directamente en `salida`.
+
+    A diferencia de PdfWriter, que clona en memoria todas las páginas de
+    todos los documentos antes de escribir, cada objeto de cada fuente se lee,
+    se renumera, se escribe y se descarta. En memoria quedan solo las
+    posiciones del xref y la lista de páginas, además del objeto más grande
+    que se esté copiando.
+    """
+
+    def __init__(self, salida):
+        self.salida = salida
+        self.posicion = 0
+        self.posiciones = [None]  # índice = número de objeto
+        self.paginas = []
+        self._escribir(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        self.id_paginas = self._reservar()
+
+    def _escribir(self, datos):
+        self.salida.write(datos)
+        self.posicion += len(datos)
+
+    def _reservar(self):
+        self.posiciones.append(None)
+        return len(self.posiciones) - 1
+
+    def agregar(self, archivo):
+        """
+        Agrega todas las páginas del PDF `archivo` (binario y con seek). Si la
+        fuente falla a mitad de camino sus páginas no se agregan; los objetos
+        ya escritos quedan sin referencias y no afectan al documento.
+        """
+        reader = PdfReader(archivo)
+        if reader.is_encrypted and not reader.decrypt(''):
+            raise ValueError('PDF protegido con contraseña')
+
+        paginas = list(reader.pages)
+        # Las páginas se numeran primero: anotaciones y destinos pueden
+        # referirse a otras páginas del mismo documento
+        nuevos = {(p.indirect_reference.idnum, p.indirect_reference.generation): self._reservar() for p in paginas}
+        pendientes = deque()
+
+        def referencia(indirecto):
+            clave = (indirecto.idnum, indirecto.generation)
+            if clave not in nuevos:
+                nuevos[clave] = self._reservar()
+                pendientes.append(indirecto)
+            return nuevos[clave]
+
+        ids_paginas = []
+        for pagina in paginas:
+            ref = pagina.indirect_reference
+            numero = nuevos[(ref.idnum, ref.generation)]
+            self._escribir_objeto(numero, pagina, referencia, es_pagina=True)
+            ids_paginas.append(numero)
+            while pendientes:
+                indirecto = pendientes.popleft()
+                self._escribir_objeto(nuevos[(indirecto.idnum, indirecto.generation)],
+                                      indirecto.get_object(), referencia)
+                # Sin esto PdfReader conserva en caché cada objeto leído
+                reader.resolved_objects.pop((indirecto.generation, indirecto.idnum), None)
+
+        self.paginas.extend(ids_paginas)
+        return len(ids_paginas)
+
+    def _escribir_objeto(self, numero, objeto, referencia, es_pagina=False):
+        # Se serializa completo antes de escribir para no dejar un objeto a medias
+        buffer = BytesIO()
+        buffer.write(f'{numero} 0 obj\n'.encode())
+        if es_pagina:
+            buffer.write(b'<<\n')
+            for clave, valor in objeto.items():
+                if clave == '/Parent':
+                    continue
+                clave.write_to_stream(buffer, None)
+                buffer.write(b' ')
+                self._serializar(valor, buffer, referencia)
+                buffer.write(b'\n')
+            buffer.write(f'/Parent {self.id_paginas} 0 R\n>>'.encode())
+        else:
+            self._serializar(objeto, buffer, referencia)
+        buffer.write(b'\nendobj\n')
+        self.posiciones[numero] = self.posicion
+        self._escribir(buffer.getvalue())
+
+    def _serializar(self, objeto, buffer, referencia):
+        if isinstance(objeto, IndirectObject):
+            buffer.write(f'{referencia(objeto)} 0 R'.encode())
+        elif isinstance(objeto, StreamObject):
+            datos = objeto._data
+            buffer.write(b'<<\n')
+            for clave, valor in objeto.items():
+                if clave == '/Length':
+                    continue
+                clave.write_to_stream(buffer, None)
+                buffer.write(b' ')
+                self._serializar(valor, buffer, referencia)
+                buffer.write(b'\n')
+            buffer.write(f'/Length {len(datos)}\n>>\nstream\n'.encode())
+            buffer.write(datos)
+            buffer.write(b'\nendstream')
+        elif isinstance(objeto, DictionaryObject):
+            buffer.write(b'<<\n')
+            for clave, valor in objeto.items():
+                clave.write_to_stream(buffer, None)
+                buffer.write(b' ')
+                self._serializar(valor, buffer, referencia)
+                buffer.write(b'\n')
+            buffer.write(b'>>')
+        elif isinstance(objeto, ArrayObject):
+            buffer.write(b'[')
+            for valor in objeto:
+                buffer.write(b' ')
+                self._serializar(valor, buffer, referencia)
+            buffer.write(b' ]')
+        else:
+            objeto.write_to_stream(buffer, None)
+
+    def cerrar(self):
+        """Escribe el árbol de páginas, el catálogo, el xref y el trailer."""
+        kids = ' '.join(f'{numero} 0 R' for numero in self.paginas)
+        self.posiciones[self.id_paginas] = self.posicion
+        self._escribir(
+            f'{self.id_paginas} 0 obj\n<< /Type /Pages /Kids [ {kids} ] /Count {len(self.paginas)} >>\nendobj\n'.encode()
+        )
+        id_catalogo = self._reservar()
+        self.posiciones[id_catalogo] = self.posicion
+        self._escribir(f'{id_catalogo} 0 obj\n<< /Type /Catalog /Pages {self.id_paginas} 0 R >>\nendobj\n'.encode())
+
+        # Números reservados por fuentes que fallaron: objetos nulos
+        for numero, posicion in enumerate(self.posiciones):
+            if numero and posicion is None:
+                self.posiciones[numero] = self.posicion
+                self._escribir(f'{numero} 0 obj\nnull\nendobj\n'.encode())
+
+        inicio_xref = self.posicion
+        lineas = [f'xref\n0 {len(self.posiciones)}\n', '0000000000 65535 f \n']
+        lineas.extend(f'{posicion:010d} 00000 n \n' for posicion in self.posiciones[1:])
+        self._escribir(''.join(lineas).encode())
+        self._escribir(
+            f'trailer\n<< /Size {len(self.posiciones)} /Root {id_catalogo} 0 R >>\n'
+            f'startxref\n{inicio_xref}\n%%EOF\n'.encode()
+        )
+
+
+@contextmanager
+def abrir_archivo(archivo, tamaño_bloque=1024 * 1024):
+    """
+    Abre un archivo (FieldFile) desde el storage. Si el storage no permite
+    seek (p. ej. un backend remoto), se copia por bloques a un temporal.
+    """
+    archivo.open('rb')
+    try:
+        if archivo.seekable():
+            yield archivo
+        else:
+            with tempfile.TemporaryFile() as temporal:
+                shutil.copyfileobj(archivo, temporal, tamaño_bloque)
+                temporal.seek(0)
+                yield temporal
+    finally:
+        archivo.close()
+
+
+_renderizador = None
+_renderizador_lock = threading.Lock()
+
+
+def obtener_renderizador():
+    """Renderizador compartido del proceso (se crea en el primer uso)."""
+    global _renderizador
+    if _renderizador is None:
+        with _renderizador_lock:
+            if _renderizador is None:
+                _renderizador = RenderizadorPDF()
+    return _renderizador
@@ -47,3 +47,15 @@ class CanEditDraft(permissions.BasePermission):
             return False
         return request.user == obj.author
 
+
+
+class IsAdminRole(permissions.BasePermission):
+    """
+    Permiso que solo permite acceso a administradores (rol ADMIN o is_staff).
+    """
+    def has_permission(self, request, view):
+        return (
+            request.user and
+            request.user.is_authenticated and
+            (request.user.role == 'ADMIN' or request.user.is_staff)
+        )
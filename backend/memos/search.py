@@ -0,0 +1,147 @@
+"""
+Búsqueda de texto completo sobre memorandos (asunto, contenido y correlativo).
+
+- SQLite: tabla virtual FTS5 `memos_fts` (rowid = id del memo), mantenida de
+  forma incremental desde las señales de guardado y borrado de Memo.
+- PostgreSQL: columna generada `memos.search_vector` (tsvector) con índice GIN;
+  la base de datos la recalcula en cada escritura.
+- Otros motores (o SQLite sin FTS5): búsqueda por `icontains` sin ranking.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'memos_fts'
+PG_CONFIG = 'spanish'
+
+_fts_cache = {}
+
+
+def motor_busqueda():
+    """Devuelve 'fts5', 'postgres' o 'basico' según la base de datos en uso."""
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        clave = connection.settings_dict['NAME']
+        if clave not in _fts_cache:
+            _fts_cache[clave] = FTS_TABLE in connection.introspection.table_names()
+        if _fts_cache[clave]:
+            return 'fts5'
+    return 'basico'
+
+
+def normalizar_consulta(texto):
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada término se
+    cita como frase (sin operadores ni sintaxis FTS) y el último admite prefijo.
+    """
+    # Los términos sin caracteres alfanuméricos no producen tokens y se descartan
+    terminos = [t for t in texto.replace('"', ' ').split() if re.search(r'\w', t)]
+    if not terminos:
+        return ''
+    frases = [f'"{t}"' for t in terminos]
+    frases[-1] += '*'
+    return ' '.join(frases)
+
+
+def indexar_memo(memo):
+    """Inserta o reemplaza un memo en el índice FTS5 (no-op en otros motores)."""
+    if motor_busqueda() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [memo.id])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, numero_correlativo, subject, body) VALUES (%s, %s, %s, %s)",
+            [memo.id, memo.numero_correlativo or '', memo.subject, memo.body]
+        )
+
+
+def indexar_memos(memos):
+    """Indexa en bloque memos recién creados (p. ej. con bulk_create)."""
+    if motor_busqueda() != 'fts5' or not memos:
+        return
+    ids = [memo.id for memo in memos]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})", ids
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE}(rowid, numero_correlativo, subject, body) VALUES (%s, %s, %s, %s)",
+            [[memo.id, memo.numero_correlativo or '', memo.subject, memo.body] for memo in memos]
+        )
+
+
+def eliminar_memo(memo_id):
+    """Quita un memo del índice FTS5."""
+    if motor_busqueda() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [memo_id])
+
+
+def reconstruir_indice():
+    """Regenera el índice FTS5 completo a partir de la tabla de memos."""
+    if motor_busqueda() != 'fts5':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, numero_correlativo, subject, body) "
+            "SELECT id, coalesce(numero_correlativo, ''), subject, body FROM memos"
+        )
+        return cursor.rowcount
+
+
+def buscar(queryset, texto, limite):
+    """
+    Filtra `queryset` (ya restringido por visibilidad) a los `limite` memos que
+    mejor coinciden con `texto`, ordenados por relevancia descendente. Cada
+    memo recibe el atributo `relevancia` (None en el motor básico). Un texto
+    sin términos buscables no coincide con ningún memo.
+    """
+    motor = motor_busqueda()
+
+    if motor == 'fts5':
+        consulta = normalizar_consulta(texto)
+        if not consulta:
+            return queryset.none()
+        # Una sola pasada por el índice invertido: MATCH, visibilidad, orden por
+        # rank y límite se resuelven juntos; después solo se cargan esos memos.
+        visibles, params = queryset.order_by().values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT m.id, -f.rank FROM {FTS_TABLE} f JOIN memos m ON m.id = f.rowid '
+                f'WHERE f.{FTS_TABLE} MATCH %s AND m.id IN ({visibles}) '
+                'ORDER BY f.rank, m.created_at DESC LIMIT %s',
+                [consulta, *params, limite]
+            )
+            relevancias = cursor.fetchall()
+        if not relevancias:
+            return queryset.none()
+        return queryset.filter(id__in=[memo_id for memo_id, _ in relevancias]).annotate(
+            relevancia=Case(
+                *[When(id=memo_id, then=Value(valor)) for memo_id, valor in relevancias],
+                output_field=FloatField(),
+            )
+        ).order_by('-relevancia', '-created_at')
+
+    if motor == 'postgres':
+        tsquery = f"websearch_to_tsquery('{PG_CONFIG}', %s)"
+        return queryset.filter(RawSQL(
+            f'memos.search_vector @@ {tsquery}', [texto], output_field=BooleanField(),
+        )).annotate(relevancia=RawSQL(
+            f'ts_rank(memos.search_vector, {tsquery})', [texto], output_field=FloatField(),
+        )).order_by('-relevancia', '-created_at')[:limite]
+
+    filtro = Q()
+    for termino in texto.split():
+        filtro &= (
+            Q(subject__icontains=termino) |
+            Q(body__icontains=termino) |
+            Q(numero_correlativo__icontains=termino)
+        )
+    return queryset.filter(filtro).annotate(
+        relevancia=Value(None, output_field=FloatField())
+    ).order_by('-created_at')[:limite]
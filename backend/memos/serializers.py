@@ -1,6 +1,71 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
-from accounts.serializers import UserSerializer
-from .models import Memo, MemoAttachment
+from rest_framework.reverse import reverse
+from accounts.serializers import UserSerializer, UserSummarySerializer
+from .models import Memo, MemoAttachment, SubidaAdjunto
+
+# Longitud del extracto del contenido que se envía en los listados
+EXTRACTO_LENGTH = 200
+
+# Columnas pesadas de Memo que solo se leen si el cliente las solicita
+CAMPOS_DIFERIBLES = ['body', 'sello_digital', 'rejection_reason', 'modificacion_solicitada']
+
+
+class SparseFieldsetsMixin:
+    """
+    Permite elegir los campos de la respuesta con `?fields=` y ampliar
+    relaciones con `?expand=`.
+
+    - `default_fields`: campos que se envían si no se indica `?fields=`
+      (None significa todos los de `Meta.fields`).
+    - `expandable_fields`: campo -> fábrica del serializer completo que
+      reemplaza a la representación compacta cuando se pide `?expand=`.
+    """
+    default_fields = None
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected, expand = self.resolve_fields(self.context.get('request'))
+
+        for name in set(self.fields) - selected:
+            self.fields.pop(name)
+
+        for name in expand & selected:
+            self.fields[name] = self.expandable_fields[name]()
+
+    @staticmethod
+    def _parse_param(request, name):
+        if request is None:
+            return None
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+    @classmethod
+    def resolve_fields(cls, request):
+        """Devuelve `(campos seleccionados, campos a expandir)` para el request."""
+        available = set(cls.Meta.fields)
+        requested = cls._parse_param(request, 'fields')
+        expand = cls._parse_param(request, 'expand') or set()
+
+        if requested is None:
+            selected = set(cls.default_fields) if cls.default_fields is not None else available
+        else:
+            selected = (requested & available) | {'id'}
+
+        # Expandir una relación implica incluirla en la respuesta
+        expand &= set(cls.expandable_fields)
+        selected |= expand & available
+        return selected, expand
+
+    @classmethod
+    def get_deferred_fields(cls, request):
+        """Columnas pesadas que pueden omitirse en el SELECT para este request."""
+        selected, _ = cls.resolve_fields(request)
+        return [name for name in CAMPOS_DIFERIBLES if name not in selected]
 
 
 class MemoAttachmentSerializer(serializers.ModelSerializer):
@@ -9,37 +74,82 @@ class MemoAttachmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MemoAttachment
-        fields = ['id', 'file', 'file_url', 'uploaded_by', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_by', 'uploaded_at']
+        fields = [
+            'id', 'file_url', 'nombre_original', 'uploaded_by', 'uploaded_at', 'file_size',
+            'estado_analisis', 'tipo_detectado', 'paginas', 'error_analisis',
+        ]
+        read_only_fields = [
+            'id', 'nombre_original', 'uploaded_by', 'uploaded_at', 'file_size',
+            'estado_analisis', 'tipo_detectado', 'paginas', 'error_analisis',
+        ]
 
     def get_file_url(self, obj):
+        # Descarga autorizada (MemoViewSet.descargar_adjunto)
         request = self.context.get('request')
         if obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+            return reverse(
+                'memo-descargar-adjunto', kwargs={'pk': obj.memo_id, 'attachment_id': obj.id}, request=request
+            )
         return None
 
 
-class MemoListSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
-    approver = UserSerializer(read_only=True)
-    recipients = UserSerializer(many=True, read_only=True)
+class SubidaAdjuntoSerializer(serializers.ModelSerializer):
+    """Estado de una subida por bloques, para retomarla tras un corte."""
+    bloque_maximo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SubidaAdjunto
+        fields = ['id', 'nombre_original', 'tamaño', 'recibido', 'estado', 'bloque_maximo', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    def get_bloque_maximo(self, obj):
+        return settings.SUBIDAS_BLOQUE_MAX
+
+
+class MemoListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Fila de los listados. Por defecto incluye el contenido y los destinatarios
+    (los campos que leen los tableros); los clientes piden una fila más liviana
+    con `?fields=` (p. ej. `extracto` en lugar de `body`) y los usuarios
+    completos con `?expand=author,approver,recipients`.
+    """
+    author = UserSummarySerializer(read_only=True)
+    approver = UserSummarySerializer(read_only=True)
+    recipients = UserSummarySerializer(many=True, read_only=True)
+    extracto = serializers.CharField(read_only=True)
     attachments_count = serializers.SerializerMethodField()
     departamento = serializers.StringRelatedField(read_only=True)
 
+    default_fields = [
+        'id', 'numero_correlativo', 'subject', 'body', 'status', 'prioridad',
+        'confidencial', 'author', 'approver', 'departamento', 'recipients',
+        'created_at', 'approved_at', 'fecha_distribucion', 'attachments_count'
+    ]
+    expandable_fields = {
+        'author': lambda: UserSerializer(read_only=True),
+        'approver': lambda: UserSerializer(read_only=True),
+        'recipients': lambda: UserSerializer(many=True, read_only=True),
+    }
+
     class Meta:
         model = Memo
         fields = [
-            'id', 'numero_correlativo', 'subject', 'body', 'status', 'prioridad',
+            'id', 'numero_correlativo', 'subject', 'extracto', 'body', 'status', 'prioridad',
             'confidencial', 'author', 'approver', 'departamento', 'recipients',
             'created_at', 'approved_at', 'fecha_distribucion', 'attachments_count'
         ]
         read_only_fields = ['id', 'numero_correlativo', 'created_at', 'approved_at', 'fecha_distribucion']
 
     def get_attachments_count(self, obj):
+        # MemoViewSet anota el total en el queryset; el conteo directo queda
+        # solo para instancias que no provienen de la vista.
+        count = getattr(obj, 'attachments_count', None)
+        if count is not None:
+            return count
         return obj.attachments.count()
 
 
-class MemoDetailSerializer(serializers.ModelSerializer):
+class MemoDetailSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     approver = UserSerializer(read_only=True)
     recipients = UserSerializer(many=True, read_only=True)
@@ -56,12 +166,12 @@ class MemoDetailSerializer(serializers.ModelSerializer):
             'id', 'numero_correlativo', 'subject', 'body', 'status', 'prioridad',
             'confidencial', 'author', 'approver', 'departamento', 'recipients',
             'created_at', 'approved_at', 'fecha_distribucion', 'parent_memo',
-            'replies', 'attachments', 'signed_file_url', 'sello_digital',
+            'replies', 'attachments', 'signed_file_url', 'signed_file_status', 'sello_digital',
             'rejection_reason', 'modificacion_solicitada'
         ]
         read_only_fields = [
             'id', 'numero_correlativo', 'created_at', 'approved_at',
-            'fecha_distribucion', 'parent_memo', 'replies', 'sello_digital'
+            'fecha_distribucion', 'parent_memo', 'replies', 'signed_file_status', 'sello_digital'
         ]
 
     def get_parent_memo(self, obj):
@@ -86,9 +196,10 @@ class MemoDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_signed_file_url(self, obj):
+        # Descarga autorizada (MemoViewSet.signed_pdf)
         request = self.context.get('request')
         if obj.signed_file and request:
-            return request.build_absolute_uri(obj.signed_file.url)
+            return reverse('memo-signed-pdf', kwargs={'pk': obj.pk}, request=request)
         return None
 
 
@@ -117,9 +228,10 @@ class MemoCreateSerializer(serializers.ModelSerializer):
             )
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         from accounts.models import User, Departamento
-        from .services import generar_correlativo
+        from .services import generar_correlativo, actualizar_buzon
         
         recipient_ids = validated_data.pop('recipient_ids', [])
         approver_id = validated_data.pop('approver_id', None)
@@ -159,6 +271,7 @@ class MemoCreateSerializer(serializers.ModelSerializer):
                 memo.approver = approver
                 memo.save()
         
+        actualizar_buzon(memo)
         return memo
 
 
@@ -186,8 +299,10 @@ class MemoUpdateSerializer(serializers.ModelSerializer):
             )
         return value
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         from accounts.models import User
+        from .services import actualizar_buzon
         
         recipient_ids = validated_data.pop('recipient_ids', None)
         approver_id = validated_data.pop('approver_id', None)
@@ -205,5 +320,6 @@ class MemoUpdateSerializer(serializers.ModelSerializer):
                 instance.approver = approver
         
         instance.save()
+        actualizar_buzon(instance)
         return instance
 
@@ -1,19 +1,13 @@
-import os
 import logging
 import hashlib
 import secrets
 import json
-from io import BytesIO
-from datetime import datetime
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+import os
+from datetime import datetime, timedelta
 from django.conf import settings
 from django.core.files import File
+from django.db.models import Q
 from django.utils import timezone
-from PyPDF2 import PdfReader, PdfWriter
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +22,10 @@ TIEMPO_MAXIMO_BORRADOR = 30  # días
 TIEMPO_MAXIMO_APROBACION = 72  # horas
 MAX_PROFUNDIDAD_HILO = 10
 MAX_RESPUESTAS_POR_MEMO = 20
+# Tamaño máximo de un hilo servido por /thread/ (niveles × respuestas por memo)
+MAX_MEMOS_HILO = MAX_PROFUNDIDAD_HILO * MAX_RESPUESTAS_POR_MEMO
 TIEMPO_MAXIMO_RESPUESTA = 90  # días
+MAX_MEMOS_POR_LOTE = 50  # aprobación / rechazo en lote
 
 
 def generar_correlativo(departamento, año=None, mes=None):
@@ -38,14 +35,28 @@ def generar_correlativo(departamento, año=None, mes=None):
     
     Ejemplo: FIN-2024-03-0042
     
-    Utiliza transacciones con bloqueo para evitar duplicados concurrentes.
+    El número se reserva con un UPDATE atómico (con reintentos) dentro de la
+    transacción del llamador; ver `correlativos.py` para el modo por bloques.
     """
-    from .models import SecuenciaMemorando
-    from django.db import transaction
+    correlativo = reservar_correlativos(departamento, 1, año, mes)[0]
+    logger.info(f"Correlativo generado: {correlativo} para departamento {departamento.nombre}")
+    return correlativo
+
+
+def reservar_correlativos(departamento, cantidad, año=None, mes=None):
+    """
+    Reserva un bloque contiguo de `cantidad` correlativos para
+    (departamento, año, mes) con una sola actualización atómica de
+    SecuenciaMemorando (ver `correlativos.py`) y devuelve la lista de números
+    formateados.
+    """
+    from .correlativos import asignar_secuencias, formatear_correlativo
     from datetime import datetime
     
     if not departamento or not departamento.prefijo:
         raise ValueError("El departamento debe tener un prefijo asignado")
+    if cantidad < 1:
+        return []
     
     ahora = datetime.now()
     if año is None:
@@ -57,41 +68,11 @@ def generar_correlativo(departamento, año=None, mes=None):
     if not (1 <= mes <= 12):
         raise ValueError("El mes debe estar entre 1 y 12")
     
-    prefijo = departamento.prefijo
-    
-    # Usar transacción con bloqueo SELECT FOR UPDATE para evitar condiciones de carrera
-    with transaction.atomic():
-        # Bloquear la fila para evitar duplicados concurrentes
-        secuencia = SecuenciaMemorando.objects.select_for_update().filter(
-            departamento=departamento,
-            año=año,
-            mes=mes
-        ).first()
-        
-        if secuencia:
-            # Incrementar la secuencia de forma atómica
-            secuencia.ultima_secuencia += 1
-            secuencia.actualizado_en = timezone.now()
-            if not secuencia.prefijo:
-                secuencia.prefijo = prefijo
-            secuencia.save(update_fields=['ultima_secuencia', 'actualizado_en', 'prefijo'])
-        else:
-            # Crear nueva secuencia
-            secuencia = SecuenciaMemorando.objects.create(
-                departamento=departamento,
-                año=año,
-                mes=mes,
-                ultima_secuencia=1,
-                prefijo=prefijo
-            )
-    
-    # Formatear el número correlativo con el formato mejorado
-    secuencial_formateado = str(secuencia.ultima_secuencia).zfill(4)
-    mes_formateado = str(mes).zfill(2)
-    correlativo = f"{prefijo}-{año}-{mes_formateado}-{secuencial_formateado}"
-    
-    logger.info(f"Correlativo generado: {correlativo} para departamento {departamento.nombre}")
-    return correlativo
+    primera = asignar_secuencias(departamento, año, mes, cantidad)
+    return [
+        formatear_correlativo(departamento.prefijo, año, mes, numero)
+        for numero in range(primera, primera + cantidad)
+    ]
 
 
 def generar_hash_memorando(memo):
@@ -187,25 +168,38 @@ def obtener_ubicacion_aproximada(request):
 
 
 def calcular_profundidad_hilo(memo):
-    """Calcula la profundidad del hilo de conversación."""
-    profundidad = 0
-    memo_actual = memo
-    while memo_actual.parent_memo:
-        profundidad += 1
-        memo_actual = memo_actual.parent_memo
-        if profundidad > 100:  # Protección contra bucles infinitos
-            break
-    return profundidad
+    """Profundidad del memo en su hilo de conversación (materializada en `depth`)."""
+    return memo.depth
+
+
+def respuestas_del_memo(memo):
+    """
+    Queryset con todas las respuestas directas e indirectas de un memo: las
+    filas del mismo hilo cuya ruta empieza por la del memo, resueltas como un
+    rango del índice (thread_root, thread_path).
+    """
+    from .models import Memo
+
+    prefijo = memo.ruta_descendientes
+    # '/' precede a los dígitos, así que el rango [prefijo, prefijo sin '/' + '0') contiene el subárbol
+    return Memo.objects.filter(
+        thread_root_id=memo.raiz_hilo_id,
+        thread_path__gte=prefijo,
+        thread_path__lt=prefijo[:-1] + '0',
+    )
 
 
 def contar_respuestas_memo(memo):
     """Cuenta todas las respuestas directas e indirectas de un memo."""
-    def contar_recursivo(m):
-        count = m.replies.count()
-        for reply in m.replies.all():
-            count += contar_recursivo(reply)
-        return count
-    return contar_recursivo(memo)
+    return respuestas_del_memo(memo).count()
+
+
+def memos_del_hilo(memo):
+    """Queryset con la conversación completa de `memo`; cada memo aparece después de su padre."""
+    from .models import Memo
+
+    raiz_id = memo.raiz_hilo_id
+    return Memo.objects.filter(Q(pk=raiz_id) | Q(thread_root_id=raiz_id)).order_by('thread_path', 'id')
 
 
 def generar_contenido_respuesta(memo_padre):
@@ -225,12 +219,16 @@ Respuesta:
 def distribuir_memorando(memorando_id, request=None):
     """
     Distribuye un memorando aprobado a todos sus destinatarios.
-    Crea registros de distribución y envía notificaciones.
+
+    En una sola transacción corta crea con `bulk_create` los registros de
+    distribución y las notificaciones por correo (outbox), marca el memo como
+    DISTRIBUIDO y actualiza buzón y contadores. Los correos los envía después
+    `process_outbox`, que pasa las distribuciones a ENTREGADO (ver
+    `notificaciones.py`).
     """
-    from .models import Memo, DistribucionMemorando
+    from .models import Memo, DistribucionMemorando, ContadorCarpeta
+    from .notificaciones import encolar_distribucion
     from django.db import transaction
-    from django.core.mail import send_mail
-    from django.conf import settings
     
     try:
         memorando = Memo.objects.select_related('author', 'departamento', 'approver').prefetch_related('recipients').get(id=memorando_id)
@@ -240,270 +238,382 @@ def distribuir_memorando(memorando_id, request=None):
     if memorando.status != Memo.Status.APPROVED:
         raise ValueError(f"El memorando debe estar en estado APPROVED, actual: {memorando.status}")
     
-    resultados = []
+    destinatarios = list(memorando.recipients.all())
     
     with transaction.atomic():
-        for destinatario in memorando.recipients.all():
-            try:
-                # Crear registro de distribución
-                distribucion = DistribucionMemorando.objects.create(
-                    memorandum=memorando,
-                    destinatario=destinatario,
-                    tipo_destinatario='PRINCIPAL',
-                    metodo=DistribucionMemorando.MetodoDistribucion.SISTEMA,
-                    estado=DistribucionMemorando.EstadoDistribucion.ENVIADO
-                )
-                
-                # Enviar notificación por email
-                if destinatario.email:
-                    try:
-                        subject = f'Nuevo Memorando Recibido: {memorando.subject}'
-                        message = f'''
-Has recibido un nuevo memorando:
-
-Número: {memorando.numero_correlativo or "N/A"}
-Asunto: {memorando.subject}
-Remitente: {memorando.author.nombre_completo or memorando.author.username}
-Departamento: {memorando.departamento.nombre if memorando.departamento else "N/A"}
-Fecha: {memorando.approved_at.strftime("%d/%m/%Y %H:%M") if memorando.approved_at else "N/A"}
-
-Puede acceder al memorando desde el sistema.
-                        '''
-                        send_mail(
-                            subject,
-                            message,
-                            settings.DEFAULT_FROM_EMAIL or 'noreply@example.com',
-                            [destinatario.email],
-                            fail_silently=True,
-                        )
-                        
-                        distribucion.estado = DistribucionMemorando.EstadoDistribucion.ENTREGADO
-                        distribucion.fecha_entrega = timezone.now()
-                        distribucion.save()
-                        
-                    except Exception as e:
-                        logger.error(f'Error al enviar email a {destinatario.email}: {str(e)}')
-                        distribucion.estado = DistribucionMemorando.EstadoDistribucion.ERROR
-                        distribucion.error = str(e)
-                        distribucion.save()
-                
-                resultados.append({
-                    'destinatario': destinatario.nombre_completo or destinatario.username,
-                    'estado': distribucion.estado,
-                    'distribucionId': distribucion.id
-                })
-                
-            except Exception as error:
-                logger.error(f'Error al distribuir a {destinatario.username}: {str(error)}')
-                resultados.append({
-                    'destinatario': destinatario.nombre_completo or destinatario.username,
-                    'estado': 'ERROR',
-                    'error': str(error)
-                })
+        distribuciones = DistribucionMemorando.objects.bulk_create([
+            DistribucionMemorando(
+                memorandum=memorando,
+                destinatario=destinatario,
+                tipo_destinatario='PRINCIPAL',
+                metodo=DistribucionMemorando.MetodoDistribucion.SISTEMA,
+                estado=DistribucionMemorando.EstadoDistribucion.ENVIADO
+            )
+            for destinatario in destinatarios
+        ])
+        encolar_distribucion(memorando, distribuciones)
         
         # Actualizar estado general del memorando
         memorando.status = Memo.Status.DISTRIBUIDO
         memorando.fecha_distribucion = timezone.now()
         memorando.save()
-    
+        actualizar_buzon(memorando)
+        ajustar_contadores({
+            (destinatario.id, ContadorCarpeta.NO_LEIDOS, ''): 1 for destinatario in destinatarios
+        })
+    
+    resultados = [
+        {
+            'destinatario': distribucion.destinatario.nombre_completo or distribucion.destinatario.username,
+            'estado': distribucion.estado,
+            'distribucionId': distribucion.id
+        }
+        for distribucion in distribuciones
+    ]
     logger.info(f"Memorando {memorando_id} distribuido a {len(resultados)} destinatarios")
     return resultados
 
 
-def generate_signed_pdf(memo, attachments=None):
+def calcular_entradas_buzon(memo, recipient_ids=None):
     """
-    Genera un PDF firmado del memo, incluyendo el contenido y los adjuntos.
+    Calcula las filas del buzón materializado que corresponden a un memorando.
+    Si no se indican los destinatarios se leen de `memo.recipients` (usa la
+    caché de prefetch cuando existe).
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor='black',
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor='black',
-        spaceAfter=12
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor='black',
-        alignment=TA_LEFT,
-        spaceAfter=12
+    from .models import Memo, EntradaBuzon
+
+    Carpeta = EntradaBuzon.Carpeta
+    if recipient_ids is None:
+        recipient_ids = [r.id for r in memo.recipients.all()]
+
+    filas = {(memo.author_id, Carpeta.PROPIOS), (memo.author_id, Carpeta.BANDEJA)}
+    if memo.approver_id:
+        filas.add((memo.approver_id, Carpeta.APROBACION))
+
+    # Los destinatarios solo ven el memo una vez aprobado
+    if memo.status in [Memo.Status.APPROVED, Memo.Status.DISTRIBUIDO]:
+        for recipient_id in recipient_ids:
+            filas.add((recipient_id, Carpeta.RECIBIDOS))
+            filas.add((recipient_id, Carpeta.BANDEJA))
+
+    return [
+        EntradaBuzon(
+            usuario_id=usuario_id,
+            memo_id=memo.id,
+            carpeta=carpeta,
+            status=memo.status,
+            sort_key=memo.created_at
+        )
+        for usuario_id, carpeta in filas
+    ]
+
+
+def actualizar_buzon(memo):
+    """
+    Sincroniza el buzón materializado de un memorando tras crearlo, editarlo
+    o cambiar su estado. Se reemplazan todas sus filas (como máximo unas
+    decenas, acotadas por MAX_RECIPIENTS) dentro de una transacción.
+    """
+    from collections import Counter
+    from .models import Memo, EntradaBuzon
+    from .eventos import eventos_buzon, publicar
+    from django.db import transaction
+
+    entradas = calcular_entradas_buzon(memo)
+    with transaction.atomic():
+        anteriores = Counter(
+            EntradaBuzon.objects.filter(memo=memo).values_list('usuario_id', 'carpeta', 'status')
+        )
+        EntradaBuzon.objects.filter(memo=memo).delete()
+        EntradaBuzon.objects.bulk_create(entradas)
+
+        # Los contadores se ajustan con la diferencia entre las filas anteriores y las
+        # nuevas; las carpetas sin diferencia (delta 0) solo cambian de versión
+        deltas = Counter((e.usuario_id, e.carpeta, e.status) for e in entradas)
+        deltas.subtract(anteriores)
+        ajustar_contadores(deltas)
+        # Aviso en tiempo real a los usuarios afectados, al confirmar
+        publicar(eventos_buzon(memo, anteriores, entradas))
+
+        # Las respuestas forman parte del detalle del memo padre
+        if memo.parent_memo_id:
+            Memo.objects.filter(pk=memo.parent_memo_id).update(updated_at=timezone.now())
+
+
+def registrar_cambio_memo(memo):
+    """
+    Marca un memo como modificado cuando cambia algo que no pasa por
+    `actualizar_buzon` (p. ej. sus adjuntos): actualiza `updated_at` e
+    incrementa la versión de las carpetas donde aparece.
+    """
+    from .models import Memo, EntradaBuzon
+
+    Memo.objects.filter(pk=memo.pk).update(updated_at=timezone.now())
+    claves = EntradaBuzon.objects.filter(memo=memo).values_list('usuario_id', 'carpeta', 'status')
+    ajustar_contadores({clave: 0 for clave in claves})
+
+
+def ajustar_contadores(deltas):
+    """
+    Aplica incrementos a `ContadorCarpeta`. `deltas` asocia claves
+    (usuario_id, carpeta, status) a un entero; todas las claves recibidas,
+    incluso con incremento 0, pasan a una nueva versión.
+
+    Las claves con el mismo incremento se agrupan en un único UPDATE
+    `total = total + delta`, por lo que el costo depende del número de
+    carpetas afectadas y no del número de destinatarios.
+    """
+    from collections import defaultdict
+    from django.db.models import F
+    from .models import ContadorCarpeta
+
+    if not deltas:
+        return
+
+    ContadorCarpeta.objects.bulk_create(
+        [
+            ContadorCarpeta(usuario_id=usuario_id, carpeta=carpeta, status=estado)
+            for (usuario_id, carpeta, estado), delta in deltas.items() if delta > 0
+        ],
+        ignore_conflicts=True,
     )
-    
-    # Encabezado del memo
-    story.append(Paragraph("MEMORÁNDUM INTERNO", title_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Información del memo
-    if memo.numero_correlativo:
-        story.append(Paragraph(f"<b>Número:</b> {memo.numero_correlativo}", normal_style))
-        story.append(Spacer(1, 0.1*inch))
-    
-    story.append(Paragraph(f"<b>Asunto:</b> {memo.subject}", normal_style))
-    story.append(Spacer(1, 0.1*inch))
-    
-    story.append(Paragraph(f"<b>Fecha:</b> {memo.created_at.strftime('%d/%m/%Y %H:%M')}", normal_style))
-    story.append(Spacer(1, 0.1*inch))
-    
-    if memo.prioridad:
-        prioridad_display = dict(memo.Prioridad.choices).get(memo.prioridad, memo.prioridad)
-        story.append(Paragraph(f"<b>Prioridad:</b> {prioridad_display}", normal_style))
-        story.append(Spacer(1, 0.1*inch))
-    
-    if memo.confidencial:
-        story.append(Paragraph("<b>CONFIDENCIAL</b>", ParagraphStyle('Confidencial', parent=normal_style, textColor='red', fontSize=12, alignment=TA_CENTER)))
-        story.append(Spacer(1, 0.1*inch))
-    
-    if memo.author:
-        story.append(Paragraph(f"<b>Autor:</b> {memo.author.get_full_name() or memo.author.username}", normal_style))
-        story.append(Spacer(1, 0.1*inch))
-    
-    if memo.approver:
-        story.append(Paragraph(f"<b>Aprobador:</b> {memo.approver.get_full_name() or memo.approver.username}", normal_style))
-        story.append(Spacer(1, 0.1*inch))
-    
-    if memo.recipients.exists():
-        recipients_names = ', '.join([r.get_full_name() or r.username for r in memo.recipients.all()])
-        story.append(Paragraph(f"<b>Destinatarios:</b> {recipients_names}", normal_style))
-        story.append(Spacer(1, 0.2*inch))
-    
-    # Contenido del memo
-    story.append(Paragraph("<b>Contenido:</b>", heading_style))
-    story.append(Spacer(1, 0.1*inch))
-    
-    # Convertir el body a HTML seguro para reportlab
-    import html
-    body_text = html.escape(memo.body)
-    body_text = body_text.replace('\n', '<br/>')
-    body_text = body_text.replace('\r', '')
-    story.append(Paragraph(body_text, normal_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Agregar sello y firma (si existen)
-    seal_path = os.path.join(settings.BASE_DIR, 'media', 'seal.png')
-    signature_path = os.path.join(settings.BASE_DIR, 'media', 'signature.png')
-    
-    if os.path.exists(seal_path):
-        try:
-            seal_img = Image(seal_path, width=2*inch, height=2*inch)
-            story.append(Spacer(1, 0.2*inch))
-            story.append(seal_img)
-        except:
-            pass
-    
-    if os.path.exists(signature_path):
-        try:
-            signature_img = Image(signature_path, width=3*inch, height=1*inch)
-            story.append(Spacer(1, 0.2*inch))
-            story.append(signature_img)
-        except:
-            pass
-    
-    # Sello digital y firma del aprobador
-    if memo.approver:
-        story.append(Spacer(1, 0.5*inch))
-        
-        # Mostrar sello digital si existe
-        if memo.sello_digital:
-            sello = memo.sello_digital
-            sello_text = f"""
-            <b>Certificado digitalmente por:</b> {sello.get('director', 'N/A')}<br/>
-            <b>Cargo:</b> {sello.get('cargo', 'N/A')}<br/>
-            <b>Departamento:</b> {sello.get('departamento', 'N/A')}<br/>
-            <b>Fecha:</b> {datetime.fromisoformat(sello.get('fechaFirma', '')).strftime('%d/%m/%Y %H:%M') if sello.get('fechaFirma') else 'N/A'}<br/>
-            <b>Código de Verificación:</b> {sello.get('codigoVerificacion', 'N/A')}
-            """
-            story.append(Paragraph(
-                sello_text,
-                ParagraphStyle('SelloDigital', parent=normal_style, alignment=TA_RIGHT, fontSize=9, backColor='lightgray')
-            ))
-            story.append(Spacer(1, 0.2*inch))
+
+    grupos = defaultdict(list)
+    for (usuario_id, carpeta, estado), delta in deltas.items():
+        grupos[(carpeta, estado, delta)].append(usuario_id)
+    for (carpeta, estado, delta), usuarios in grupos.items():
+        ContadorCarpeta.objects.filter(
+            usuario_id__in=usuarios, carpeta=carpeta, status=estado
+        ).update(total=F('total') + delta, version=F('version') + 1)
+
+
+def reconciliar_contadores(aplicar=True):
+    """
+    Recalcula los contadores desde el buzón materializado y las
+    distribuciones sin acuse, y corrige las filas que difieran.
+    Devuelve la lista de diferencias (clave, valor_guardado, valor_esperado).
+    """
+    from django.db import transaction
+    from django.db.models import Count
+    from .models import ContadorCarpeta, DistribucionMemorando, EntradaBuzon
+
+    esperados = {
+        (usuario_id, carpeta, estado): total
+        for usuario_id, carpeta, estado, total in EntradaBuzon.objects.values(
+            'usuario_id', 'carpeta', 'status'
+        ).annotate(total=Count('id')).values_list('usuario_id', 'carpeta', 'status', 'total')
+    }
+    for usuario_id, total in DistribucionMemorando.objects.filter(
+        acuse_recibo=False
+    ).values('destinatario_id').annotate(total=Count('id')).values_list('destinatario_id', 'total'):
+        esperados[(usuario_id, ContadorCarpeta.NO_LEIDOS, '')] = total
+
+    with transaction.atomic():
+        guardados = {
+            (c.usuario_id, c.carpeta, c.status): c
+            for c in ContadorCarpeta.objects.select_for_update()
+        }
+
+        diferencias = []
+        for clave in set(esperados) | set(guardados):
+            contador = guardados.get(clave)
+            actual = contador.total if contador else 0
+            esperado = esperados.get(clave, 0)
+            if actual != esperado:
+                diferencias.append((clave, actual, esperado))
+
+        if aplicar and diferencias:
+            nuevos = []
+            for clave, actual, esperado in diferencias:
+                contador = guardados.get(clave)
+                if contador is None:
+                    usuario_id, carpeta, estado = clave
+                    nuevos.append(ContadorCarpeta(
+                        usuario_id=usuario_id, carpeta=carpeta, status=estado, total=esperado
+                    ))
+                else:
+                    contador.total = esperado
+                    contador.version += 1
+            ContadorCarpeta.objects.bulk_create(nuevos)
+            ContadorCarpeta.objects.bulk_update(
+                [guardados[clave] for clave, _, _ in diferencias if clave in guardados],
+                ['total', 'version']
+            )
+
+    return sorted(diferencias)
+
+
+def registrar_acuse_recibo(memo, usuario):
+    """
+    Marca como leída la distribución de `memo` para `usuario` y descuenta su
+    contador de no leídos. Devuelve True si la distribución estaba pendiente.
+    """
+    from .models import ContadorCarpeta, DistribucionMemorando
+    from django.db import transaction
+
+    with transaction.atomic():
+        marcadas = DistribucionMemorando.objects.filter(
+            memorandum=memo, destinatario=usuario, acuse_recibo=False
+        ).update(acuse_recibo=True, fecha_acuse=timezone.now())
+        if marcadas:
+            ajustar_contadores({(usuario.id, ContadorCarpeta.NO_LEIDOS, ''): -marcadas})
+    return bool(marcadas)
+
+
+def validar_lote_director(ids, director, verbo):
+    """
+    Carga con una sola consulta (bloqueando las filas) los memos de un lote de
+    aprobación o rechazo y los separa en válidos y errores por memo, con las
+    mismas reglas que las acciones individuales. Debe llamarse dentro de una
+    transacción.
+    """
+    from .models import Memo
+
+    memos = Memo.objects.select_for_update().select_related(
+        'author', 'approver', 'departamento'
+    ).in_bulk(ids)
+
+    validos = []
+    errores = {}
+    for memo_id in ids:
+        memo = memos.get(memo_id)
+        if memo is None:
+            error = ('NOT_FOUND', 'Memo no encontrado')
+        elif memo.status != Memo.Status.PENDING_APPROVAL:
+            error = ('INVALID_STATUS', f'Solo se pueden {verbo} memos pendientes')
+        elif memo.approver_id != director.id:
+            error = ('NOT_APPROVER', f'Solo el aprobador asignado puede {verbo} el memo')
+        elif memo.departamento_id and memo.departamento_id != director.departamento_id:
+            error = ('WRONG_DEPARTMENT', f'Solo el director del departamento puede {verbo} este memo')
         else:
-            # Firma simple si no hay sello digital
-            story.append(Paragraph(
-                f"<b>{memo.approver.nombre_completo or memo.approver.username}</b><br/>Director",
-                ParagraphStyle('Signature', parent=normal_style, alignment=TA_RIGHT)
-            ))
-            # Usar datetime.now() si approved_at aún no está establecido
-            approval_date = memo.approved_at if memo.approved_at else datetime.now()
-            story.append(Paragraph(
-                f"Fecha de aprobación: {approval_date.strftime('%d/%m/%Y %H:%M')}",
-                ParagraphStyle('SignatureDate', parent=normal_style, alignment=TA_RIGHT, fontSize=9)
-            ))
-    
-    # Construir el PDF
-    try:
-        doc.build(story)
-        buffer.seek(0)
-    except Exception as e:
-        logger.error(f'Error al construir PDF: {str(e)}')
-        raise
-    
-    # Si hay adjuntos, concatenarlos
-    if attachments:
-        try:
-            main_pdf = PdfReader(buffer)
-            writer = PdfWriter()
-            
-            # Agregar páginas del memo principal
-            for page in main_pdf.pages:
-                writer.add_page(page)
-            
-            # Agregar páginas de los adjuntos
-            for attachment in attachments:
-                try:
-                    # Obtener la ruta del archivo
-                    if hasattr(attachment.file, 'path'):
-                        file_path = attachment.file.path
-                    elif hasattr(attachment.file, 'read'):
-                        # Si es un objeto file, necesitamos guardarlo temporalmente o usar directamente
-                        attachment.file.seek(0)
-                        attachment_pdf = PdfReader(attachment.file)
-                        for page in attachment_pdf.pages:
-                            writer.add_page(page)
-                        continue
-                    else:
-                        file_path = attachment.file.name
-                        # Construir la ruta completa
-                        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                    
-                    if os.path.exists(full_path):
-                        with open(full_path, 'rb') as f:
-                            attachment_pdf = PdfReader(f)
-                            for page in attachment_pdf.pages:
-                                writer.add_page(page)
-                    else:
-                        logger.warning(f'Archivo adjunto no encontrado: {full_path}')
-                except Exception as e:
-                    # Si no es PDF o hay error, se omite pero se registra
-                    logger.warning(f'Error al procesar adjunto {attachment.id}: {str(e)}')
-                    pass
-            
-            # Escribir el PDF final
-            final_buffer = BytesIO()
-            writer.write(final_buffer)
-            final_buffer.seek(0)
-            return final_buffer
-        except Exception as e:
-            logger.error(f'Error al concatenar adjuntos: {str(e)}')
-            # Si falla la concatenación, devolver el PDF principal
-            buffer.seek(0)
-            return buffer
-    
-    return buffer
+            validos.append(memo)
+            continue
+        errores[memo_id] = {'id': memo_id, 'success': False, 'error_code': error[0], 'message': error[1]}
+    return validos, errores
+
 
+def aprobar_memorandos_en_lote(ids, director, request=None):
+    """
+    Aprueba un lote de memos pendientes del director.
+
+    1. Validación de todo el lote con una consulta.
+    2. Cambio de estado, fecha de aprobación, sello digital y estado del PDF
+       con un único `bulk_update`, sincronización del buzón y un trabajo de
+       firma por memo (`trabajos.encolar_firmas`), en una transacción.
+    3. Notificación a los autores, encolada con un solo INSERT en la misma
+       transacción (ver `notificaciones.py`).
+
+    El PDF firmado y la distribución los completa `run_workers`.
+    Devuelve un resultado por id, en el orden recibido.
+    """
+    from django.db import transaction
+    from .models import Memo
+    from .notificaciones import encolar, notificaciones_cambio_estado
+    from .trabajos import encolar_firmas
+
+    with transaction.atomic():
+        validos, resultados = validar_lote_director(ids, director, 'aprobar')
+
+        approved_time = timezone.now()
+        for memo in validos:
+            memo.approved_at = approved_time
+            try:
+                memo.sello_digital = crear_sello_digital(memo, request)
+            except Exception as e:
+                logger.error(f'Error al crear sello digital para memo {memo.id}: {str(e)}')
+            memo.status = Memo.Status.APPROVED
+            memo.updated_at = approved_time
+        encolar_firmas(validos)
+        Memo.objects.bulk_update(
+            validos, ['status', 'approved_at', 'sello_digital', 'signed_file_status', 'updated_at']
+        )
+        for memo in validos:
+            actualizar_buzon(memo)
+        encolar([
+            aviso for memo in validos
+            for aviso in notificaciones_cambio_estado(memo, Memo.Status.PENDING_APPROVAL)
+        ])
+
+    for memo in validos:
+        resultados[memo.id] = {
+            'id': memo.id,
+            'success': True,
+            'numero_correlativo': memo.numero_correlativo,
+            'status': memo.status,
+            'signed_file_status': memo.signed_file_status,
+        }
+
+    return [resultados[memo_id] for memo_id in ids]
+
+
+def rechazar_memorandos_en_lote(ids, director, rejection_reason=''):
+    """
+    Rechaza un lote de memos pendientes del director: validación con una
+    consulta, un único `bulk_update` y notificación a los autores encolada con
+    un solo INSERT.
+    """
+    from django.db import transaction
+    from .models import Memo
+    from .notificaciones import encolar, notificaciones_cambio_estado
+
+    with transaction.atomic():
+        validos, resultados = validar_lote_director(ids, director, 'rechazar')
+
+        ahora = timezone.now()
+        for memo in validos:
+            memo.status = Memo.Status.REJECTED
+            memo.rejection_reason = rejection_reason
+            memo.updated_at = ahora
+        Memo.objects.bulk_update(validos, ['status', 'rejection_reason', 'updated_at'])
+        for memo in validos:
+            actualizar_buzon(memo)
+        encolar([
+            aviso for memo in validos
+            for aviso in notificaciones_cambio_estado(memo, Memo.Status.PENDING_APPROVAL)
+        ])
+
+    for memo in validos:
+        resultados[memo.id] = {'id': memo.id, 'success': True, 'status': memo.status}
+
+    return [resultados[memo_id] for memo_id in ids]
+
+
+def validar_nuevo_adjunto(memo, nombre, tamaño):
+    """
+    Valida un adjunto antes de recibirlo: extensión, tamaño y límites del
+    memo (cantidad y MAX_TOTAL_SIZE). Las subidas por bloques en curso
+    reservan su tamaño declarado. Devuelve el mensaje de error o None.
+    """
+    from django.db.models import Count, Sum
+    from .models import SubidaAdjunto
+
+    extension = os.path.splitext(nombre.lower())[1]
+    if extension not in ALLOWED_ATTACHMENT_EXTENSIONS:
+        return f'Formato no permitido. Formatos permitidos: {", ".join(ALLOWED_ATTACHMENT_EXTENSIONS)}'
+
+    if tamaño > MAX_FILE_SIZE:
+        return f'El archivo excede el tamaño máximo de {MAX_FILE_SIZE / (1024 * 1024)}MB'
+
+    limite = timezone.now() - timedelta(hours=settings.SUBIDAS_EXPIRACION_HORAS)
+    subidas = SubidaAdjunto.objects.filter(
+        memo=memo, estado=SubidaAdjunto.Estado.EN_CURSO, updated_at__gte=limite
+    ).aggregate(cantidad=Count('id'), total=Sum('tamaño'))
+    adjuntos = memo.attachments.aggregate(cantidad=Count('id'), total=Sum('file_size'))
+
+    if adjuntos['cantidad'] + subidas['cantidad'] >= MAX_ATTACHMENTS:
+        return f'Máximo {MAX_ATTACHMENTS} archivos adjuntos permitidos'
+
+    if (adjuntos['total'] or 0) + (subidas['total'] or 0) + tamaño > MAX_TOTAL_SIZE:
+        return f'Los adjuntos del memo exceden el tamaño total máximo de {MAX_TOTAL_SIZE / (1024 * 1024)}MB'
+
+    return None
+
+
+def generate_signed_pdf(memo, attachments=None, destino=None):
+    """
+    Genera un PDF firmado del memo, incluyendo el contenido y los adjuntos.
+    Usa el renderizador compartido del proceso (ver `pdf.py`); con `destino`
+    escribe en ese archivo en lugar de un BytesIO.
+    """
+    from .pdf import obtener_renderizador
+    return obtener_renderizador().renderizar(memo, attachments, destino)
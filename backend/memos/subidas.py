@@ -0,0 +1,191 @@
+"""
+Subida de adjuntos por bloques, reanudable.
+
+1. `POST /memos/{id}/uploads/` con `{"nombre", "tamaño"}`: valida extensión,
+   tamaño y los límites del memo (MAX_ATTACHMENTS, MAX_TOTAL_SIZE) y reserva el
+   tamaño declarado mientras la subida esté en curso.
+2. `PUT /memos/{id}/uploads/{subida}/` con `Content-Range: bytes inicio-fin/total`
+   y el bloque (hasta SUBIDAS_BLOQUE_MAX bytes) como cuerpo. Se copia al
+   archivo parcial en trozos, sin cargarlo entero en memoria. El primer bloque
+   debe traer la cabecera del archivo, que se compara con la extensión.
+3. `GET /memos/{id}/uploads/{subida}/` informa los bytes recibidos: tras un
+   corte el cliente retoma desde ahí.
+4. `POST /memos/{id}/uploads/{subida}/complete/` calcula el SHA-256 del archivo
+   parcial, lo guarda por contenido y crea el adjunto. Repetirlo devuelve el
+   mismo adjunto.
+
+Cada bloque es un request corto: una conexión lenta ya no retiene un worker
+durante toda la subida ni el archivo completo en memoria.
+"""
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .adjuntos import CABECERA_POR_EXTENSION, TAMAÑO_CABECERA, tipo_por_cabecera
+from .almacenamiento import calcular_sha256, crear_adjunto
+from .correlativos import transaccion_con_reintentos
+from .models import SubidaAdjunto
+
+# Trozos en que se copia cada bloque del request al archivo parcial
+TAMAÑO_LECTURA = 64 * 1024
+
+RANGO = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ErrorSubida(Exception):
+    """Error de la subida, con el código HTTP y los datos para el cliente."""
+
+    def __init__(self, mensaje, codigo=400, **datos):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.codigo = codigo
+        self.datos = datos
+
+
+def ruta_parcial(subida):
+    return os.path.join(settings.SUBIDAS_DIR, f'{subida.id}.part')
+
+
+def iniciar_subida(memo, usuario, nombre, tamaño):
+    """Valida el adjunto declarado y crea la subida con su archivo parcial."""
+    from .services import validar_nuevo_adjunto
+
+    nombre = os.path.basename(nombre or '')[:255]
+    if not nombre:
+        raise ErrorSubida('No se indicó el nombre del archivo')
+    if tamaño <= 0:
+        raise ErrorSubida('El archivo está vacío')
+    error = validar_nuevo_adjunto(memo, nombre, tamaño)
+    if error:
+        raise ErrorSubida(error)
+
+    os.makedirs(settings.SUBIDAS_DIR, exist_ok=True)
+    subida = SubidaAdjunto.objects.create(memo=memo, usuario=usuario, nombre_original=nombre, tamaño=tamaño)
+    open(ruta_parcial(subida), 'wb').close()
+    return subida
+
+
+def interpretar_rango(cabecera):
+    """(inicio, longitud, total) de un `Content-Range: bytes inicio-fin/total`."""
+    coincidencia = RANGO.match(cabecera or '')
+    if not coincidencia:
+        raise ErrorSubida('Se requiere la cabecera Content-Range: bytes inicio-fin/total')
+    inicio, fin, total = (int(valor) for valor in coincidencia.groups())
+    if fin < inicio:
+        raise ErrorSubida('Content-Range inválido')
+    return inicio, fin - inicio + 1, total
+
+
+def escribir_bloque(subida, content_range, content_length, stream):
+    """
+    Copia el bloque del request al archivo parcial y avanza `recibido`.
+    Devuelve los bytes recibidos hasta el momento.
+    """
+    inicio, longitud, total = interpretar_rango(content_range)
+
+    if subida.estado != SubidaAdjunto.Estado.EN_CURSO:
+        raise ErrorSubida('La subida no está en curso', 409, recibido=subida.recibido)
+    if total != subida.tamaño:
+        raise ErrorSubida(f'El tamaño total no coincide con el declarado ({subida.tamaño} bytes)')
+    if inicio != subida.recibido:
+        # Bloque repetido o adelantado: el cliente debe retomar desde `recibido`
+        raise ErrorSubida('El bloque no continúa la subida', 409, recibido=subida.recibido)
+    if inicio + longitud > subida.tamaño:
+        raise ErrorSubida('El bloque excede el tamaño declarado')
+    if longitud > settings.SUBIDAS_BLOQUE_MAX:
+        raise ErrorSubida(f'Los bloques no pueden superar {settings.SUBIDAS_BLOQUE_MAX} bytes', 413)
+    if content_length != longitud:
+        raise ErrorSubida('Content-Length no coincide con Content-Range')
+
+    pendiente = longitud
+    with open(ruta_parcial(subida), 'r+b') as parcial:
+        parcial.seek(inicio)
+        if inicio == 0:
+            cabecera = stream.read(min(TAMAÑO_CABECERA, longitud))
+            if len(cabecera) < min(TAMAÑO_CABECERA, subida.tamaño):
+                raise ErrorSubida(f'El primer bloque debe incluir al menos {TAMAÑO_CABECERA} bytes')
+            esperada = CABECERA_POR_EXTENSION.get(os.path.splitext(subida.nombre_original.lower())[1])
+            if tipo_por_cabecera(cabecera) != esperada:
+                cancelar_subida(subida)
+                raise ErrorSubida('El contenido no corresponde a la extensión del archivo', 415)
+            parcial.write(cabecera)
+            pendiente -= len(cabecera)
+        while pendiente:
+            datos = stream.read(min(TAMAÑO_LECTURA, pendiente))
+            if not datos:
+                # Conexión cortada: `recibido` no avanza y el bloque se repite
+                raise ErrorSubida('Bloque incompleto', 400, recibido=subida.recibido)
+            parcial.write(datos)
+            pendiente -= len(datos)
+
+    avanzado = SubidaAdjunto.objects.filter(
+        pk=subida.pk, estado=SubidaAdjunto.Estado.EN_CURSO, recibido=inicio
+    ).update(recibido=inicio + longitud, updated_at=timezone.now())
+    if not avanzado:
+        subida.refresh_from_db()
+        raise ErrorSubida('La subida cambió mientras se recibía el bloque', 409, recibido=subida.recibido)
+    subida.recibido = inicio + longitud
+    return subida.recibido
+
+
+def completar_subida(subida, sha256_cliente=None):
+    """Crea el adjunto con el archivo parcial completo y lo devuelve."""
+    from .services import registrar_cambio_memo
+
+    if subida.estado == SubidaAdjunto.Estado.COMPLETADA and subida.adjunto_id:
+        return subida.adjunto
+    if subida.estado != SubidaAdjunto.Estado.EN_CURSO:
+        raise ErrorSubida('La subida no está en curso', 409)
+    if subida.recibido != subida.tamaño:
+        raise ErrorSubida('Faltan bloques por subir', 409, recibido=subida.recibido)
+
+    ruta = ruta_parcial(subida)
+    with open(ruta, 'rb') as parcial:
+        archivo = File(parcial, name=subida.nombre_original)
+        sha256 = calcular_sha256(archivo)
+        if sha256_cliente and sha256_cliente.lower() != sha256:
+            # Datos dañados en el camino: se vuelve a subir desde el inicio
+            SubidaAdjunto.objects.filter(pk=subida.pk).update(recibido=0, updated_at=timezone.now())
+            raise ErrorSubida('El SHA-256 del archivo recibido no coincide', 400, recibido=0)
+
+        def crear():
+            completada = SubidaAdjunto.objects.filter(
+                pk=subida.pk, estado=SubidaAdjunto.Estado.EN_CURSO
+            ).update(estado=SubidaAdjunto.Estado.COMPLETADA, updated_at=timezone.now())
+            if not completada:
+                raise ErrorSubida('La subida ya no está en curso', 409)
+            adjunto = crear_adjunto(subida.memo, archivo, subida.nombre_original, subida.usuario, sha256)
+            SubidaAdjunto.objects.filter(pk=subida.pk).update(adjunto=adjunto)
+            return adjunto
+
+        adjunto = transaccion_con_reintentos(crear)
+
+    os.remove(ruta)
+    registrar_cambio_memo(subida.memo)
+    return adjunto
+
+
+def cancelar_subida(subida):
+    """Elimina la subida y su archivo parcial."""
+    try:
+        os.remove(ruta_parcial(subida))
+    except FileNotFoundError:
+        pass
+    SubidaAdjunto.objects.filter(pk=subida.pk).delete()
+
+
+def purgar_subidas():
+    """
+    Elimina las subidas sin actividad por más de SUBIDAS_EXPIRACION_HORAS
+    (abandonadas o ya completadas). Devuelve cuántas eliminó.
+    """
+    limite = timezone.now() - timedelta(hours=settings.SUBIDAS_EXPIRACION_HORAS)
+    cantidad = 0
+    for subida in SubidaAdjunto.objects.filter(updated_at__lt=limite).iterator():
+        cancelar_subida(subida)
+        cantidad += 1
+    return cantidad
@@ -0,0 +1,489 @@
+import math
+import os
+import re
+import shutil
+import socketserver
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter
+
+from django.db import connection
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PyPDF2 import PdfReader
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import Departamento, User
+from .models import EntradaBuzon, Memo, MemoAttachment, TrabajoFirmaPDF
+from .notificaciones import ejecutar_notificaciones_pendientes
+from .services import actualizar_buzon, calcular_entradas_buzon, distribuir_memorando
+from .trabajos import procesar_trabajo
+from .eventos import TokenEventos
+from .views import MemoViewSet, _usuario_eventos
+
+ROLES = ['SECONDARY_USER', 'DIRECTOR', 'AREA_USER']
+
+MB = 1024 * 1024
+
+
+class DatosMemosMixin:
+    """Departamento con un usuario por rol y memos distribuidos entre ellos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.departamento = Departamento.objects.create(nombre='Pruebas', prefijo='PRB')
+        cls.usuarios = {
+            role: User.objects.create_user(
+                f'prb_{role.lower()}', f'prb_{role.lower()}@example.com', 'clave-prueba',
+                role=role, departamento=cls.departamento
+            )
+            for role in ROLES
+        }
+
+    def crear_memos(self, cantidad, respuestas=1, adjuntos=1):
+        """
+        Crea `cantidad` memos distribuidos del redactor, aprobados por el
+        director y recibidos por el usuario de área, cada uno con `respuestas`
+        respuestas y `adjuntos` adjuntos. Devuelve los memos raíz.
+        """
+        autor = self.usuarios['SECONDARY_USER']
+        raices = []
+        for i in range(cantidad):
+            raiz = self.crear_memo(f'Memo {i}')
+            for j in range(respuestas):
+                self.crear_memo(f'Respuesta {i}.{j}', padre=raiz)
+            MemoAttachment.objects.bulk_create([
+                MemoAttachment(
+                    memo=raiz, file=f'memo_attachments/prueba_{raiz.id}_{j}.pdf',
+                    nombre_original=f'prueba_{j}.pdf', uploaded_by=autor, file_size=1024
+                )
+                for j in range(adjuntos)
+            ])
+            raices.append(raiz)
+        return raices
+
+    def crear_memo(self, subject, padre=None):
+        memo = Memo.objects.create(
+            subject=subject,
+            body='Contenido de prueba ' * 20,
+            status=Memo.Status.DISTRIBUIDO,
+            author=self.usuarios['SECONDARY_USER'],
+            approver=self.usuarios['DIRECTOR'],
+            departamento=self.departamento,
+            parent_memo=padre,
+        )
+        memo.recipients.set([self.usuarios['AREA_USER']])
+        actualizar_buzon(memo)
+        return memo
+
+    def cliente(self, role):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuarios[role])
+        return cliente
+
+
+class ConsultasConstantesTests(DatosMemosMixin, TestCase):
+    """
+    El listado y el detalle deben ejecutar el mismo número de consultas sin
+    importar cuántos memos, respuestas y adjuntos haya (sin N+1).
+    """
+
+    def contar(self, cliente, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = cliente.get(url)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content[:200])
+        return len(consultas)
+
+    def test_listado_y_detalle_con_consultas_constantes(self):
+        pequeño = self.crear_memos(2, respuestas=2, adjuntos=2)
+        base = {
+            role: (
+                self.contar(self.cliente(role), '/api/memos/'),
+                self.contar(self.cliente(role), f'/api/memos/{pequeño[0].id}/'),
+            )
+            for role in ROLES
+        }
+
+        grande = self.crear_memos(18, respuestas=20, adjuntos=20)
+        for role in ROLES:
+            listado, detalle = base[role]
+            with self.subTest(role=role, vista='list'):
+                with self.assertNumQueries(listado):
+                    respuesta = self.cliente(role).get('/api/memos/')
+                self.assertEqual(len(respuesta.json()), 20)
+            with self.subTest(role=role, vista='retrieve'):
+                with self.assertNumQueries(detalle):
+                    respuesta = self.cliente(role).get(f'/api/memos/{grande[0].id}/')
+                self.assertEqual(len(respuesta.json()['attachments']), 20)
+
+
+class PlanesConsultaTests(DatosMemosMixin, TestCase):
+    """
+    Cada rama de `MemoViewSet.get_queryset` (y del buzón materializado) debe
+    resolverse con índices: ningún recorrido completo de las tablas que crecen
+    con el uso.
+    """
+
+    TABLAS_VIGILADAS = ['memos', 'memos_recipients', 'buzon_usuarios', 'memo_attachments']
+    TOTAL_MEMOS = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        redactor = cls.usuarios['SECONDARY_USER']
+        receptores = [cls.usuarios['AREA_USER']] + [
+            User.objects.create_user(
+                f'prb_receptor{i}', f'prb_receptor{i}@example.com', None,
+                role='AREA_USER', departamento=cls.departamento
+            )
+            for i in range(9)
+        ]
+
+        estados = list(Memo.Status.values)
+        memos = Memo.objects.bulk_create([
+            Memo(
+                subject=f'Memo {i}',
+                body='Contenido de prueba',
+                status=estados[i % len(estados)],
+                author=redactor,
+                approver=cls.usuarios['DIRECTOR'],
+                departamento=cls.departamento,
+            )
+            for i in range(cls.TOTAL_MEMOS)
+        ])
+
+        Through = Memo.recipients.through
+        filas = []
+        entradas = []
+        for i, memo in enumerate(memos):
+            destinatarios = [receptores[(i + j) % len(receptores)].id for j in range(3)]
+            filas.extend(Through(memo_id=memo.id, user_id=uid) for uid in destinatarios)
+            entradas.extend(calcular_entradas_buzon(memo, destinatarios))
+        Through.objects.bulk_create(filas)
+        EntradaBuzon.objects.bulk_create(entradas)
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Con pocos datos el planificador prefiere Seq Scan aunque exista índice;
+            # desactivarlo deja el Seq Scan solo cuando no hay índice utilizable.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def consultas(self, usuario, status_param):
+        """Querysets que ejecuta el listado para un usuario y carpeta, con su paginación."""
+        path = '/api/memos/' + (f'?status={status_param}' if status_param else '')
+        view = MemoViewSet()
+        view.action = 'list'
+        view.format_kwarg = None
+        view.request = Request(APIRequestFactory().get(path))
+        view.request.user = usuario
+        view.kwargs = {}
+
+        page_size = view.paginator.page_size + 1
+        yield 'get_queryset', view.get_queryset().order_by('-created_at', '-id')[:page_size]
+
+        entradas = view.get_mailbox_queryset()
+        if entradas is not None:
+            yield 'buzon', entradas.order_by('-sort_key', '-memo_id')[:page_size]
+
+    def recorridos_completos(self, plan):
+        if connection.vendor == 'postgresql':
+            patron = r'Seq Scan on (\w+)'
+        else:
+            patron = r'\bSCAN (\w+)'
+        return sorted({tabla for tabla in re.findall(patron, plan) if tabla in self.TABLAS_VIGILADAS})
+
+    def test_ramas_del_listado_usan_indices(self):
+        for role in ROLES:
+            usuario = User.objects.select_related('departamento').get(pk=self.usuarios[role].pk)
+            for status_param in [None] + list(Memo.Status.values):
+                for nombre, queryset in self.consultas(usuario, status_param):
+                    with self.subTest(role=role, status=status_param, consulta=nombre):
+                        plan = queryset.explain()
+                        self.assertEqual(self.recorridos_completos(plan), [], plan)
+
+
+class BusquedaTests(DatosMemosMixin, TestCase):
+    """Búsqueda de texto completo: relevancia, visibilidad y límite."""
+
+    def test_ordena_por_relevancia_y_respeta_visibilidad(self):
+        en_cuerpo = self.crear_memo('Memo de compras')
+        en_cuerpo.body = 'Se solicita revisar la infraestructura del edificio.'
+        en_cuerpo.save()
+        en_asunto = self.crear_memo('Infraestructura de red')
+        borrador = Memo.objects.create(
+            subject='Infraestructura pendiente', body='Borrador',
+            author=self.usuarios['DIRECTOR'], departamento=self.departamento,
+        )
+        self.crear_memo('Sin relación')
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.cliente('AREA_USER').get('/api/memos/search/?q=infraestructura')
+        self.assertEqual(respuesta.status_code, 200)
+        ids = [fila['id'] for fila in respuesta.json()['data']]
+        self.assertEqual(ids, [en_asunto.id, en_cuerpo.id])
+        self.assertNotIn(borrador.id, ids)
+        # El MATCH se evalúa una sola vez, no una por memo encontrado
+        self.assertEqual(sum(' MATCH ' in c['sql'] for c in consultas.captured_queries), 1)
+
+        respuesta = self.cliente('AREA_USER').get('/api/memos/search/?q=infraestructura&limit=1')
+        self.assertEqual([fila['id'] for fila in respuesta.json()['data']], [en_asunto.id])
+
+    def test_texto_sin_terminos_no_devuelve_resultados(self):
+        self.crear_memo('Infraestructura de red')
+        respuesta = self.cliente('AREA_USER').get('/api/memos/search/?q=%22%22')
+        self.assertEqual(respuesta.json()['data'], [])
+
+
+def escribir_pdf_sintetico(ruta, paginas, bytes_por_pagina):
+    """
+    PDF de `paginas` páginas cuyo contenido es un comentario de datos
+    aleatorios (no comprimible). Se escribe página a página, sin armarlo en
+    memoria.
+    """
+    posiciones = {}
+    with open(ruta, 'wb') as f:
+        def objeto(numero, contenido):
+            posiciones[numero] = f.tell()
+            f.write(f'{numero} 0 obj\n'.encode() + contenido + b'\nendobj\n')
+
+        f.write(b'%PDF-1.4\n')
+        objeto(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(paginas)).encode()
+        objeto(2, b'<< /Type /Pages /Kids [ ' + kids + b' ] /Count ' + str(paginas).encode() + b' >>')
+        for i in range(paginas):
+            datos = b'% ' + os.urandom(bytes_por_pagina // 2).hex().encode() + b'\n'
+            objeto(3 + 2 * i, f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R >>'.encode())
+            objeto(4 + 2 * i, f'<< /Length {len(datos)} >>\nstream\n'.encode() + datos + b'\nendstream')
+
+        total = 3 + 2 * paginas
+        inicio_xref = f.tell()
+        f.write(f'xref\n0 {total}\n0000000000 65535 f \n'.encode())
+        for numero in range(1, total):
+            f.write(f'{posiciones[numero]:010d} 00000 n \n'.encode())
+        f.write(f'trailer\n<< /Size {total} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n'.encode())
+
+
+class MemoriaFirmaPDFTests(DatosMemosMixin, TestCase):
+    """
+    `procesar_trabajo` arma el PDF firmado por streaming: el pico de memoria
+    no crece con el tamaño de los adjuntos.
+    """
+
+    # PDF_SPOOL_MEMORIA_MAX (2 MB) más el objeto más grande de un adjunto
+    LIMITE_PICO = 8 * MB
+    PAGINAS = 10
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        configuracion = override_settings(MEDIA_ROOT=self.media)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        os.makedirs(os.path.join(self.media, 'memo_attachments'))
+
+    def memo_con_adjuntos(self, cantidad, mb_por_adjunto):
+        memo = self.crear_memo(f'Adjuntos de {mb_por_adjunto} MB')
+        adjuntos = []
+        for i in range(cantidad):
+            nombre = f'memo_attachments/sintetico_{memo.id}_{i}.pdf'
+            ruta = os.path.join(self.media, nombre)
+            escribir_pdf_sintetico(ruta, self.PAGINAS, int(mb_por_adjunto * MB / self.PAGINAS))
+            adjuntos.append(MemoAttachment(
+                memo=memo, file=nombre, nombre_original=f'sintetico_{i}.pdf',
+                uploaded_by=self.usuarios['SECONDARY_USER'], file_size=os.path.getsize(ruta),
+                estado_analisis=MemoAttachment.EstadoAnalisis.VALIDO, tipo_detectado='pdf',
+                paginas=self.PAGINAS,
+            ))
+        MemoAttachment.objects.bulk_create(adjuntos)
+        return memo
+
+    def pico_de_memoria(self, memo):
+        trabajo = TrabajoFirmaPDF.objects.create(memo=memo, estado=TrabajoFirmaPDF.Estado.EN_PROCESO, intentos=1)
+        tracemalloc.start()
+        try:
+            self.assertTrue(procesar_trabajo(trabajo))
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        memo.refresh_from_db()
+        with memo.signed_file.open('rb') as firmado:
+            self.assertEqual(len(PdfReader(firmado).pages), 1 + memo.attachments.count() * self.PAGINAS)
+        return pico
+
+    def test_pico_acotado_con_adjuntos_grandes(self):
+        # Estilos e imágenes del renderizador se preparan fuera de la medición
+        self.pico_de_memoria(self.memo_con_adjuntos(1, 0.1))
+
+        for cantidad, mb_por_adjunto in [(2, 2), (4, 6)]:
+            with self.subTest(adjuntos=cantidad, mb_por_adjunto=mb_por_adjunto):
+                pico = self.pico_de_memoria(self.memo_con_adjuntos(cantidad, mb_por_adjunto))
+                self.assertLess(
+                    pico, self.LIMITE_PICO,
+                    f'Pico de {pico / MB:.1f} MB con {cantidad} adjuntos de {mb_por_adjunto} MB'
+                )
+
+
+class SesionSMTP(socketserver.StreamRequestHandler):
+    """Lo mínimo de SMTP para recibir mensajes y contarlos, sin entregarlos."""
+
+    def responder(self, linea):
+        self.wfile.write(f'{linea}\r\n'.encode())
+
+    def handle(self):
+        servidor = self.server
+        with servidor.lock:
+            servidor.conexiones += 1
+        self.responder('220 sumidero ESMTP')
+        destinatarios, en_datos = [], False
+        for linea in self.rfile:
+            if en_datos:
+                if linea.rstrip(b'\r\n') == b'.':
+                    en_datos = False
+                    with servidor.lock:
+                        servidor.mensajes.extend(destinatarios)
+                    self.responder('250 OK')
+                continue
+            comando = linea[:4].upper()
+            if comando in (b'EHLO', b'HELO'):
+                self.responder('250 sumidero')
+            elif comando == b'MAIL':
+                destinatarios = []
+                self.responder('250 OK')
+            elif comando == b'RCPT':
+                destinatarios += re.findall(rb'<([^>]*)>', linea)
+                self.responder('250 OK')
+            elif comando == b'DATA':
+                en_datos = True
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+            elif comando == b'QUIT':
+                self.responder('221 Adiós')
+                return
+            else:
+                self.responder('250 OK')
+
+
+class SumideroSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SesionSMTP)
+        self.lock = threading.Lock()
+        self.conexiones = 0
+        self.mensajes = []
+
+
+class NotificacionesSMTPTests(DatosMemosMixin, TestCase):
+    """
+    Aprobar y distribuir un memo envía un solo correo por destinatario (y el
+    aviso al autor) reutilizando la conexión SMTP, contra un servidor local
+    que cuenta los mensajes sin entregarlos.
+    """
+
+    DESTINATARIOS = 15
+
+    def setUp(self):
+        servidor = SumideroSMTP()
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        self.servidor = servidor
+        self.destinatarios = [
+            User.objects.create_user(
+                f'prb_destinatario{i}', f'prb_destinatario{i}@example.com', None,
+                role='AREA_USER', departamento=self.departamento
+            )
+            for i in range(self.DESTINATARIOS)
+        ]
+
+    def aprobar_y_distribuir(self, por_conexion):
+        memo = Memo.objects.create(
+            subject='Memo a distribuir',
+            body='Contenido de prueba',
+            status=Memo.Status.PENDING_APPROVAL,
+            author=self.usuarios['SECONDARY_USER'],
+            approver=self.usuarios['DIRECTOR'],
+            departamento=self.departamento,
+        )
+        memo.recipients.set(self.destinatarios)
+
+        configuracion = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.servidor.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            NOTIFICACIONES_POR_CONEXION=por_conexion,
+        )
+        with configuracion:
+            # Aprobación (aviso al autor) y distribución (aviso a cada destinatario)
+            memo.status = Memo.Status.APPROVED
+            memo.approved_at = timezone.now()
+            memo.save()
+            distribuir_memorando(memo.id)
+            while ejecutar_notificaciones_pendientes(50):
+                pass
+        return memo
+
+    def test_un_correo_por_destinatario_y_conexiones_reutilizadas(self):
+        for por_conexion in [100, 4]:
+            with self.subTest(por_conexion=por_conexion):
+                self.servidor.conexiones = 0
+                self.servidor.mensajes = []
+                memo = self.aprobar_y_distribuir(por_conexion)
+
+                por_destinatario = Counter(email.decode() for email in self.servidor.mensajes)
+                esperados = {u.email: 1 for u in self.destinatarios}
+                esperados[memo.author.email] = 1
+                self.assertEqual(dict(por_destinatario), esperados)
+                self.assertEqual(
+                    self.servidor.conexiones, math.ceil(len(self.servidor.mensajes) / por_conexion)
+                )
+
+
+class TokenEventosTests(DatosMemosMixin, TestCase):
+    """
+    El flujo de eventos acepta en la URL solo el token de eventos; el token
+    de acceso se acepta únicamente en la cabecera Authorization.
+    """
+
+    def usuario_de(self, **kwargs):
+        return _usuario_eventos(RequestFactory().get('/api/eventos/', **kwargs))
+
+    def test_token_de_eventos_en_la_url(self):
+        usuario = self.usuarios['AREA_USER']
+        respuesta = self.cliente('AREA_USER').post('/api/eventos/token/')
+        self.assertEqual(respuesta.status_code, 200)
+        token = respuesta.json()['data']['token']
+        self.assertEqual(self.usuario_de(data={'token': token}), usuario)
+
+        # No sirve como token de acceso para el resto de la API
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(cliente.get('/api/memos/').status_code, 401)
+
+    def test_token_de_acceso_solo_en_la_cabecera(self):
+        usuario = self.usuarios['AREA_USER']
+        acceso = str(AccessToken.for_user(usuario))
+        self.assertIsNone(self.usuario_de(data={'token': acceso}))
+        self.assertEqual(self.usuario_de(HTTP_AUTHORIZATION=f'Bearer {acceso}'), usuario)
+
+    @override_settings(EVENTOS_TOKEN_DURACION=-1)
+    def test_token_de_eventos_vencido(self):
+        token = str(TokenEventos.for_user(self.usuarios['AREA_USER']))
+        self.assertIsNone(self.usuario_de(data={'token': token}))
+
+    def test_emitir_token_requiere_autenticacion(self):
+        self.assertEqual(APIClient().post('/api/eventos/token/').status_code, 401)
+
+    async def test_flujo_rechaza_token_de_acceso_en_la_url(self):
+        acceso = str(AccessToken.for_user(self.usuarios['AREA_USER']))
+        respuesta = await AsyncClient().get('/api/eventos/', {'token': acceso})
+        self.assertEqual(respuesta.status_code, 401)
@@ -0,0 +1,243 @@
+"""
+Trabajos persistentes de firma de PDF.
+
+La aprobación ya no genera el PDF dentro del request: en la misma transacción
+que cambia el estado del memo encola un TrabajoFirmaPDF y deja
+`signed_file_status = PENDIENTE`. El comando `run_workers` reclama los
+trabajos disponibles, genera y guarda el PDF firmado y distribuye el memo.
+
+- Reclamo: `SELECT ... FOR UPDATE SKIP LOCKED` donde el motor lo admite
+  (PostgreSQL, MySQL 8, Oracle). En SQLite la marca con un token único en un
+  UPDATE condicionado al estado evita que dos workers tomen el mismo trabajo.
+- Reintentos: si el PDF falla, el trabajo vuelve a PENDIENTE con espera
+  exponencial; agotados PDF_TRABAJOS_MAX_INTENTOS queda FALLIDO y el memo con
+  `signed_file_status = FALLIDO`.
+- La distribución se hace en el primer intento aunque el PDF falle, igual que
+  cuando la aprobación era síncrona: un PDF que no se puede generar no debe
+  retener el memo.
+- Un trabajo EN_PROCESO cuyo worker murió se vuelve a reclamar pasado
+  PDF_TRABAJOS_TIMEOUT segundos.
+
+Los mismos workers analizan los adjuntos recién subidos (ver `adjuntos.py`),
+que se reclaman igual que los trabajos pero sobre la propia fila del adjunto.
+"""
+import logging
+import os
+import random
+import socket
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .correlativos import transaccion_con_reintentos
+from .adjuntos import analizar_adjunto
+from .models import Memo, MemoAttachment, TrabajoFirmaPDF
+
+logger = logging.getLogger(__name__)
+
+
+def encolar_firmas(memos):
+    """
+    Crea un trabajo de firma por memo y los marca como pendientes. Debe
+    llamarse en la transacción de la aprobación; el llamador guarda
+    `signed_file_status` junto con el resto del memo.
+    """
+    ahora = timezone.now()
+    for memo in memos:
+        memo.signed_file_status = Memo.EstadoFirma.PENDIENTE
+    return TrabajoFirmaPDF.objects.bulk_create([
+        TrabajoFirmaPDF(memo_id=memo.id, disponible_en=ahora) for memo in memos
+    ])
+
+
+def espera_reintento(intentos, base=None, maxima=None):
+    """
+    Segundos hasta el siguiente intento: exponencial con tope y jitter. Por
+    defecto con la configuración de los trabajos de firma.
+    """
+    base = settings.PDF_TRABAJOS_ESPERA_BASE if base is None else base
+    maxima = settings.PDF_TRABAJOS_ESPERA_MAXIMA if maxima is None else maxima
+    espera = min(base * (2 ** (intentos - 1)), maxima)
+    return espera * (1 + random.random() / 4)
+
+
+def token_worker():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}'[-64:]
+
+
+def reclamar(disponibles, orden, limite, campo_token, cupo=None, **marcas):
+    """
+    Marca con un token nuevo hasta `limite` filas de `disponibles` (aplicando
+    `marcas`) y las devuelve. `cupo`, si se indica, se evalúa dentro de la
+    transacción del reclamo y devuelve cuántas filas se pueden tomar como
+    máximo (p. ej. para limitar los workers simultáneos).
+    """
+    token = token_worker()
+
+    def operacion():
+        cantidad = limite if cupo is None else min(limite, cupo())
+        if cantidad <= 0:
+            return []
+        candidatos = disponibles.order_by(*orden)
+        if connection.features.has_select_for_update_skip_locked:
+            candidatos = candidatos.select_for_update(skip_locked=True)
+        ids = list(candidatos.values_list('id', flat=True)[:cantidad])
+        if ids:
+            # Se repite el filtro de disponibilidad: sin SKIP LOCKED otro
+            # worker pudo reclamar alguno entre la lectura y la escritura
+            disponibles.filter(pk__in=ids).update(**{campo_token: token}, **marcas)
+        return list(disponibles.model.objects.filter(**{campo_token: token}))
+
+    return transaccion_con_reintentos(operacion)
+
+
+def reclamar_trabajos(limite=1):
+    """Marca como EN_PROCESO hasta `limite` trabajos disponibles y los devuelve."""
+    ahora = timezone.now()
+    disponibles = TrabajoFirmaPDF.objects.filter(
+        Q(estado=TrabajoFirmaPDF.Estado.PENDIENTE, disponible_en__lte=ahora)
+        | Q(
+            estado=TrabajoFirmaPDF.Estado.EN_PROCESO,
+            reclamado_en__lt=ahora - timedelta(seconds=settings.PDF_TRABAJOS_TIMEOUT),
+        )
+    )
+    return reclamar(
+        disponibles, ['disponible_en', 'id'], limite, 'reclamado_por',
+        estado=TrabajoFirmaPDF.Estado.EN_PROCESO,
+        reclamado_en=ahora,
+        intentos=F('intentos') + 1,
+    )
+
+
+def reclamar_adjuntos(limite=1, ids=None):
+    """
+    Marca como EN_PROCESO hasta `limite` adjuntos pendientes de análisis (de
+    `ids`, si se indica) y los devuelve.
+    """
+    ahora = timezone.now()
+    disponibles = MemoAttachment.objects.filter(
+        Q(estado_analisis=MemoAttachment.EstadoAnalisis.PENDIENTE)
+        | Q(
+            estado_analisis=MemoAttachment.EstadoAnalisis.EN_PROCESO,
+            analizado_en__lt=ahora - timedelta(seconds=settings.PDF_TRABAJOS_TIMEOUT),
+        )
+    )
+    if ids is not None:
+        disponibles = disponibles.filter(pk__in=ids)
+    return reclamar(
+        disponibles, ['uploaded_at', 'id'], limite, 'analizado_por',
+        estado_analisis=MemoAttachment.EstadoAnalisis.EN_PROCESO,
+        analizado_en=ahora,
+    )
+
+
+def procesar_trabajo(trabajo):
+    """Genera el PDF firmado del trabajo reclamado y distribuye el memo."""
+    from .services import distribuir_memorando, generate_signed_pdf, registrar_cambio_memo
+
+    memo = (
+        Memo.objects.select_related('author', 'approver', 'departamento')
+        .prefetch_related('recipients', 'attachments')
+        .get(pk=trabajo.memo_id)
+    )
+
+    error = None
+    try:
+        fecha = memo.approved_at or timezone.now()
+        filename = f'memo_{memo.id}_signed_{fecha.strftime("%Y%m%d_%H%M%S")}.pdf'
+        adjuntos = adjuntos_analizados(memo)
+        # El PDF (memo + adjuntos) se arma en un temporal que pasa a disco por
+        # encima de PDF_SPOOL_MEMORIA_MAX y el storage lo copia por bloques
+        with tempfile.SpooledTemporaryFile(max_size=settings.PDF_SPOOL_MEMORIA_MAX) as temporal:
+            generate_signed_pdf(memo, [a for a in adjuntos if a.se_incluye_en_pdf], destino=temporal)
+            memo.signed_file.save(filename, File(temporal, name=filename), save=False)
+    except Exception as e:
+        logger.error(f'Error al generar PDF firmado para memo {memo.id} (intento {trabajo.intentos}): {str(e)}')
+        error = e
+
+    if error is None:
+        Memo.objects.filter(pk=memo.pk).update(
+            signed_file=memo.signed_file.name, signed_file_status=Memo.EstadoFirma.LISTO
+        )
+        registrar_cambio_memo(memo)
+        finalizar_trabajo(trabajo, TrabajoFirmaPDF.Estado.COMPLETADO)
+    else:
+        registrar_fallo(trabajo, memo, error)
+
+    if memo.status == Memo.Status.APPROVED:
+        try:
+            resultados_distribucion = distribuir_memorando(memo.id)
+            logger.info(f"Memorando {memo.id} distribuido: {resultados_distribucion}")
+        except Exception as e:
+            logger.error(f'Error al distribuir memorando {memo.id}: {str(e)}')
+
+    return error is None
+
+
+def adjuntos_analizados(memo):
+    """
+    Adjuntos del memo con su análisis terminado. Los que ningún worker llegó a
+    analizar (p. ej. aprobados justo después de subirlos) se analizan aquí.
+    """
+    adjuntos = list(memo.attachments.all())
+    ids = [
+        a.id for a in adjuntos
+        if a.estado_analisis in (MemoAttachment.EstadoAnalisis.PENDIENTE, MemoAttachment.EstadoAnalisis.EN_PROCESO)
+    ]
+    if not ids:
+        return adjuntos
+    for attachment in reclamar_adjuntos(len(ids), ids):
+        analizar_adjunto(attachment)
+    return list(MemoAttachment.objects.filter(memo=memo))
+
+
+def ejecutar_analisis_pendientes(limite=1):
+    """Reclama y analiza hasta `limite` adjuntos; devuelve cuántos analizó."""
+    adjuntos = reclamar_adjuntos(limite)
+    for attachment in adjuntos:
+        analizar_adjunto(attachment)
+    return len(adjuntos)
+
+
+def finalizar_trabajo(trabajo, estado, **campos):
+    # Solo si el trabajo sigue siendo nuestro: pasado el timeout pudo
+    # reclamarlo otro worker
+    return TrabajoFirmaPDF.objects.filter(pk=trabajo.pk, reclamado_por=trabajo.reclamado_por).update(
+        estado=estado, completado_en=timezone.now(), **campos
+    )
+
+
+def registrar_fallo(trabajo, memo, error):
+    """Reprograma el trabajo con espera exponencial o lo marca FALLIDO."""
+    from .services import registrar_cambio_memo
+
+    if trabajo.intentos >= settings.PDF_TRABAJOS_MAX_INTENTOS:
+        if finalizar_trabajo(trabajo, TrabajoFirmaPDF.Estado.FALLIDO, ultimo_error=str(error)):
+            Memo.objects.filter(pk=memo.pk).update(signed_file_status=Memo.EstadoFirma.FALLIDO)
+            registrar_cambio_memo(memo)
+        return
+
+    TrabajoFirmaPDF.objects.filter(pk=trabajo.pk, reclamado_por=trabajo.reclamado_por).update(
+        estado=TrabajoFirmaPDF.Estado.PENDIENTE,
+        disponible_en=timezone.now() + timedelta(seconds=espera_reintento(trabajo.intentos)),
+        ultimo_error=str(error),
+    )
+
+
+def ejecutar_pendientes(limite=1):
+    """Reclama y procesa hasta `limite` trabajos; devuelve cuántos procesó."""
+    trabajos = reclamar_trabajos(limite)
+    for trabajo in trabajos:
+        try:
+            procesar_trabajo(trabajo)
+        except Exception as e:
+            # Memo eliminado, error de base de datos, etc.: se reintenta como un fallo más
+            logger.exception(f'Error inesperado en el trabajo de firma {trabajo.id}')
+            registrar_fallo(trabajo, Memo(pk=trabajo.memo_id), e)
+    return len(trabajos)
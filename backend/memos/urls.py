@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MemoViewSet
+from .views import MemoViewSet, eventos, token_eventos
 
 router = DefaultRouter()
 router.register(r'memos', MemoViewSet, basename='memo')
 
 urlpatterns = [
+    path('eventos/', eventos, name='eventos'),
+    path('eventos/token/', token_eventos, name='eventos-token'),
     path('', include(router.urls)),
 ]
 
@@ -1,33 +1,126 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, transaction
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Substr
 from django.utils import timezone
-from .models import Memo, MemoAttachment
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from .models import Memo, MemoAttachment, EntradaBuzon, ContadorCarpeta, SubidaAdjunto
 from .serializers import (
     MemoListSerializer,
     MemoDetailSerializer,
     MemoCreateSerializer,
     MemoUpdateSerializer,
-    MemoAttachmentSerializer
+    MemoAttachmentSerializer,
+    SubidaAdjuntoSerializer,
+    EXTRACTO_LENGTH
 )
 from .permissions import (
     IsSecondaryUser,
     IsDirector,
     IsRecipientOrInvolved,
-    CanEditDraft
+    CanEditDraft,
+    IsAdminRole
 )
+from .pagination import KeysetPagination
+from .search import buscar
+from .importacion import detectar_formato, importar_memos
+from .correlativos import reserva_autonoma, transaccion_con_reintentos
+from .trabajos import encolar_firmas
+from .almacenamiento import crear_adjunto, sha256_de_subida
+from . import subidas
+from .subidas import ErrorSubida
+from .descargas import respuesta_archivo
+from .eventos import TokenEventos, flujo_sse, obtener_backend
 from .services import (
-    generate_signed_pdf, generar_correlativo, crear_sello_digital,
-    MAX_RECIPIENTS, MAX_ATTACHMENTS, MAX_FILE_SIZE, ALLOWED_ATTACHMENT_EXTENSIONS
+    generar_correlativo, crear_sello_digital, actualizar_buzon,
+    registrar_acuse_recibo, registrar_cambio_memo,
+    validar_nuevo_adjunto, MAX_RECIPIENTS,
+    MAX_PROFUNDIDAD_HILO, MAX_MEMOS_HILO, MAX_MEMOS_POR_LOTE,
+    aprobar_memorandos_en_lote, rechazar_memorandos_en_lote
 )
+
+import hashlib
 import logging
 from accounts.models import User
 import os
 
 logger = logging.getLogger(__name__)
 
+# Límite de resultados de la búsqueda de texto completo
+MAX_RESULTADOS_BUSQUEDA = 50
+
+
+def calcular_etag(request, *partes):
+    """
+    ETag débil de una respuesta de memos. Incluye usuario, rol y ruta completa
+    (status, cursor, fields, expand), porque todos cambian la representación.
+    """
+    user = request.user
+    clave = ':'.join(str(parte) for parte in (user.pk, user.role, request.get_full_path(), *partes))
+    return f'W/"{hashlib.md5(clave.encode()).hexdigest()}"'
+
+
+def etag_coincide(request, etag, last_modified=None):
+    """
+    Evalúa If-None-Match (comparación débil) y, si no viene, If-Modified-Since.
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = {valor.removeprefix('W/') for valor in parse_etags(if_none_match)}
+        return '*' in etags or etag.removeprefix('W/') in etags
+    
+    desde = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return bool(last_modified and desde and int(last_modified.timestamp()) <= desde)
+
+
+def con_validadores(response, etag, last_modified=None):
+    """Agrega ETag, Last-Modified y la política de revalidación a la respuesta."""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def respuesta_no_modificada(etag, last_modified=None):
+    return con_validadores(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+# Carpetas del buzón materializado por rol: (carpeta que sirve los filtros por
+# estado, estados que admite ese filtro, carpeta sin filtro de estado). Replican
+# las ramas de MemoViewSet.get_queryset; None indica que la rama se sigue
+# resolviendo sobre la tabla de memos.
+CARPETAS_BUZON = {
+    'SECONDARY_USER': (
+        EntradaBuzon.Carpeta.PROPIOS,
+        ['DRAFT', 'APPROVED', 'DISTRIBUIDO', 'REJECTED', 'MODIFICACION_SOLICITADA'],
+        EntradaBuzon.Carpeta.PROPIOS,
+    ),
+    'DIRECTOR': (
+        EntradaBuzon.Carpeta.APROBACION,
+        ['PENDING_APPROVAL', 'APPROVED', 'DISTRIBUIDO'],
+        None,
+    ),
+    'AREA_USER': (
+        EntradaBuzon.Carpeta.RECIBIDOS,
+        ['APPROVED', 'DISTRIBUIDO'],
+        EntradaBuzon.Carpeta.BANDEJA,
+    ),
+}
+
 
 class MemoViewSet(viewsets.ModelViewSet):
     """
@@ -35,6 +128,7 @@ class MemoViewSet(viewsets.ModelViewSet):
     """
     queryset = Memo.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -51,7 +145,7 @@ class MemoViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         status_param = self.request.query_params.get('status', None)
-        queryset = Memo.objects.select_related('author', 'approver').prefetch_related('recipients', 'attachments')
+        queryset = self.get_projected_queryset()
         
         if status_param == 'DRAFT':
             # Solo borradores del autor
@@ -66,7 +160,7 @@ class MemoViewSet(viewsets.ModelViewSet):
         elif status_param == 'APPROVED':
             # Memos aprobados para receptores o autores
             if user.role == 'AREA_USER':
-                return queryset.filter(status='APPROVED', recipients=user)
+                return queryset.filter(id__in=self._mailbox_ids(user, EntradaBuzon.Carpeta.RECIBIDOS, 'APPROVED'))
             elif user.role == 'DIRECTOR':
                 return queryset.filter(status='APPROVED', approver=user)
             elif user.role == 'SECONDARY_USER':
@@ -75,7 +169,7 @@ class MemoViewSet(viewsets.ModelViewSet):
         elif status_param == 'DISTRIBUIDO':
             # Memos distribuidos para receptores
             if user.role == 'AREA_USER':
-                return queryset.filter(status='DISTRIBUIDO', recipients=user)
+                return queryset.filter(id__in=self._mailbox_ids(user, EntradaBuzon.Carpeta.RECIBIDOS, 'DISTRIBUIDO'))
             elif user.role == 'DIRECTOR':
                 return queryset.filter(status='DISTRIBUIDO', approver=user)
             elif user.role == 'SECONDARY_USER':
@@ -95,22 +189,199 @@ class MemoViewSet(viewsets.ModelViewSet):
         if user.role == 'SECONDARY_USER':
             return queryset.filter(author=user)
         elif user.role == 'DIRECTOR':
-            return queryset.filter(Q(approver=user) | Q(status='PENDING_APPROVAL', departamento=user.departamento))
+            return queryset.filter(Q(approver=user) | Q(status='PENDING_APPROVAL', departamento_id=user.departamento_id))
         elif user.role == 'AREA_USER':
-            return queryset.filter(Q(recipients=user, status__in=['APPROVED', 'DISTRIBUIDO']) | Q(author=user))
+            # Destinatario + estado no puede indexarse en memos (el estado no está en la
+            # tabla intermedia); se resuelve con el índice (usuario, carpeta[, status]) del
+            # buzón materializado, que además evita el OR con JOIN sobre destinatarios.
+            return queryset.filter(id__in=self._mailbox_ids(user, EntradaBuzon.Carpeta.BANDEJA))
         
         return queryset.none()
     
+    @staticmethod
+    def _mailbox_ids(user, carpeta, status=None):
+        entradas = EntradaBuzon.objects.filter(usuario=user, carpeta=carpeta)
+        if status is not None:
+            entradas = entradas.filter(status=status)
+        return entradas.values('memo_id')
+    
+    def get_mailbox_queryset(self):
+        """
+        Devuelve las entradas del buzón materializado que equivalen a la rama de
+        get_queryset para este usuario y `status`, o None si la rama no está
+        materializada.
+        """
+        carpeta = self.get_mailbox_folder()
+        if carpeta is None:
+            return None
+        
+        carpeta, status_param = carpeta
+        entradas = EntradaBuzon.objects.only('id', 'memo_id', 'sort_key').filter(
+            usuario=self.request.user, carpeta=carpeta
+        )
+        if status_param is not None:
+            entradas = entradas.filter(status=status_param)
+        return entradas
+    
+    def get_mailbox_folder(self):
+        """
+        Devuelve (carpeta, status) del buzón materializado que sirve el listado
+        solicitado (status None si la carpeta no filtra por estado), o None.
+        """
+        user = self.request.user
+        status_param = self.request.query_params.get('status', None)
+        if user.role not in CARPETAS_BUZON:
+            return None
+        
+        carpeta_estado, estados, carpeta_defecto = CARPETAS_BUZON[user.role]
+        if status_param in estados:
+            return carpeta_estado, status_param
+        if carpeta_defecto is None:
+            return None
+        return carpeta_defecto, None
+    
+    def get_list_etag(self):
+        """
+        ETag del listado solicitado. En las carpetas materializadas se deriva de
+        las versiones de los contadores de la carpeta (una lectura por índice);
+        en el resto, del número de memos y su última modificación.
+        """
+        carpeta = self.get_mailbox_folder()
+        if carpeta is not None:
+            carpeta, status_param = carpeta
+            contadores = ContadorCarpeta.objects.filter(usuario=self.request.user, carpeta=carpeta)
+            if status_param is not None:
+                contadores = contadores.filter(status=status_param)
+            version = contadores.aggregate(version=Sum('version'), total=Sum('total'))
+        else:
+            ids = self.get_queryset().order_by().values('pk')
+            version = Memo.objects.filter(pk__in=ids).aggregate(
+                total=Count('id'), ultimo=Max('updated_at')
+            )
+        return calcular_etag(self.request, *sorted(version.items()))
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Listar memos de una carpeta. Si la carpeta está materializada, la página
+        se obtiene con un rango del índice (usuario, carpeta[, status], sort_key)
+        y luego se cargan solo los memos de esa página.
+        Responde 304 si el If-None-Match del cliente coincide con la versión
+        actual de la carpeta.
+        """
+        etag = self.get_list_etag()
+        if etag_coincide(request, etag):
+            return respuesta_no_modificada(etag)
+        
+        entradas = self.get_mailbox_queryset()
+        if entradas is None:
+            response = super().list(request, *args, **kwargs)
+        else:
+            self.keyset_fields = ('sort_key', 'memo_id')
+            page = self.paginate_queryset(entradas)
+            memos = self.get_projected_queryset().in_bulk([entrada.memo_id for entrada in page])
+            serializer = self.get_serializer(
+                [memos[entrada.memo_id] for entrada in page if entrada.memo_id in memos],
+                many=True
+            )
+            response = self.get_paginated_response(serializer.data)
+        
+        return con_validadores(response, etag)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Detalle de un memo. Si el usuario es destinatario de un memo
+        distribuido, se registra el acuse de recibo.
+        Antes de cargar y serializar el memo se compara su `updated_at` con
+        If-None-Match / If-Modified-Since y, si no cambió, se responde 304.
+        """
+        updated_at = self.get_queryset().filter(
+            pk=self._pk_memo()
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is not None:
+            etag = calcular_etag(request, updated_at.isoformat())
+            if etag_coincide(request, etag, updated_at):
+                return respuesta_no_modificada(etag, updated_at)
+        
+        memo = self.get_object()
+        if memo.status == Memo.Status.DISTRIBUIDO:
+            registrar_acuse_recibo(memo, request.user)
+        serializer = self.get_serializer(memo)
+        response = Response(serializer.data)
+        if updated_at is not None:
+            con_validadores(response, etag, updated_at)
+        return response
+    
+    def _pk_memo(self):
+        """
+        Id del memo de la URL, para las acciones que filtran por pk antes de
+        get_object(). Un id no numérico da el mismo 404 que get_object().
+        """
+        try:
+            return Memo._meta.pk.to_python(self.kwargs[self.lookup_field])
+        except ValidationError:
+            raise NotFound()
+    
+    def get_projected_queryset(self):
+        """
+        Queryset base con la proyección de columnas que necesita la respuesta.
+        En list/retrieve/search/thread solo se leen las columnas y relaciones solicitadas con
+        `?fields=`/`?expand=`; el resto de acciones trabaja con el memo completo.
+        Todas las relaciones que serializa la respuesta se resuelven aquí, de modo
+        que el número de consultas no depende del número de filas.
+        """
+        queryset = Memo.objects.select_related('author', 'approver', 'departamento')
+        if self.action not in ['list', 'retrieve', 'search', 'thread']:
+            return queryset.select_related('parent_memo').prefetch_related(
+                'recipients', self._attachments_prefetch(), self._replies_prefetch()
+            )
+        
+        serializer_class = self.get_serializer_class()
+        selected, _ = serializer_class.resolve_fields(self.request)
+        queryset = queryset.defer(*serializer_class.get_deferred_fields(self.request))
+        
+        if 'extracto' in selected:
+            queryset = queryset.annotate(extracto=Substr('body', 1, EXTRACTO_LENGTH))
+        if 'attachments_count' in selected:
+            # Subconsulta correlacionada: no multiplica filas con los JOIN de los filtros
+            attachments_count = MemoAttachment.objects.filter(
+                memo=OuterRef('pk')
+            ).order_by().values('memo').annotate(total=Count('id')).values('total')
+            queryset = queryset.annotate(
+                attachments_count=Coalesce(Subquery(attachments_count), 0)
+            )
+        if 'recipients' in selected:
+            queryset = queryset.prefetch_related('recipients')
+        if 'attachments' in selected:
+            queryset = queryset.prefetch_related(self._attachments_prefetch())
+        if 'parent_memo' in selected:
+            queryset = queryset.select_related('parent_memo').defer('parent_memo__body')
+        if 'replies' in selected:
+            queryset = queryset.prefetch_related(self._replies_prefetch())
+        return queryset
+    
+    @staticmethod
+    def _attachments_prefetch():
+        return Prefetch('attachments', queryset=MemoAttachment.objects.select_related('uploaded_by'))
+    
+    @staticmethod
+    def _replies_prefetch():
+        return Prefetch(
+            'replies',
+            queryset=Memo.objects.only('id', 'subject', 'status', 'created_at', 'parent_memo')
+        )
+    
     def get_permissions(self):
         """
         Asigna permisos según la acción.
         """
         if self.action == 'create':
             permission_classes = [IsAuthenticated, IsSecondaryUser]
-        elif self.action in ['update', 'partial_update']:
+        elif self.action in ['update', 'partial_update', 'upload_attachment', 'iniciar_subida', 'subida', 'completar_subida']:
             permission_classes = [IsAuthenticated, CanEditDraft]
         elif self.action == 'retrieve':
             permission_classes = [IsAuthenticated]
+        elif self.action == 'importar':
+            permission_classes = [IsAuthenticated, IsAdminRole]
         else:
             permission_classes = [IsAuthenticated]
         
@@ -151,6 +422,139 @@ class MemoViewSet(viewsets.ModelViewSet):
             }
         )
     
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Búsqueda de texto completo por asunto, contenido y correlativo (`?q=`).
+        Los resultados se ordenan por relevancia y respetan la visibilidad de
+        get_queryset (incluido el filtro `?status=`).
+        """
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response(
+                {'success': False, 'message': 'Debe indicar un texto de búsqueda (q)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limite = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limite = 20
+        limite = max(1, min(limite, MAX_RESULTADOS_BUSQUEDA))
+        
+        memos = list(buscar(self.get_queryset(), texto, limite))
+        serializer = self.get_serializer(memos, many=True)
+        resultados = [
+            {**fila, 'relevancia': memo.relevancia}
+            for fila, memo in zip(serializer.data, memos)
+        ]
+        
+        return Response(
+            {
+                'success': True,
+                'data': resultados,
+                'total': len(resultados)
+            }
+        )
+    
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """
+        Conversación completa a la que pertenece el memo, como árbol de
+        respuestas anidadas. Todo el hilo visible para el usuario se lee en una
+        consulta (raíz + `thread_root`, ordenado por `thread_path`) y el árbol
+        se arma en memoria en una sola pasada. Se limita a MAX_PROFUNDIDAD_HILO
+        niveles y MAX_MEMOS_HILO memos; si el memo pedido queda fuera de ese
+        corte, se devuelve el subárbol que parte de él (`truncado`).
+        """
+        memo_id = self._pk_memo()
+        
+        raiz = Memo.objects.filter(pk=memo_id).values(raiz=Coalesce('thread_root_id', 'id'))
+        memos = list(
+            self.get_queryset()
+            .filter(Q(pk=Subquery(raiz)) | Q(thread_root_id=Subquery(raiz)))
+            .filter(depth__lte=MAX_PROFUNDIDAD_HILO)
+            .order_by('thread_path', 'id')[:MAX_MEMOS_HILO + 1]
+        )
+        truncado = len(memos) > MAX_MEMOS_HILO
+        memos = memos[:MAX_MEMOS_HILO]
+        
+        if not any(memo.id == memo_id for memo in memos):
+            memo = self.get_queryset().filter(pk=memo_id).first()
+            if memo is None:
+                return Response(
+                    {'success': False, 'message': 'Memo no encontrado'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            # Visible pero más profundo o más allá del límite del hilo: su subárbol,
+            # con los mismos límites contados desde él
+            memos = list(
+                self.get_queryset()
+                .filter(
+                    Q(pk=memo.pk) |
+                    Q(thread_root_id=memo.raiz_hilo_id, thread_path__startswith=memo.ruta_descendientes)
+                )
+                .filter(depth__lte=memo.depth + MAX_PROFUNDIDAD_HILO)
+                .order_by('thread_path', 'id')[:MAX_MEMOS_HILO + 1]
+            )
+            truncado = True
+            memos = memos[:MAX_MEMOS_HILO]
+        
+        # Cada padre precede a sus respuestas; si un ancestro no es visible para el
+        # usuario, la respuesta cuelga del ancestro visible más cercano de su ruta
+        # (y si tampoco lo es la raíz, el hilo tiene varias raíces).
+        nodos = {}
+        raices = []
+        serializer = self.get_serializer(memos, many=True)
+        for fila, memo in zip(serializer.data, memos):
+            nodo = {**fila, 'depth': memo.depth, 'replies': []}
+            nodos[memo.id] = nodo
+            ancestros = [int(ancestro) for ancestro in memo.thread_path.split('/') if ancestro]
+            padre = next((nodos[a] for a in reversed(ancestros) if a in nodos), None)
+            (padre['replies'] if padre else raices).append(nodo)
+        
+        return Response(
+            {
+                'success': True,
+                'data': raices,
+                'total': len(memos),
+                'truncado': truncado
+            }
+        )
+    
+    @action(detail=False, methods=['get'])
+    def counters(self, request):
+        """
+        Totales de las carpetas del usuario para los indicadores del dashboard.
+        Se leen de la tabla de contadores (una fila por carpeta y estado) en
+        lugar de contar memos.
+        """
+        carpetas = {}
+        for carpeta, estado, total in ContadorCarpeta.objects.filter(
+            usuario=request.user
+        ).values_list('carpeta', 'status', 'total'):
+            carpetas.setdefault(carpeta, {})[estado or 'total'] = total
+        
+        propios = carpetas.get(EntradaBuzon.Carpeta.PROPIOS, {})
+        recibidos = carpetas.get(EntradaBuzon.Carpeta.RECIBIDOS, {})
+        return Response(
+            {
+                'success': True,
+                'data': {
+                    'borradores': (
+                        propios.get(Memo.Status.DRAFT, 0) +
+                        propios.get(Memo.Status.MODIFICACION_SOLICITADA, 0)
+                    ),
+                    'pendientes_aprobacion': carpetas.get(
+                        EntradaBuzon.Carpeta.APROBACION, {}
+                    ).get(Memo.Status.PENDING_APPROVAL, 0),
+                    'recibidos': sum(recibidos.values()),
+                    'no_leidos': carpetas.get(ContadorCarpeta.NO_LEIDOS, {}).get('total', 0),
+                    'carpetas': carpetas,
+                }
+            }
+        )
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsSecondaryUser])
     def submit(self, request, pk=None):
         """
@@ -237,27 +641,43 @@ class MemoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Generar correlativo si no existe (formato mejorado con mes)
-        if not memo.numero_correlativo and memo.departamento:
-            try:
-                memo.numero_correlativo = generar_correlativo(memo.departamento)
-            except Exception as e:
-                return Response(
-                    {
-                        'success': False,
-                        'message': f'Error al generar correlativo: {str(e)}',
-                        'error_code': 'CORRELATIVE_GENERATION_ERROR'
-                    },
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-        
         # Limpiar comentarios de modificación si existían
         if memo.status == Memo.Status.MODIFICACION_SOLICITADA:
             memo.modificacion_solicitada = None
         
-        # Cambiar el estado a PENDING_APPROVAL
-        memo.status = Memo.Status.PENDING_APPROVAL
-        memo.save()
+        # El correlativo se reserva en la misma transacción que el cambio de estado:
+        # si el guardado falla, el número se libera y la secuencia no deja huecos
+        correlativo_previo = memo.numero_correlativo
+
+        def enviar():
+            # En modo secuencial el número reservado en un intento revertido ya
+            # no pertenece a este memo; uno arrendado sí, y se conserva
+            if not reserva_autonoma():
+                memo.numero_correlativo = correlativo_previo
+            # Generar correlativo si no existe (formato mejorado con mes)
+            if not memo.numero_correlativo and memo.departamento:
+                try:
+                    memo.numero_correlativo = generar_correlativo(memo.departamento)
+                except OperationalError:
+                    raise
+                except Exception as e:
+                    return Response(
+                        {
+                            'success': False,
+                            'message': f'Error al generar correlativo: {str(e)}',
+                            'error_code': 'CORRELATIVE_GENERATION_ERROR'
+                        },
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
+
+            # Cambiar el estado a PENDING_APPROVAL
+            memo.status = Memo.Status.PENDING_APPROVAL
+            memo.save()
+            actualizar_buzon(memo)
+
+        error = transaccion_con_reintentos(enviar)
+        if error is not None:
+            return error
         
         return Response(
             {
@@ -270,8 +690,9 @@ class MemoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsDirector])
     def approve(self, request, pk=None):
         """
-        Aprobar un memo (generar PDF firmado, crear sello digital y cambiar a APPROVED).
-        Luego se distribuye automáticamente (cambia a DISTRIBUIDO).
+        Aprobar un memo (crear sello digital y cambiar a APPROVED).
+        El PDF firmado y la distribución se encolan en un trabajo de firma
+        que procesa `run_workers`; el avance se ve en `signed_file_status`.
         """
         memo = self.get_object()
         
@@ -295,8 +716,7 @@ class MemoViewSet(viewsets.ModelViewSet):
             )
         
         # Establecer fecha de aprobación
-        approved_time = timezone.now()
-        memo.approved_at = approved_time
+        memo.approved_at = timezone.now()
         
         # Crear sello digital avanzado con metadatos
         try:
@@ -305,40 +725,117 @@ class MemoViewSet(viewsets.ModelViewSet):
             logger.error(f'Error al crear sello digital para memo {memo.id}: {str(e)}')
             # Continuar sin sello digital
         
-        # Generar PDF firmado
-        try:
-            attachments = memo.attachments.all()
-            pdf_buffer = generate_signed_pdf(memo, attachments)
-            
-            # Guardar el PDF firmado
-            filename = f'memo_{memo.id}_signed_{approved_time.strftime("%Y%m%d_%H%M%S")}.pdf'
-            memo.signed_file.save(filename, pdf_buffer, save=False)
-        except Exception as e:
-            # Si falla la generación del PDF, registrar el error
-            logger.error(f'Error al generar PDF firmado para memo {memo.id}: {str(e)}')
-            # Continuar sin PDF firmado - el memo se aprobará igual
-        
-        # Actualizar estado a APPROVED (esto disparará el signal)
+        # Actualizar estado a APPROVED (esto disparará el signal) y encolar la
+        # firma en la misma transacción: si el guardado falla no queda trabajo
         memo.status = Memo.Status.APPROVED
-        memo.save()
-        
-        # Distribuir automáticamente usando el sistema mejorado
-        try:
-            from .services import distribuir_memorando
-            resultados_distribucion = distribuir_memorando(memo.id, request)
-            logger.info(f"Memorando {memo.id} distribuido: {resultados_distribucion}")
-        except Exception as e:
-            logger.error(f'Error al distribuir memorando {memo.id}: {str(e)}')
-            # Continuar - el memo ya está aprobado
+        with transaction.atomic():
+            encolar_firmas([memo])
+            memo.save()
+            actualizar_buzon(memo)
         
         return Response(
             {
                 'success': True,
-                'message': 'Memo aprobado y distribuido',
+                'message': 'Memo aprobado; el PDF firmado y la distribución se procesan en segundo plano',
                 'data': MemoDetailSerializer(memo, context={'request': request}).data
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def importar(self, request):
+        """
+        Importación masiva de memorandos históricos (solo administradores).
+        Recibe un archivo JSONL o CSV en `file`; el formato se deduce de la
+        extensión o se indica con `formato`. Para archivos muy grandes conviene
+        el comando `importar_memos`.
+        """
+        archivo = request.FILES.get('file')
+        if not archivo:
+            return Response(
+                {'success': False, 'message': 'No se proporcionó ningún archivo'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        formato = request.data.get('formato') or detectar_formato(archivo.name)
+        try:
+            resumen = importar_memos(archivo.file, formato)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response(
+                {'success': False, 'message': f'No se pudo leer el archivo: {str(e)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(
+            {
+                'success': resumen['total_errores'] == 0,
+                'message': f'{resumen["importados"]} memos importados, {resumen["total_errores"]} con errores',
+                'data': resumen
+            }
+        )
+    
+    def _ids_del_lote(self, request):
+        """Valida el parámetro `ids` de las acciones en lote; devuelve (ids, respuesta_error)."""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return None, Response(
+                {'success': False, 'message': 'Debe indicar una lista de ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            ids = list(dict.fromkeys(int(memo_id) for memo_id in ids))
+        except (TypeError, ValueError):
+            return None, Response(
+                {'success': False, 'message': 'Los ids deben ser números enteros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > MAX_MEMOS_POR_LOTE:
+            return None, Response(
+                {'success': False, 'message': f'Máximo {MAX_MEMOS_POR_LOTE} memos por lote'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return ids, None
+    
+    @staticmethod
+    def _respuesta_lote(resultados, accion):
+        procesados = sum(1 for resultado in resultados if resultado['success'])
+        return Response(
+            {
+                'success': procesados == len(resultados),
+                'message': f'{procesados} de {len(resultados)} memos {accion}',
+                'data': resultados,
+                'procesados': procesados,
+                'fallidos': len(resultados) - procesados
             }
         )
     
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsDirector])
+    def bulk_approve(self, request):
+        """
+        Aprobar y distribuir varios memos pendientes (`{"ids": [...]}`).
+        Devuelve un resultado por memo; los memos inválidos no impiden procesar el resto.
+        """
+        ids, error = self._ids_del_lote(request)
+        if error:
+            return error
+        
+        resultados = aprobar_memorandos_en_lote(ids, request.user, request)
+        return self._respuesta_lote(resultados, 'aprobados')
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, IsDirector])
+    def bulk_reject(self, request):
+        """
+        Rechazar varios memos pendientes (`{"ids": [...], "rejection_reason": "..."}`).
+        """
+        ids, error = self._ids_del_lote(request)
+        if error:
+            return error
+        
+        resultados = rechazar_memorandos_en_lote(
+            ids, request.user, request.data.get('rejection_reason', '')
+        )
+        return self._respuesta_lote(resultados, 'rechazados')
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsDirector])
     def reject(self, request, pk=None):
         """
@@ -368,7 +865,9 @@ class MemoViewSet(viewsets.ModelViewSet):
         rejection_reason = request.data.get('rejection_reason', '')
         memo.status = Memo.Status.REJECTED
         memo.rejection_reason = rejection_reason
-        memo.save()
+        with transaction.atomic():
+            memo.save()
+            actualizar_buzon(memo)
         
         return Response(
             {
@@ -413,7 +912,9 @@ class MemoViewSet(viewsets.ModelViewSet):
         
         memo.status = Memo.Status.MODIFICACION_SOLICITADA
         memo.modificacion_solicitada = modificacion_comentarios
-        memo.save()
+        with transaction.atomic():
+            memo.save()
+            actualizar_buzon(memo)
         
         return Response(
             {
@@ -529,36 +1030,38 @@ class MemoViewSet(viewsets.ModelViewSet):
                 if user not in new_recipients:
                     new_recipients.append(user)
         
-        new_memo = Memo.objects.create(
-            subject=subject,
-            body=body,
-            author=request.user,
-            status=Memo.Status.DRAFT,
-            parent_memo=parent_memo,
-            departamento=request.user.departamento,
-            prioridad=parent_memo.prioridad,
-            confidencial=parent_memo.confidencial
-        )
+        with transaction.atomic():
+            new_memo = Memo.objects.create(
+                subject=subject,
+                body=body,
+                author=request.user,
+                status=Memo.Status.DRAFT,
+                parent_memo=parent_memo,
+                departamento=request.user.departamento,
+                prioridad=parent_memo.prioridad,
+                confidencial=parent_memo.confidencial
+            )
         
-        # Asignar destinatarios
-        new_memo.recipients.set(new_recipients)
+            # Asignar destinatarios
+            new_memo.recipients.set(new_recipients)
         
-        # Asignar aprobador del departamento del autor
-        if request.user.departamento and request.user.departamento.director:
-            new_memo.approver = request.user.departamento.director
+            # Asignar aprobador del departamento del autor
+            if request.user.departamento and request.user.departamento.director:
+                new_memo.approver = request.user.departamento.director
         
-        # Agregar metadatos de respuesta
-        import json
-        metadatos = {
-            'es_respuesta': True,
-            'memorando_original': parent_memo.numero_correlativo,
-            'respondido_por': request.user.nombre_completo or request.user.username,
-            'fecha_respuesta': timezone.now().isoformat()
-        }
-        # El campo metadatos no existe en el modelo, pero podemos agregarlo al sello_digital temporalmente
-        # o crear un campo JSONField adicional en el modelo
+            # Agregar metadatos de respuesta
+            import json
+            metadatos = {
+                'es_respuesta': True,
+                'memorando_original': parent_memo.numero_correlativo,
+                'respondido_por': request.user.nombre_completo or request.user.username,
+                'fecha_respuesta': timezone.now().isoformat()
+            }
+            # El campo metadatos no existe en el modelo, pero podemos agregarlo al sello_digital temporalmente
+            # o crear un campo JSONField adicional en el modelo
         
-        new_memo.save()
+            new_memo.save()
+            actualizar_buzon(new_memo)
         
         return Response(
             {
@@ -591,45 +1094,23 @@ class MemoViewSet(viewsets.ModelViewSet):
         
         file = request.FILES['file']
         
-        # Validar límite de adjuntos
-        current_attachments_count = memo.attachments.count()
-        if current_attachments_count >= MAX_ATTACHMENTS:
+        # Extensión, tamaño, cantidad de adjuntos y tamaño total del memo
+        error = validar_nuevo_adjunto(memo, file.name, file.size)
+        if error:
             return Response(
-                {
-                    'success': False,
-                    'message': f'Máximo {MAX_ATTACHMENTS} archivos adjuntos permitidos'
-                },
+                {'success': False, 'message': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Validar tamaño del archivo
-        if file.size > MAX_FILE_SIZE:
-            size_mb = MAX_FILE_SIZE / (1024 * 1024)
-            return Response(
-                {
-                    'success': False,
-                    'message': f'El archivo excede el tamaño máximo de {size_mb}MB'
-                },
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Validar extensión del archivo
-        file_name = file.name.lower()
-        file_extension = os.path.splitext(file_name)[1]
-        if file_extension not in ALLOWED_ATTACHMENT_EXTENSIONS:
-            return Response(
-                {
-                    'success': False,
-                    'message': f'Formato no permitido. Formatos permitidos: {", ".join(ALLOWED_ATTACHMENT_EXTENSIONS)}'
-                },
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        attachment = MemoAttachment.objects.create(
-            memo=memo,
-            file=file,
-            uploaded_by=request.user
+
+        # El archivo se guarda por su SHA-256, calculado durante la subida; si
+        # el contenido ya existe solo se suma una referencia. El análisis del
+        # contenido (tipo real, páginas, PDF normalizado) lo hace run_workers
+        # en segundo plano
+        sha256 = sha256_de_subida(request, 'file', file)
+        attachment = transaccion_con_reintentos(
+            lambda: crear_adjunto(memo, file, file.name, request.user, sha256)
         )
+        registrar_cambio_memo(memo)
         
         return Response(
             {
@@ -640,3 +1121,183 @@ class MemoViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
 
+    @action(detail=True, methods=['get'])
+    def signed_pdf(self, request, pk=None):
+        """
+        Descarga el PDF firmado. La visibilidad del memo y el nombre del
+        archivo se resuelven en una sola consulta (ver `descargas.py`).
+        """
+        signed_file = Memo.objects.filter(
+            pk=self._pk_memo(), pk__in=self.get_queryset().values('pk')
+        ).values_list('signed_file', flat=True).first()
+        if not signed_file:
+            raise NotFound('El memo no tiene PDF firmado')
+
+        respuesta = respuesta_archivo(request, signed_file, os.path.basename(signed_file), content_type='application/pdf')
+        if respuesta is None:
+            raise NotFound('El memo no tiene PDF firmado')
+        return respuesta
+
+    @action(detail=True, methods=['get'], url_path=r'attachments/(?P<attachment_id>[0-9]+)/download')
+    def descargar_adjunto(self, request, pk=None, attachment_id=None):
+        """
+        Descarga un adjunto con su nombre original. La visibilidad del memo y
+        el archivo se resuelven en una sola consulta (ver `descargas.py`).
+        """
+        adjunto = MemoAttachment.objects.filter(
+            pk=attachment_id, memo_id=self._pk_memo(), memo_id__in=self.get_queryset().values('pk')
+        ).values_list('file', 'nombre_original', 'contenido__sha256').first()
+        if adjunto is None:
+            raise NotFound('Adjunto no encontrado')
+
+        nombre, nombre_original, sha256 = adjunto
+        respuesta = respuesta_archivo(request, nombre, nombre_original or os.path.basename(nombre), sha256)
+        if respuesta is None:
+            raise NotFound('Adjunto no encontrado')
+        return respuesta
+
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def iniciar_subida(self, request, pk=None):
+        """
+        Inicia la subida por bloques de un adjunto (`nombre`, `tamaño` en
+        bytes). Valida formato y límites antes de recibir datos.
+        """
+        memo = self.get_object()
+
+        try:
+            tamaño = int(request.data.get('tamaño', 0))
+        except (TypeError, ValueError):
+            tamaño = 0
+        try:
+            subida = subidas.iniciar_subida(memo, request.user, request.data.get('nombre'), tamaño)
+        except ErrorSubida as e:
+            return self._respuesta_error_subida(e)
+
+        return Response(
+            {
+                'success': True,
+                'message': 'Subida iniciada',
+                'data': SubidaAdjuntoSerializer(subida).data
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)')
+    def subida(self, request, pk=None, upload_id=None):
+        """
+        GET: bytes recibidos (para retomar tras un corte).
+        PUT: recibe un bloque (`Content-Range: bytes inicio-fin/total`).
+        DELETE: cancela la subida.
+        """
+        subida = self._get_subida(upload_id)
+
+        if request.method == 'DELETE':
+            subidas.cancelar_subida(subida)
+            return Response({'success': True, 'message': 'Subida cancelada'})
+
+        if request.method == 'PUT':
+            try:
+                content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+                subidas.escribir_bloque(subida, request.META.get('HTTP_CONTENT_RANGE'), content_length, request.stream)
+            except ErrorSubida as e:
+                return self._respuesta_error_subida(e)
+
+        return Response({'success': True, 'data': SubidaAdjuntoSerializer(subida).data})
+
+    @action(detail=True, methods=['post'], url_path=r'uploads/(?P<upload_id>[0-9a-f-]+)/complete')
+    def completar_subida(self, request, pk=None, upload_id=None):
+        """
+        Completa la subida y crea el adjunto. Con `sha256` se verifica la
+        integridad del archivo recibido.
+        """
+        subida = self._get_subida(upload_id)
+
+        try:
+            attachment = subidas.completar_subida(subida, request.data.get('sha256'))
+        except ErrorSubida as e:
+            return self._respuesta_error_subida(e)
+
+        return Response(
+            {
+                'success': True,
+                'message': 'Adjunto subido exitosamente',
+                'data': MemoAttachmentSerializer(attachment, context={'request': request}).data
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    def _get_subida(self, upload_id):
+        memo = self.get_object()
+        try:
+            return SubidaAdjunto.objects.get(pk=upload_id, memo=memo, usuario=self.request.user)
+        except (SubidaAdjunto.DoesNotExist, ValidationError):
+            raise NotFound('Subida no encontrada')
+
+    @staticmethod
+    def _respuesta_error_subida(error):
+        respuesta = {'success': False, 'message': error.mensaje}
+        if error.datos:
+            respuesta['data'] = error.datos
+        return Response(respuesta, status=error.codigo)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def token_eventos(request):
+    """
+    Emite un token de eventos para abrir `GET /api/eventos/?token=` desde
+    EventSource. Dura EVENTOS_TOKEN_DURACION segundos y no sirve para el resto
+    de la API.
+    """
+    return Response({
+        'success': True,
+        'data': {
+            'token': str(TokenEventos.for_user(request.user)),
+            'expira_en': settings.EVENTOS_TOKEN_DURACION,
+        }
+    }, status=status.HTTP_200_OK)
+
+
+def _usuario_eventos(request):
+    """
+    Usuario del token de acceso de la cabecera Authorization o, para
+    EventSource (que no permite cabeceras), del token de eventos del parámetro
+    `token`. En la URL no se acepta un token de acceso: quedaría en los logs
+    de proxies y en el historial con una hora de vigencia.
+    """
+    autenticacion = JWTAuthentication()
+    try:
+        resultado = autenticacion.authenticate(request)
+        if resultado is None and request.GET.get('token'):
+            return autenticacion.get_user(TokenEventos(request.GET['token']))
+    except (InvalidToken, AuthenticationFailed, TokenError):
+        return None
+    return resultado[0] if resultado else None
+
+
+@require_GET
+async def eventos(request):
+    """
+    Flujo SSE con los eventos de memos del usuario autenticado (ver
+    `eventos.py`). Debe servirse con un servidor ASGI: cada conexión abierta
+    es una corrutina en espera, no un hilo. Bajo WSGI Django intentaría
+    consumir el flujo completo antes de enviar nada, así que se responde 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'success': False, 'message': 'Los eventos requieren un servidor ASGI (daphne o uvicorn)'},
+            status=501
+        )
+    usuario = await sync_to_async(_usuario_eventos)(request)
+    if usuario is None:
+        return JsonResponse({'success': False, 'message': 'No autenticado'}, status=401)
+
+    obtener_backend().escuchar()
+    respuesta = StreamingHttpResponse(
+        flujo_sse(usuario.id, resincronizar='Last-Event-ID' in request.headers),
+        content_type='text/event-stream',
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el flujo antes de enviarlo
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
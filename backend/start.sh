@@ -25,5 +25,7 @@ python manage.py makemigrations
 python manage.py migrate
 
 echo "Iniciando servidor Django en http://localhost:8000..."
+# runserver usa el servidor ASGI de daphne (INSTALLED_APPS), necesario
+# para los eventos en tiempo real de /api/eventos/
 python manage.py runserver
 
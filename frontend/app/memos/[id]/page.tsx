@@ -245,7 +245,7 @@ export default function MemoDetailPage() {
                       color: '#3498db',
                     }}
                   >
-                    📎 {attachment.file}
+                    📎 {attachment.nombre_original}
                   </a>
                 ))}
               </div>
@@ -74,5 +74,7 @@ echo "=========================================="
 echo ""
 
 # Iniciar servidor
+# runserver usa el servidor ASGI de daphne (INSTALLED_APPS), necesario
+# para los eventos en tiempo real de /api/eventos/
 python manage.py runserver
 
@@ -32,6 +32,8 @@ EOF
     
     echo "Backend Django iniciado en http://localhost:8000"
     echo "Usuario de prueba: testuser / testpass123"
+    # runserver usa el servidor ASGI de daphne (INSTALLED_APPS), necesario
+    # para los eventos en tiempo real de /api/eventos/
     python manage.py runserver
 }
 
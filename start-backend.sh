@@ -73,4 +73,6 @@ echo "Presiona Ctrl+C para detener el servidor"
 echo ""
 
 # Iniciar servidor
+# runserver usa el servidor ASGI de daphne (INSTALLED_APPS), necesario
+# para los eventos en tiempo real de /api/eventos/
 python manage.py runserver